@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.cache import cached_parse, file_identity
+from core.diff import DiffResult, build_diff_result, iter_open_rows, load_host_array, packed_port_key
+from core.discovery import RunInfo
+from core.fingerprint import digest, fingerprint_inputs
+from core.hosts import EMPTY_IPS, ip_array_to_strings
+from core.ingest import project_root
+from core.nmap_parse import PORT_COLUMNS
+from core.storage import atomic_write_text, atomic_writer, file_lock
+
+log = logging.getLogger(__name__)
+
+
+# Rolling baseline: compare a run against the last K runs of the same run_type
+# instead of just the previous one, so a laptop that is only sometimes online is
+# not a "new host" every time it comes back. A key (host, or ip/protocol/port) is
+# established when it was present in at least min_presence of the K runs;
+# min_presence=1 is the union of the window.
+#
+# The window is a presence count per key, kept as sorted arrays. Moving it adds
+# the runs that entered and subtracts the runs that left, using each run's packed
+# key set (saved once per run, never re-parsed). A sliding window therefore costs
+# one key-set merge, and the compare itself is one parse of the new run.
+#
+#   data/baselines/keys/<network>/<run_id>__<hash8>.npz     per-run key sets
+#   data/baselines/<network>/<run_type>/window.{json,npz}   the persisted window
+
+DEFAULT_WINDOW = 5
+DEFAULT_MIN_PRESENCE = 1
+FORMAT_VERSION = 1
+
+_PROTOCOLS = ("tcp", "udp")
+
+
+# ----------------------------
+# Per-run key sets
+# ----------------------------
+
+@dataclass(frozen=True)
+class RunKeys:
+    ports: np.ndarray   # sorted unique uint64 packed (ip, protocol, port), see core.diff.packed_port_key
+    other: np.ndarray   # sorted unique str "ip|protocol|port" for keys that do not pack (IPv6, sctp, ...)
+    hosts: np.ndarray   # sorted unique uint32 up hosts
+
+
+def _build_run_keys(run: RunInfo, rows: Optional[List[Tuple]] = None) -> RunKeys:
+    packed, other = set(), set()
+    for r in (iter_open_rows(run) if rows is None else rows):
+        key = packed_port_key(r[0], r[2], r[3])
+        if isinstance(key, int):
+            packed.add(key)
+        else:
+            other.add(f"{r[0]}|{r[2]}|{r[3]}")
+    return RunKeys(
+        ports=np.array(sorted(packed), dtype=np.uint64),
+        other=np.array(sorted(other), dtype=str),
+        hosts=load_host_array(run),
+    )
+
+
+def _inputs_digest(run: RunInfo) -> str:
+    return digest(json.dumps([list(i) for i in file_identity(fingerprint_inputs(run))]).encode())
+
+
+def _keys_path(run: RunInfo, root: Path) -> Path:
+    folder_hash = digest(str(run.run_folder).encode())[:8]
+    return root / "keys" / run.network / f"{run.run_id}__{folder_hash}.npz"
+
+
+def run_keys(run: RunInfo, root: Optional[Path] = None, rows: Optional[List[Tuple]] = None) -> RunKeys:
+    """
+    Packed key sets of one run, persisted next to the windows and rebuilt only
+    when the run's input files change. rows (iter_open_rows output) saves a
+    second XML pass when the caller already has them.
+    """
+    root = root or baselines_root()
+    files = fingerprint_inputs(run)
+
+    def load_or_build() -> RunKeys:
+        identity = json.dumps([list(i) for i in file_identity(files)])
+        path = _keys_path(run, root)
+        if path.exists():
+            try:
+                with np.load(path) as z:
+                    if str(z["identity"]) == identity:
+                        return RunKeys(ports=z["ports"], other=z["other"], hosts=z["hosts"])
+            except (OSError, ValueError, KeyError):
+                log.warning("ignoring unreadable key set %s", path)
+
+        keys = _build_run_keys(run, rows)
+        with atomic_writer(path, "wb") as f:
+            np.savez(f, ports=keys.ports, other=keys.other, hosts=keys.hosts, identity=np.array(identity))
+        return keys
+
+    return cached_parse(f"baseline_keys:{root}", files, load_or_build)
+
+
+# ----------------------------
+# Window state
+# ----------------------------
+
+def _merge_counts(keys: np.ndarray, counts: np.ndarray, delta: np.ndarray, sign: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Add (sign=1) or subtract (sign=-1) one run's unique keys from a sorted
+    key/count pair; keys whose count drops to zero are dropped.
+    """
+    if len(delta) == 0:
+        return keys, counts
+    merged = np.concatenate([keys, delta])
+    uniq, inverse = np.unique(merged, return_inverse=True)
+    weights = np.concatenate([counts, np.full(len(delta), sign, dtype=np.int64)])
+    totals = np.bincount(inverse, weights=weights, minlength=len(uniq)).astype(np.int64)
+    keep = totals > 0
+    return uniq[keep], totals[keep]
+
+
+@dataclass
+class WindowState:
+    members: List[Dict]             # {"run_id", "run_folder", "inputs"}, oldest first
+    port_keys: np.ndarray
+    port_counts: np.ndarray
+    other_keys: np.ndarray
+    other_counts: np.ndarray
+    host_keys: np.ndarray
+    host_counts: np.ndarray
+
+    @classmethod
+    def empty(cls) -> WindowState:
+        no_counts = np.empty(0, dtype=np.int64)
+        return cls([], np.empty(0, dtype=np.uint64), no_counts, np.empty(0, dtype=str), no_counts,
+                   EMPTY_IPS, no_counts)
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+    def apply(self, keys: RunKeys, sign: int) -> None:
+        self.port_keys, self.port_counts = _merge_counts(self.port_keys, self.port_counts, keys.ports, sign)
+        self.other_keys, self.other_counts = _merge_counts(self.other_keys, self.other_counts, keys.other, sign)
+        self.host_keys, self.host_counts = _merge_counts(self.host_keys, self.host_counts, keys.hosts, sign)
+
+    def established(self, min_presence: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (port keys, other keys, hosts) present in at least min_presence member runs.
+        """
+        return (self.port_keys[self.port_counts >= min_presence],
+                self.other_keys[self.other_counts >= min_presence],
+                self.host_keys[self.host_counts >= min_presence].astype(np.uint32))
+
+
+def baselines_root() -> Path:
+    return project_root() / "data" / "baselines"
+
+
+class BaselineStore:
+    """
+    The persisted rolling window of one (network, run_type) series.
+    """
+
+    def __init__(self, network: str, run_type: str, root: Optional[Path] = None) -> None:
+        self.network = network
+        self.run_type = run_type
+        self.root = root or baselines_root()
+        self.dir = self.root / network / (run_type or "_untyped")
+
+    def _load(self) -> WindowState:
+        meta_path, arrays_path = self.dir / "window.json", self.dir / "window.npz"
+        if not (meta_path.exists() and arrays_path.exists()):
+            return WindowState.empty()
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported baseline format in {meta_path}: {meta.get('version')}")
+        with np.load(arrays_path) as z:
+            if str(z["token"]) != meta["token"]:  # the pair was torn by a crash between the two writes
+                log.warning("baseline window %s out of sync, rebuilding", self.dir)
+                return WindowState.empty()
+            return WindowState(meta["members"], z["port_keys"], z["port_counts"], z["other_keys"],
+                               z["other_counts"], z["host_keys"], z["host_counts"])
+
+    def _save(self, state: WindowState) -> None:
+        token = digest(json.dumps(state.members).encode(), str(len(state.port_keys)).encode())
+        with atomic_writer(self.dir / "window.npz", "wb") as f:
+            np.savez(f, port_keys=state.port_keys, port_counts=state.port_counts,
+                     other_keys=state.other_keys, other_counts=state.other_counts,
+                     host_keys=state.host_keys, host_counts=state.host_counts, token=np.array(token))
+        atomic_write_text(self.dir / "window.json", json.dumps(
+            {"version": FORMAT_VERSION, "network": self.network, "run_type": self.run_type,
+             "token": token, "members": state.members}, indent=2))
+
+    def window(self, members: Sequence[RunInfo], known: Sequence[RunInfo] = ()) -> WindowState:
+        """
+        Move the persisted window to exactly these runs: runs that entered are
+        added, runs that left are subtracted. Sliding by one run touches two key
+        sets, however large the window. Runs that left are looked up in `known`
+        (usually all discovered runs).
+        """
+        wanted = [{"run_id": r.run_id, "run_folder": str(r.run_folder), "inputs": _inputs_digest(r)} for r in members]
+        by_folder = {str(r.run_folder): r for r in known}
+
+        with file_lock(self.dir / ".lock"):
+            state = self._load()
+            current = {m["run_folder"]: m.get("inputs") for m in state.members}
+            wanted_folders = {m["run_folder"] for m in wanted}
+            leaving = [m for m in state.members if m["run_folder"] not in wanted_folders]
+            entering = [r for r, m in zip(members, wanted) if m["run_folder"] not in current]
+            kept_changed = any(m["run_folder"] in current and current[m["run_folder"]] != m["inputs"] for m in wanted)
+            if not leaving and not entering and not kept_changed:
+                return state
+
+            # Subtracting needs the exact key set that was added. Rebuild from scratch
+            # when a member was re-ingested or a departed run can't be read back as it
+            # was, or when sliding would load more key sets than building anew.
+            leaving_runs = [by_folder.get(m["run_folder"]) for m in leaving]
+            if (kept_changed or any(r is None or _inputs_digest(r) != m.get("inputs") for r, m in zip(leaving_runs, leaving))
+                    or len(leaving) + len(entering) > len(members)):
+                state, leaving_runs, entering = WindowState.empty(), [], list(members)
+            for r in leaving_runs:
+                state.apply(run_keys(r, self.root), -1)
+            for r in entering:
+                state.apply(run_keys(r, self.root), +1)
+            state.members = wanted
+            self._save(state)
+            log.info("baseline %s/%s: window of %d (+%d -%d)", self.network, self.run_type,
+                     len(wanted), len(entering), len(leaving_runs))
+            return state
+
+
+# ----------------------------
+# Compare
+# ----------------------------
+
+def window_members(run_b: RunInfo, runs: Sequence[RunInfo], size: int = DEFAULT_WINDOW) -> List[RunInfo]:
+    """
+    The `size` runs of run_b's network + run_type just before it, oldest first.
+    """
+    earlier = sorted(
+        (r for r in runs if r.network == run_b.network and r.run_type == run_b.run_type
+         and r.run_name < run_b.run_name and r.run_folder != run_b.run_folder),
+        key=lambda r: r.run_name,
+    )
+    return earlier[-size:] if size > 0 else []
+
+
+def _unpack(keys: np.ndarray, other: np.ndarray) -> List[Tuple[str, str, int]]:
+    ips = ip_array_to_strings((keys >> np.uint64(17)).astype(np.uint32))
+    protos = ((keys >> np.uint64(16)) & np.uint64(1)).tolist()
+    ports = (keys & np.uint64(0xFFFF)).tolist()
+    out = [(ip, _PROTOCOLS[p], port) for ip, p, port in zip(ips, protos, ports)]
+    for key in other.tolist():
+        ip, protocol, port = key.rsplit("|", 2)
+        out.append((ip, protocol, int(port)))
+    return out
+
+
+def compare_to_window(run_b: RunInfo, state: WindowState, window_runs: Sequence[RunInfo],
+                      min_presence: int = DEFAULT_MIN_PRESENCE, root: Optional[Path] = None) -> DiffResult:
+    """
+    DiffResult of run_b against the window: opened = keys of run_b not established
+    in the window (present in >= min_presence runs), closed = established keys of the
+    newest window run that run_b no longer has (closed rows carry ip/protocol/port
+    only). run_a is the newest window run, relabelled with the window.
+    """
+    import pandas as pd
+
+    if not window_runs:
+        raise ValueError(f"No earlier {run_b.run_type or 'untyped'} runs of {run_b.network} to compare against")
+    if min_presence < 1:
+        raise ValueError("min_presence must be at least 1")
+    min_presence = min(min_presence, len(window_runs))  # a series' first runs have a short window
+
+    est_ports, est_other, est_hosts = state.established(min_presence)
+    rows = list(iter_open_rows(run_b))
+    b = run_keys(run_b, root, rows)
+
+    # Gone = established and still there in the newest window run; a flapping
+    # device that was already absent last time is not reported as gone again.
+    last = run_keys(window_runs[-1], root)
+    new_hosts = ip_array_to_strings(np.setdiff1d(b.hosts, est_hosts, assume_unique=True))
+    removed_hosts = ip_array_to_strings(np.setdiff1d(
+        np.intersect1d(est_hosts, last.hosts, assume_unique=True), b.hosts, assume_unique=True))
+
+    # Opened rows come from run_b itself, so service / product / version are intact.
+    keys = [packed_port_key(r[0], r[2], r[3]) for r in rows]
+    packed_at = [i for i, k in enumerate(keys) if isinstance(k, int)]
+    seen = np.zeros(len(rows), dtype=bool)
+    if packed_at:
+        packed = np.array([keys[i] for i in packed_at], dtype=np.uint64)
+        seen[packed_at] = np.isin(packed, est_ports)
+    other = set(est_other.tolist())
+    for i, k in enumerate(keys):
+        if not isinstance(k, int):
+            seen[i] = f"{k[0]}|{k[1]}|{k[2]}" in other
+    df_opened = pd.DataFrame([r for r, s in zip(rows, seen) if not s], columns=PORT_COLUMNS)
+    df_opened = df_opened.drop_duplicates(["ip", "protocol", "port"]).reset_index(drop=True)
+
+    closed = _unpack(
+        np.setdiff1d(np.intersect1d(est_ports, last.ports, assume_unique=True), b.ports, assume_unique=True),
+        np.setdiff1d(np.intersect1d(est_other, last.other, assume_unique=True), b.other, assume_unique=True))
+    df_closed = pd.DataFrame(
+        [(ip, "", proto, port, "open", "", "", "", "") for ip, proto, port in closed], columns=PORT_COLUMNS)
+
+    newest = window_runs[-1]
+    run_a = replace(newest, run_id=f"last{len(window_runs)}_min{min_presence}_to_{newest.run_id}")
+    return build_diff_result(run_a, run_b, new_hosts, removed_hosts, df_opened, df_closed)
+
+
+def rolling_compare(
+    run_b: RunInfo,
+    runs: Sequence[RunInfo],
+    size: int = DEFAULT_WINDOW,
+    min_presence: int = DEFAULT_MIN_PRESENCE,
+    root: Optional[Path] = None,
+) -> DiffResult:
+    """
+    Compare run_b against the last `size` runs of its series (k-of-n presence).
+    """
+    members = window_members(run_b, runs, size)
+    state = BaselineStore(run_b.network, run_b.run_type, root).window(members, runs) if members else WindowState.empty()
+    return compare_to_window(run_b, state, members, min_presence, root)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# Process-wide cache of parsed runs. Every Streamlit session, the watch daemon and
+# the indexes share one instance, so a run is parsed once per process however many
+# analysts open it. Cached values are shared: callers must treat them as read-only.
+
+CACHE_BUDGET_ENV = "PSEC_PARSE_CACHE_MB"
+DEFAULT_BUDGET_MB = 512
+
+# (path, size, mtime_ns, inode) per input file: a re-ingested or rewritten file
+# gets a new identity, so stale entries are never served.
+FileIdentity = Tuple[str, int, int, int]
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes_used: int
+    budget_bytes: int
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+    def describe(self) -> str:
+        total = self.hits + self.misses
+        rate = f"{100 * self.hits / total:.0f}%" if total else "-"
+        return (
+            f"{self.entries} entries, {self.bytes_used / 1e6:.1f}/{self.budget_bytes / 1e6:.0f} MB; "
+            f"hits {self.hits}, misses {self.misses} ({rate} hit rate), evictions {self.evictions}"
+        )
+
+
+def file_identity(paths: Iterable[Path]) -> Tuple[FileIdentity, ...]:
+    out = []
+    for p in paths:
+        st = Path(p).stat()
+        out.append((str(Path(p).resolve()), st.st_size, st.st_mtime_ns, st.st_ino))
+    return tuple(out)
+
+
+def estimate_nbytes(value) -> int:
+    """
+    Resident size of a cached value: deep for DataFrames, nbytes for arrays,
+    summed over dataclass fields / tuples.
+    """
+    if value is None:
+        return 0
+    if hasattr(value, "memory_usage") and hasattr(value, "columns"):  # DataFrame
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, "nbytes"):  # numpy array
+        return int(value.nbytes)
+    if hasattr(value, "__dataclass_fields__"):
+        return sum(estimate_nbytes(getattr(value, f)) for f in value.__dataclass_fields__)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class ParsedRunCache:
+    """
+    LRU over (kind, ...) keys with a byte budget. Concurrent misses on the
+    same key wait for the first caller's parse instead of parsing again.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[object, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return self._entries[key][0]
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._misses += 1
+                    done = self._inflight[key] = threading.Event()
+                    break
+            # Someone else is parsing this run; reuse their result (or retry if it failed).
+            waiter.wait()
+
+        try:
+            value = compute()
+            self._store(key, value, estimate_nbytes(value))
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+    def _store(self, key: Hashable, value: object, nbytes: int) -> None:
+        with self._lock:
+            if nbytes > self.budget_bytes:
+                log.info("parse cache: %s (%d bytes) exceeds the budget, not cached", key[0], nbytes)
+                return
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.budget_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                bytes_used=self._bytes,
+                budget_bytes=self.budget_bytes,
+            )
+
+
+def _budget_from_env() -> int:
+    raw = os.environ.get(CACHE_BUDGET_ENV, "")
+    try:
+        mb = float(raw) if raw else DEFAULT_BUDGET_MB
+    except ValueError:
+        log.warning("%s=%r is not a number; using %d MB", CACHE_BUDGET_ENV, raw, DEFAULT_BUDGET_MB)
+        mb = DEFAULT_BUDGET_MB
+    return int(max(mb, 0) * 1024 * 1024)
+
+
+_PARSE_CACHE: Optional[ParsedRunCache] = None
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def get_parse_cache() -> ParsedRunCache:
+    """
+    The shared cache for this process; budget from PSEC_PARSE_CACHE_MB (0 disables).
+    """
+    global _PARSE_CACHE
+    with _PARSE_CACHE_LOCK:
+        if _PARSE_CACHE is None:
+            _PARSE_CACHE = ParsedRunCache(_budget_from_env())
+        return _PARSE_CACHE
+
+
+def cached_parse(kind: str, paths: Iterable[Path], compute: Callable[[], T]) -> T:
+    """
+    compute() once per (kind, identity of the input files) per process.
+    """
+    return get_parse_cache().get_or_compute((kind, file_identity(paths)), compute)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from core import importtime
+from core.discovery import discover_runs
+from core.ingest import project_root
+
+
+# Entry point for cron jobs and health checks. Keep module-level imports to the
+# stdlib + discovery: each subcommand imports what it needs (see core.importtime).
+
+
+def _data_dir(args: argparse.Namespace) -> Path:
+    return args.data_dir or (project_root() / "data")
+
+
+def cmd_runs(args: argparse.Namespace) -> int:
+    runs = discover_runs(_data_dir(args) / "extracted")
+    if args.network:
+        runs = [r for r in runs if r.network == args.network]
+    if args.json:
+        print(json.dumps([
+            {"network": r.network, "run_type": r.run_type, "timestamp": r.timestamp_str,
+             "run_id": r.run_id, "run_folder": str(r.run_folder)}
+            for r in runs
+        ], indent=2))
+    else:
+        for r in runs:
+            print(f"{r.network}\t{r.run_type or '-'}\t{r.timestamp_str or '-'}\t{r.run_id}")
+    return 0
+
+
+def cmd_health(args: argparse.Namespace) -> int:
+    """
+    Exit 0 when the data directory is usable and runs are discoverable.
+    """
+    data_dir = _data_dir(args)
+    extracted = data_dir / "extracted"
+    checks = {
+        "data_dir_exists": data_dir.is_dir(),
+        "data_dir_writable": data_dir.is_dir() and os.access(data_dir, os.W_OK),
+        "extracted_dir_exists": extracted.is_dir(),
+    }
+    runs = discover_runs(extracted) if checks["extracted_dir_exists"] else []
+    report = {
+        "ok": checks["data_dir_exists"] and checks["data_dir_writable"],
+        "checks": checks,
+        "runs": len(runs),
+        "networks": len({r.network for r in runs}),
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+def _pick_pair(runs, args: argparse.Namespace):
+    """
+    (A, B) for --network/--run-type: explicit --a/--b run IDs, else previous vs latest.
+    """
+    runs = sorted((r for r in runs if r.network == args.network), key=lambda r: r.run_name)
+    by_id = {r.run_id: r for r in runs}
+    if bool(args.a) != bool(args.b):
+        raise ValueError("Pass both --a and --b, or neither.")
+    if args.a:
+        missing = [rid for rid in (args.a, args.b) if rid not in by_id]
+        if missing:
+            raise ValueError(f"Unknown run ID(s) for {args.network}: {', '.join(missing)}")
+        return by_id[args.a], by_id[args.b]
+    # Never pair different run types (smoketest vs baselinekit); default to the latest's.
+    run_type = args.run_type or (runs[-1].run_type if runs else None)
+    runs = [r for r in runs if r.run_type == run_type]
+    if len(runs) < 2:
+        raise ValueError(f"Need at least two runs for {args.network} to compare.")
+    return runs[-2], runs[-1]
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    """
+    Stream diff events (NDJSON/CSV) for SIEM forwarders to a file or stdout.
+    """
+    from core.export import export_diff
+    from core.planner import plan_compare, run_compare
+
+    runs = discover_runs(_data_dir(args) / "extracted")
+    try:
+        run_a, run_b = _pick_pair(runs, args)
+        if args.window:
+            from core.baseline import rolling_compare
+
+            diff = rolling_compare(run_b, runs, args.window, args.min_presence, _data_dir(args) / "baselines")
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if not args.window:
+        from core.fingerprint import fingerprints_dir
+
+        plan = plan_compare(run_a, run_b)
+        print(f"plan: {plan.describe()}", file=sys.stderr)
+        diff = run_compare(run_a, run_b, plan, strategy=args.strategy,
+                           fingerprint_root=fingerprints_dir(_data_dir(args)))
+    n = export_diff(diff, args.out, fmt=args.format)
+    print(f"{n} events: {diff.run_a.run_id} -> {run_b.run_id}", file=sys.stderr)
+    return 0
+
+
+def cmd_rescan(args: argparse.Namespace) -> int:
+    """
+    Targeted nmap re-scan plan for a diff: print the script, or write it + target files.
+    """
+    from core.fingerprint import fingerprints_dir
+    from core.planner import run_compare
+    from core.rescan import plan_rescan, render_rescan_script, write_rescan_plan
+
+    try:
+        run_a, run_b = _pick_pair(discover_runs(_data_dir(args) / "extracted"), args)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    diff = run_compare(run_a, run_b, fingerprint_root=fingerprints_dir(_data_dir(args)))
+    plan = plan_rescan(diff, max_jobs=args.max_jobs)
+    if args.out_dir:
+        script, _ = write_rescan_plan(plan, args.out_dir)
+        print(f"{len(plan.jobs)} jobs, {plan.keys} keys, {plan.hosts} hosts -> {script}", file=sys.stderr)
+    else:
+        print(render_rescan_script(plan))
+    return 0
+
+
+def cmd_reconcile(args: argparse.Namespace) -> int:
+    """
+    Reconcile a run against an asset inventory; summary as JSON, findings as CSVs.
+    """
+    from core.inventory import load_inventory, reconcile_run
+    from core.storage import atomic_writer
+
+    runs = sorted((r for r in discover_runs(_data_dir(args) / "extracted") if r.network == args.network),
+                  key=lambda r: r.run_name)
+    if args.run_id:
+        runs = [r for r in runs if r.run_id == args.run_id]
+    if not runs:
+        print(f"error: no run found for {args.network}" + (f" / {args.run_id}" if args.run_id else ""),
+              file=sys.stderr)
+        return 2
+    try:
+        index = load_inventory(args.inventory)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    result = reconcile_run(runs[-1], index)
+    print(json.dumps(result.summary(), indent=2))
+    if args.out_dir:
+        for name, df in (("unknown_hosts", result.unknown_hosts),
+                         ("unexpected_ports", result.unexpected_ports),
+                         ("missing_assets", result.missing_assets)):
+            with atomic_writer(args.out_dir / f"{name}.csv", newline="") as f:
+                df.to_csv(f, index=False)
+    return 0
+
+
+def cmd_import_time(args: argparse.Namespace) -> int:
+    return importtime.main(args.modules + ["--budget-ms", str(args.budget_ms)])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m core.cli", description="PSEC Baseline Hunter command line.")
+    parser.add_argument("--data-dir", type=Path, default=None, help="Defaults to <repo>/data")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("runs", help="List discovered runs")
+    p.add_argument("--network", default=None)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_runs)
+
+    p = sub.add_parser("health", help="Check the data directory and run discovery")
+    p.set_defaults(func=cmd_health)
+
+    p = sub.add_parser("export", help="Write diff events as NDJSON/CSV to a file or stdout")
+    p.add_argument("--network", required=True)
+    p.add_argument("--run-type", default=None)
+    p.add_argument("--a", default=None, help="Run A ID (default: previous run)")
+    p.add_argument("--b", default=None, help="Run B ID (default: latest run)")
+    p.add_argument("--format", choices=["ndjson", "csv"], default=None, help="Defaults from --out suffix, else ndjson")
+    p.add_argument("--out", default="-", help="Output path, or - for stdout")
+    p.add_argument("--strategy", choices=["in_memory", "streaming", "sharded"], default=None,
+                   help="Override the size-based compare strategy")
+    p.add_argument("--window", type=int, default=0,
+                   help="Compare B against its last N runs instead of A (rolling baseline)")
+    p.add_argument("--min-presence", type=int, default=1,
+                   help="With --window: ports/hosts seen in fewer of the N runs count as new")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("rescan", help="Plan targeted nmap re-scans confirming a diff")
+    p.add_argument("--network", required=True)
+    p.add_argument("--run-type", default=None)
+    p.add_argument("--a", default=None, help="Run A ID (default: previous run)")
+    p.add_argument("--b", default=None, help="Run B ID (default: latest run)")
+    p.add_argument("--max-jobs", type=int, default=8, help="Max nmap invocations per protocol")
+    p.add_argument("--out-dir", type=Path, default=None, help="Write rescan.sh + target files here")
+    p.set_defaults(func=cmd_rescan)
+
+    p = sub.add_parser("reconcile", help="Reconcile a run against an asset inventory (CSV/JSON)")
+    p.add_argument("inventory", type=Path)
+    p.add_argument("--network", required=True)
+    p.add_argument("--run-id", default=None, help="Default: latest run of the network")
+    p.add_argument("--out-dir", type=Path, default=None,
+                   help="Write unknown_hosts / unexpected_ports / missing_assets CSVs here")
+    p.set_defaults(func=cmd_reconcile)
+
+    p = sub.add_parser("import-time", help="Measure core import times; fail on heavy imports")
+    p.add_argument("modules", nargs="*")
+    p.add_argument("--budget-ms", type=float, default=importtime.DEFAULT_BUDGET_MS)
+    p.set_defaults(func=cmd_import_time)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,12 +2,33 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
-
-import pandas as pd
-
-from core.ingest import build_run_meta, detect_run_folders, project_root
-from core.nmap_parse import parse_ports
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+from core.cache import cached_parse
+from core.discovery import (  # noqa: F401  (re-exported: discovery used to live here)
+    RunInfo,
+    discover_runs,
+    guess_network_from_extracted_root,
+    runs_for_extracted_root,
+)
+from core.hosts import (
+    EMPTY_IPS,
+    host_delta,
+    ip_array_from_strings,
+    ip_array_to_strings,
+    ip_array_union,
+    ipv4_prefix,
+    read_gnmap_up_array,
+    read_hosts_up_array,
+    read_xml_up_array,
+)
+from core.ingest import build_run_meta, is_compacted, project_root
+from core.nmap_parse import PORT_COLUMNS, iter_port_rows_merged
+from core.storage import atomic_write_text, file_lock
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 
 # ----------------------------
@@ -17,17 +38,6 @@ from core.nmap_parse import parse_ports
 PortKey = Tuple[str, str, int]  # (ip, protocol, port)
 
 
-@dataclass(frozen=True)
-class RunInfo:
-    network: str
-    extracted_root: Path
-    run_folder: Path
-    run_name: str          # run_folder.name
-    run_type: str          # from folder name
-    timestamp_str: str     # "YYYY-MM-DD HH:MM" or ""
-    run_id: str            # network + timestamp + run_type (best effort)
-
-
 @dataclass
 class DiffResult:
     run_a: RunInfo
@@ -46,150 +56,90 @@ class DiffResult:
 
 
 # ----------------------------
-# Discovery helpers
+# Loading per-run artifacts
 # ----------------------------
 
-def _is_hex8(s: str) -> bool:
-    if len(s) != 8:
-        return False
-    try:
-        int(s, 16)
-        return True
-    except ValueError:
-        return False
-
-
-def guess_network_from_extracted_root(extracted_root: Path) -> str:
+def load_host_array(run: RunInfo) -> np.ndarray:
     """
-    extracted_root name is typically: <zip_stem>_<random8>
-    where zip_stem often starts with network name like:
-      batman_2025-12-31_2134_<...>
-      orange_2025-12-31_1948_<...>
+    Up hosts as a sorted uint32 array (see core.hosts).
+    Prefer hosts_up.txt; else discovery output (.gnmap, then .xml); else hosts with open ports.
+    A compacted run reads the hosts its history entry stored.
     """
-    name = extracted_root.name
-    parts = name.split("_")
-    if parts and _is_hex8(parts[-1]):
-        parts = parts[:-1]  # strip random suffix
-
-    if not parts:
-        return "unknown"
+    if is_compacted(run.run_folder):
+        from core.history import load_compacted
 
-    # Heuristic: if token[1] looks like YYYY-MM-DD, token[0] is network
-    if len(parts) >= 2 and len(parts[1]) == 10 and parts[1][4] == "-" and parts[1][7] == "-":
-        return parts[0].lower()
+        return ip_array_from_strings(load_compacted(run.run_folder).hosts)
 
-    return parts[0].lower()
-
-
-def discover_runs(data_extracted_dir: Optional[Path] = None) -> List[RunInfo]:
-    """
-    Scan data/extracted/* for baselinekit run folders (rawscans/*).
-    """
-    root = project_root()
-    extracted_dir = data_extracted_dir or (root / "data" / "extracted")
-    if not extracted_dir.exists():
-        return []
-
-    runs: List[RunInfo] = []
-    for extracted_root in sorted(extracted_dir.glob("*")):
-        if not extracted_root.is_dir():
-            continue
+    meta = build_run_meta(run.run_folder)
 
-        network = guess_network_from_extracted_root(extracted_root)
-
-        run_folders = detect_run_folders(extracted_root)
-        for rf in run_folders:
-            meta = build_run_meta(rf)
-
-            ts_str = meta.timestamp.strftime("%Y-%m-%d %H:%M") if meta.timestamp else ""
-            # run_id: network + timestamp + run_type (best effort)
-            if meta.timestamp and meta.run_type:
-                run_id = f"{network}_{meta.timestamp.strftime('%Y-%m-%d_%H%M')}_{meta.run_type}"
-            elif meta.timestamp:
-                run_id = f"{network}_{meta.timestamp.strftime('%Y-%m-%d_%H%M')}"
-            else:
-                run_id = f"{network}_{rf.name}"
-
-            runs.append(
-                RunInfo(
-                    network=network,
-                    extracted_root=extracted_root,
-                    run_folder=rf,
-                    run_name=rf.name,
-                    run_type=meta.run_type or "",
-                    timestamp_str=ts_str,
-                    run_id=run_id,
-                )
-            )
-
-    # newest-ish first (timestamp_str sorts poorly; rely on folder name parse ordering from detect_run_folders)
-    # but still group by network and then by run_name descending as a fallback.
-    runs.sort(key=lambda r: (r.network, r.run_name), reverse=True)
-    return runs
+    # Split scans leave several parts per source; their hosts are unioned.
+    parts = sorted(p for p in meta.key_files.get("hosts_up", []) if p.exists())
+    if parts:
+        return cached_parse("hosts_up", parts, lambda: ip_array_union(read_hosts_up_array(p) for p in parts))
 
+    discovery = meta.key_files.get("discovery", [])
+    for suffix, reader in ((".gnmap", read_gnmap_up_array), (".xml", read_xml_up_array)):
+        parts = sorted(p for p in discovery if p.suffix.lower() == suffix and p.exists())
+        if parts:
+            return cached_parse(f"hosts_up{suffix}", parts, lambda: ip_array_union(reader(p) for p in parts))
 
-# ----------------------------
-# Loading per-run artifacts
-# ----------------------------
-
-def _read_hosts_up(path: Path) -> List[str]:
-    hosts: List[str] = []
-    for line in path.read_text(errors="ignore").splitlines():
-        s = line.strip()
-        if not s:
-            continue
-        # basic IP-ish filter
-        if all(ch.isdigit() or ch == "." for ch in s) and s.count(".") == 3:
-            hosts.append(s)
-    return hosts
+    # fallback: derive from open ports scan
+    df_open = load_open_ports_df(run)
+    if df_open.empty:
+        return EMPTY_IPS
+    return ip_array_from_strings(df_open["ip"].dropna().astype(str).unique())
 
 
 def load_hosts(run: RunInfo) -> Set[str]:
     """
-    Prefer hosts_up.txt if present; else derive from ports scan (open-only).
+    Set-of-strings view of load_host_array().
     """
-    meta = build_run_meta(run.run_folder)
-    candidates = meta.key_files.get("hosts_up", [])
-
-    for p in candidates:
-        if p.exists():
-            return set(_read_hosts_up(p))
+    return set(ip_array_to_strings(load_host_array(run)))
 
-    # fallback: derive from open ports scan
-    df_open = load_open_ports_df(run)
-    if df_open.empty:
-        return set()
-    return set(df_open["ip"].dropna().astype(str).unique().tolist())
 
-
-def _pick_ports_xml(run_folder: Path) -> Optional[Path]:
+def pick_ports_xmls(run_folder: Path) -> List[Path]:
     """
-    Prefer baselinekit-known file name if present; otherwise any .xml.
+    Prefer baselinekit-known file names if present (every part of a split scan,
+    sorted by name); otherwise the first .xml in the folder.
     """
     meta = build_run_meta(run_folder)
     ports_files = meta.key_files.get("ports", [])
 
     # Prefer .xml among matched key files
-    xmls = [p for p in ports_files if p.suffix.lower() == ".xml" and p.exists()]
+    xmls = sorted(p for p in ports_files if p.suffix.lower() == ".xml" and p.exists())
     if xmls:
-        return xmls[0]
+        return xmls
 
     # Else: any xml in folder
     any_xml = sorted(run_folder.glob("*.xml"))
-    return any_xml[0] if any_xml else None
+    return any_xml[:1]
 
 
 def load_open_ports_df(run: RunInfo) -> pd.DataFrame:
     """
-    Returns open-only ports dataframe for a run.
+    Returns open-only ports dataframe for a run, split-scan parts merged.
     Columns come from core.nmap_parse.parse_ports:
       ip, hostname, protocol, port, state, service, product, version, source_xml
+    Parsed once per process (core.cache); the frame is shared, so do not mutate it.
+    A compacted run reads the rows its history entry stored.
     """
-    xml_path = _pick_ports_xml(run.run_folder)
-    if not xml_path:
+    import pandas as pd
+
+    if is_compacted(run.run_folder):
+        from core.history import load_compacted
+
+        return load_compacted(run.run_folder).ports
+
+    xml_paths = pick_ports_xmls(run.run_folder)
+    if not xml_paths:
         return pd.DataFrame()
+    return cached_parse("open_ports", xml_paths, lambda: _parse_open_ports(xml_paths))
+
 
-    df = parse_ports(xml_path)
+def _parse_open_ports(xml_paths: List[Path]) -> pd.DataFrame:
+    import pandas as pd
+
+    df = pd.DataFrame(list(iter_port_rows_merged(xml_paths)))
     if df.empty:
         return df
 
@@ -201,13 +151,43 @@ def load_open_ports_df(run: RunInfo) -> pd.DataFrame:
     return df_open
 
 
+def iter_open_rows(run: RunInfo) -> Iterator[Tuple]:
+    """
+    Open-only port rows as tuples in PORT_COLUMNS order, normalized like
+    load_open_ports_df(), without building a frame.
+    """
+    if is_compacted(run.run_folder):
+        for r in load_open_ports_df(run).itertuples(index=False, name=None):
+            yield r[:3] + (int(r[3]),) + r[4:]
+        return
+
+    xml_paths = pick_ports_xmls(run.run_folder)
+    if not xml_paths:
+        return
+    for r in iter_port_rows_merged(xml_paths):
+        if r["state"] != "open":
+            continue
+        port = r["port"] if isinstance(r["port"], int) else -1
+        yield (str(r["ip"]), r["hostname"], str(r["protocol"]), port,
+               r["state"], r["service"], r["product"], r["version"], r["source_xml"])
+
+
 def _to_port_keys(df_open: pd.DataFrame) -> Set[PortKey]:
     if df_open.empty:
         return set()
     return set(zip(df_open["ip"], df_open["protocol"], df_open["port"]))
 
 
+def port_key_delta(a_keys: Set[PortKey], b_keys: Set[PortKey]) -> Tuple[Set[PortKey], Set[PortKey]]:
+    """
+    (opened, closed) going from A to B.
+    """
+    return b_keys - a_keys, a_keys - b_keys
+
+
 def _filter_df_by_keys(df: pd.DataFrame, keys: Set[PortKey]) -> pd.DataFrame:
+    import pandas as pd
+
     if df.empty or not keys:
         return df.iloc[0:0].copy()
 
@@ -246,48 +226,45 @@ PORT_NOTES: Dict[int, str] = {
 }
 
 
-def risk_flags(df_opened: pd.DataFrame) -> pd.DataFrame:
+RISK_COLUMNS = ["priority", "reason", "ip", "protocol", "port", "service", "product", "version"]
+
+
+def risk_row(ip, protocol, port, service="", product="", version="") -> Optional[Dict]:
     """
-    Tag only NEWLY opened ports (delta) with P0/P1/P2 + reason.
+    P0/P1/P2 + reason for one newly opened port, or None if no rule matches.
     """
-    if df_opened.empty:
-        return pd.DataFrame(columns=["priority", "reason", "ip", "protocol", "port", "service", "product", "version"])
-
-    out_rows = []
-    for _, r in df_opened.iterrows():
-        port = int(r["port"])
-        priority = None
-        for p, ports in RISK_PORTS.items():
-            if port in ports:
-                priority = p
-                break
-        if not priority:
-            continue
-
-        note = PORT_NOTES.get(port, "Flagged port")
-        svc = str(r.get("service", "") or "").strip()
-        prod = str(r.get("product", "") or "").strip()
-
-        reason = note
-        if svc:
-            reason += f" | service={svc}"
-        if prod:
-            reason += f" | product={prod}"
-
-        out_rows.append(
-            {
-                "priority": priority,
-                "reason": reason,
-                "ip": r["ip"],
-                "protocol": r["protocol"],
-                "port": port,
-                "service": r.get("service", ""),
-                "product": r.get("product", ""),
-                "version": r.get("version", ""),
-            }
-        )
-
-    df_risk = pd.DataFrame(out_rows)
+    port = int(port)
+    priority = None
+    for p, ports in RISK_PORTS.items():
+        if port in ports:
+            priority = p
+            break
+    if not priority:
+        return None
+
+    note = PORT_NOTES.get(port, "Flagged port")
+    svc = str(service or "").strip()
+    prod = str(product or "").strip()
+
+    reason = note
+    if svc:
+        reason += f" | service={svc}"
+    if prod:
+        reason += f" | product={prod}"
+
+    return {
+        "priority": priority,
+        "reason": reason,
+        "ip": ip,
+        "protocol": protocol,
+        "port": port,
+        "service": service,
+        "product": product,
+        "version": version,
+    }
+
+
+def sort_risk(df_risk: pd.DataFrame) -> pd.DataFrame:
     if df_risk.empty:
         return df_risk
 
@@ -298,6 +275,23 @@ def risk_flags(df_opened: pd.DataFrame) -> pd.DataFrame:
     return df_risk
 
 
+def risk_flags(df_opened: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tag only NEWLY opened ports (delta) with P0/P1/P2 + reason.
+    """
+    import pandas as pd
+
+    if df_opened.empty:
+        return pd.DataFrame(columns=RISK_COLUMNS)
+
+    # Column-wise zip instead of iterrows: no per-row Series on large deltas.
+    extra = [df_opened[c] if c in df_opened else [""] * len(df_opened) for c in ("service", "product", "version")]
+    candidates = zip(df_opened["ip"], df_opened["protocol"], df_opened["port"], *extra)
+    out_rows = [row for row in (risk_row(*values) for values in candidates) if row]
+
+    return sort_risk(pd.DataFrame(out_rows))
+
+
 # ----------------------------
 # Diff + Markdown export
 # ----------------------------
@@ -306,11 +300,10 @@ def compare_runs(run_a: RunInfo, run_b: RunInfo) -> DiffResult:
     """
     A = baseline (older), B = comparison (newer)
     """
-    hosts_a = load_hosts(run_a)
-    hosts_b = load_hosts(run_b)
-
-    new_hosts = _sort_ips(list(hosts_b - hosts_a))
-    removed_hosts = _sort_ips(list(hosts_a - hosts_b))
+    # Sorted-array differences come out in IP order already.
+    new_arr, removed_arr = host_delta(load_host_array(run_a), load_host_array(run_b))
+    new_hosts = ip_array_to_strings(new_arr)
+    removed_hosts = ip_array_to_strings(removed_arr)
 
     df_a_open = load_open_ports_df(run_a)
     df_b_open = load_open_ports_df(run_b)
@@ -318,13 +311,83 @@ def compare_runs(run_a: RunInfo, run_b: RunInfo) -> DiffResult:
     a_keys = _to_port_keys(df_a_open)
     b_keys = _to_port_keys(df_b_open)
 
-    opened = b_keys - a_keys
-    closed = a_keys - b_keys
+    opened, closed = port_key_delta(a_keys, b_keys)
 
     df_opened = _filter_df_by_keys(df_b_open, opened)
     df_closed = _filter_df_by_keys(df_a_open, closed)
 
-    df_risk = risk_flags(df_opened)
+    return build_diff_result(run_a, run_b, new_hosts, removed_hosts, df_opened, df_closed)
+
+
+def packed_port_key(ip: str, protocol: str, port: int):
+    """
+    (ip, protocol, port) packed into one int for IPv4 tcp/udp; tuple otherwise.
+    Ints keep the key sets of a multi-million-row run several times smaller.
+    """
+    parts = ip.split(".")
+    if len(parts) == 4 and all(p.isdigit() for p in parts) and protocol in ("tcp", "udp") and 0 <= port <= 0xFFFF:
+        value = (int(parts[0]) << 24) | (int(parts[1]) << 16) | (int(parts[2]) << 8) | int(parts[3])
+        return (value << 17) | ((protocol == "udp") << 16) | port
+    return (ip, protocol, port)
+
+
+def compare_runs_streaming(run_a: RunInfo, run_b: RunInfo, prefixes: Optional[Set[int]] = None) -> DiffResult:
+    """
+    Same result as compare_runs() without holding either run as a frame: pass 1
+    streams both XMLs into packed key sets, pass 2 streams them again and keeps
+    only the rows whose key changed.
+    prefixes limits the port comparison to those /24s (see core.fingerprint);
+    rows outside them are known to be unchanged.
+    """
+    import pandas as pd
+
+    new_arr, removed_arr = host_delta(load_host_array(run_a), load_host_array(run_b))
+
+    if prefixes is None:
+        rows_a, rows_b = (lambda: iter_open_rows(run_a)), (lambda: iter_open_rows(run_b))
+    else:
+        # Only the changed /24s are kept, which is small enough to hold: one pass per run.
+        kept_a = [r for r in iter_open_rows(run_a) if ipv4_prefix(r[0], 24) in prefixes]
+        kept_b = [r for r in iter_open_rows(run_b) if ipv4_prefix(r[0], 24) in prefixes]
+        rows_a, rows_b = (lambda: iter(kept_a)), (lambda: iter(kept_b))
+
+    a_keys = {packed_port_key(r[0], r[2], r[3]) for r in rows_a()}
+    b_keys = {packed_port_key(r[0], r[2], r[3]) for r in rows_b()}
+    opened, closed = port_key_delta(a_keys, b_keys)
+    del a_keys, b_keys
+
+    opened_rows = [r for r in rows_b() if packed_port_key(r[0], r[2], r[3]) in opened] if opened else []
+    closed_rows = [r for r in rows_a() if packed_port_key(r[0], r[2], r[3]) in closed] if closed else []
+
+    # ip, protocol, port, service, product, version
+    risk = [row for row in (risk_row(r[0], r[2], r[3], r[5], r[6], r[7]) for r in opened_rows) if row]
+
+    return build_diff_result(
+        run_a,
+        run_b,
+        ip_array_to_strings(new_arr),
+        ip_array_to_strings(removed_arr),
+        pd.DataFrame(opened_rows, columns=PORT_COLUMNS),
+        pd.DataFrame(closed_rows, columns=PORT_COLUMNS),
+        sort_risk(pd.DataFrame(risk, columns=RISK_COLUMNS)),
+    )
+
+
+def build_diff_result(
+    run_a: RunInfo,
+    run_b: RunInfo,
+    new_hosts: List[str],
+    removed_hosts: List[str],
+    df_opened: pd.DataFrame,
+    df_closed: pd.DataFrame,
+    df_risk: Optional[pd.DataFrame] = None,
+) -> DiffResult:
+    """
+    Risk flags + markdown for an already computed delta. Shared by every compare mode.
+    df_risk may be passed in when it was already computed (e.g. per shard).
+    """
+    if df_risk is None:
+        df_risk = risk_flags(df_opened)
 
     changes_md = render_changes_md(run_a, run_b, new_hosts, removed_hosts, df_opened, df_closed, df_risk)
     watchlist_md = render_watchlist_md(run_a, run_b, df_risk)
@@ -406,8 +469,8 @@ def render_watchlist_md(run_a: RunInfo, run_b: RunInfo, risky_opened: pd.DataFra
         if dfp.empty:
             continue
         md.append(f"### {prio}")
-        for _, r in dfp.iterrows():
-            md.append(f"- **{r['ip']}** `{r['protocol']}/{r['port']}` — {r['reason']}")
+        for ip, protocol, port, reason in zip(dfp["ip"], dfp["protocol"], dfp["port"], dfp["reason"]):
+            md.append(f"- **{ip}** `{protocol}/{port}` — {reason}")
         md.append("")
 
     md.append("## Suggested next actions (fast)")
@@ -431,18 +494,33 @@ def df_to_md_table(df: pd.DataFrame, max_rows: int = 100) -> str:
 
 
 def save_markdown_pair(diff: DiffResult, out_dir: Path) -> Tuple[Path, Path]:
+    """
+    Both files are replaced atomically under the comparison's lock, so a concurrent
+    writer can't leave CHANGES.md from one diff next to WATCHLIST.md from another.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
     p_changes = out_dir / "CHANGES.md"
     p_watch = out_dir / "WATCHLIST.md"
-    p_changes.write_text(diff.changes_md, encoding="utf-8")
-    p_watch.write_text(diff.watchlist_md, encoding="utf-8")
+    with file_lock(out_dir / ".lock"):
+        atomic_write_text(p_changes, diff.changes_md)
+        atomic_write_text(p_watch, diff.watchlist_md)
     return p_changes, p_watch
 
 
-def _sort_ips(ips: List[str]) -> List[str]:
-    def key(ip: str):
-        try:
-            return tuple(int(x) for x in ip.split("."))
-        except Exception:
-            return (999, 999, 999, 999)
-    return sorted(ips, key=key)
+def comparison_dir(diff: DiffResult, data_dir: Optional[Path] = None) -> Path:
+    """
+    data/comparisons/<network>/<run_a_id>__VS__<run_b_id>/
+    """
+    data_dir = data_dir or (project_root() / "data")
+    return data_dir / "comparisons" / diff.run_a.network / f"{diff.run_a.run_id}__VS__{diff.run_b.run_id}"
+
+
+def ip_sort_key(ip: str):
+    try:
+        return tuple(int(x) for x in ip.split("."))
+    except Exception:
+        return (999, 999, 999, 999)
+
+
+def sort_ips(ips: List[str]) -> List[str]:
+    return sorted(ips, key=ip_sort_key)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from core.ingest import build_run_meta, detect_run_folders, project_root
+from core.storage import is_hidden
+
+
+# Run discovery only: stdlib + core.ingest/core.storage, so listing runs never imports
+# pandas/numpy (core.diff re-exports these names for existing callers).
+
+# ----------------------------
+# Models
+# ----------------------------
+
+@dataclass(frozen=True)
+class RunInfo:
+    network: str
+    extracted_root: Path
+    run_folder: Path
+    run_name: str          # run_folder.name
+    run_type: str          # from folder name
+    timestamp_str: str     # "YYYY-MM-DD HH:MM" or ""
+    run_id: str            # network + timestamp + run_type (best effort)
+
+
+# ----------------------------
+# Discovery helpers
+# ----------------------------
+
+def _is_hex8(s: str) -> bool:
+    if len(s) != 8:
+        return False
+    try:
+        int(s, 16)
+        return True
+    except ValueError:
+        return False
+
+
+def guess_network_from_extracted_root(extracted_root: Path) -> str:
+    """
+    extracted_root name is typically: <zip_stem>_<random8>
+    where zip_stem often starts with network name like:
+      batman_2025-12-31_2134_<...>
+      orange_2025-12-31_1948_<...>
+    """
+    name = extracted_root.name
+    parts = name.split("_")
+    if parts and _is_hex8(parts[-1]):
+        parts = parts[:-1]  # strip random suffix
+
+    if not parts:
+        return "unknown"
+
+    # Heuristic: if token[1] looks like YYYY-MM-DD, token[0] is network
+    if len(parts) >= 2 and len(parts[1]) == 10 and parts[1][4] == "-" and parts[1][7] == "-":
+        return parts[0].lower()
+
+    return parts[0].lower()
+
+
+def runs_for_extracted_root(extracted_root: Path) -> List[RunInfo]:
+    """
+    RunInfo for every run folder under one extracted zip (no sorting).
+    """
+    network = guess_network_from_extracted_root(extracted_root)
+
+    runs: List[RunInfo] = []
+    for rf in detect_run_folders(extracted_root):
+        meta = build_run_meta(rf)
+
+        ts_str = meta.timestamp.strftime("%Y-%m-%d %H:%M") if meta.timestamp else ""
+        # run_id: network + timestamp + run_type (best effort)
+        if meta.timestamp and meta.run_type:
+            run_id = f"{network}_{meta.timestamp.strftime('%Y-%m-%d_%H%M')}_{meta.run_type}"
+        elif meta.timestamp:
+            run_id = f"{network}_{meta.timestamp.strftime('%Y-%m-%d_%H%M')}"
+        else:
+            run_id = f"{network}_{rf.name}"
+
+        runs.append(
+            RunInfo(
+                network=network,
+                extracted_root=extracted_root,
+                run_folder=rf,
+                run_name=rf.name,
+                run_type=meta.run_type or "",
+                timestamp_str=ts_str,
+                run_id=run_id,
+            )
+        )
+    return runs
+
+
+def discover_runs(data_extracted_dir: Optional[Path] = None) -> List[RunInfo]:
+    """
+    Scan data/extracted/* for baselinekit run folders (rawscans/*).
+    Dot-prefixed entries (extractions still being staged) are not published yet.
+    """
+    root = project_root()
+    extracted_dir = data_extracted_dir or (root / "data" / "extracted")
+    if not extracted_dir.exists():
+        return []
+
+    runs: List[RunInfo] = []
+    for extracted_root in sorted(extracted_dir.glob("*")):
+        if not extracted_root.is_dir() or is_hidden(extracted_root):
+            continue
+        runs.extend(runs_for_extracted_root(extracted_root))
+
+    # newest-ish first (timestamp_str sorts poorly; rely on folder name parse ordering from detect_run_folders)
+    # but still group by network and then by run_name descending as a fallback.
+    runs.sort(key=lambda r: (r.network, r.run_name), reverse=True)
+    return runs
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import csv
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Union
+
+from core.diff import DiffResult
+from core.storage import atomic_writer
+
+
+# Machine-readable diff export for SIEM forwarders. Records are produced and
+# written one at a time, so nothing is truncated and no whole document is built.
+
+EXPORT_FIELDS = [
+    "event",            # port_opened | port_closed | risky_exposure | host_new | host_removed
+    "network",
+    "run_a_id",
+    "run_b_id",
+    "run_b_timestamp",
+    "priority",         # P0/P1/P2 when a risk rule matched, else ""
+    "ip",
+    "protocol",
+    "port",
+    "service",
+    "product",
+    "version",
+    "reason",
+]
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+def _clean(v):
+    """
+    numpy scalars / NaN from frames -> plain JSON-safe values.
+    """
+    if v is None:
+        return ""
+    if hasattr(v, "item"):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return ""
+    return v
+
+
+def _column(df, name: str):
+    return df[name] if name in df else [""] * len(df)
+
+
+def iter_diff_events(diff: DiffResult) -> Iterator[Dict]:
+    """
+    One flat record per change, in EXPORT_FIELDS order.
+    """
+    base = {
+        "network": diff.run_a.network,
+        "run_a_id": diff.run_a.run_id,
+        "run_b_id": diff.run_b.run_id,
+        "run_b_timestamp": diff.run_b.timestamp_str,
+    }
+
+    def record(event: str, **fields) -> Dict:
+        rec = dict.fromkeys(EXPORT_FIELDS, "")
+        rec.update(base)
+        rec["event"] = event
+        rec.update({k: _clean(v) for k, v in fields.items()})
+        return rec
+
+    risk = diff.risky_opened
+    risk_by_key = {}
+    if not risk.empty:
+        for ip, protocol, port, priority, reason in zip(
+            risk["ip"], risk["protocol"], risk["port"], risk["priority"], risk["reason"]
+        ):
+            risk_by_key[(str(ip), str(protocol), int(port))] = (priority, reason)
+
+    for event, df in (("port_opened", diff.ports_opened), ("port_closed", diff.ports_closed)):
+        if df.empty:
+            continue
+        for ip, protocol, port, service, product, version in zip(
+            df["ip"], df["protocol"], df["port"],
+            _column(df, "service"), _column(df, "product"), _column(df, "version"),
+        ):
+            priority, reason = ("", "")
+            if event == "port_opened":
+                priority, reason = risk_by_key.get((str(ip), str(protocol), int(port)), ("", ""))
+            yield record(event, priority=priority, reason=reason, ip=ip, protocol=protocol, port=port,
+                         service=service, product=product, version=version)
+
+    if not risk.empty:
+        for priority, reason, ip, protocol, port, service, product, version in zip(
+            risk["priority"], risk["reason"], risk["ip"], risk["protocol"], risk["port"],
+            _column(risk, "service"), _column(risk, "product"), _column(risk, "version"),
+        ):
+            yield record("risky_exposure", priority=priority, reason=reason, ip=ip, protocol=protocol,
+                         port=port, service=service, product=product, version=version)
+
+    for ip in diff.new_hosts:
+        yield record("host_new", ip=ip)
+    for ip in diff.removed_hosts:
+        yield record("host_removed", ip=ip)
+
+
+def write_events(events: Iterable[Dict], out: TextIO, fmt: str = "ndjson") -> int:
+    """
+    Stream records to an open text file. Returns the number of records written.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt} (expected one of {', '.join(EXPORT_FORMATS)})")
+
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for rec in events:
+            writer.writerow(rec)
+            count += 1
+    else:
+        for rec in events:
+            out.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+            out.write("\n")
+            count += 1
+    out.flush()
+    return count
+
+
+def export_diff(diff: DiffResult, dest: Union[str, Path] = "-", fmt: Optional[str] = None) -> int:
+    """
+    Write every diff event to dest ("-" = stdout). fmt defaults from the file suffix
+    (.csv -> csv, anything else -> ndjson).
+    """
+    if str(dest) == "-":
+        return write_events(iter_diff_events(diff), sys.stdout, fmt or "ndjson")
+
+    dest = Path(dest)
+    fmt = fmt or ("csv" if dest.suffix.lower() == ".csv" else "ndjson")
+    with atomic_writer(dest, "w", newline="") as f:
+        return write_events(iter_diff_events(diff), f, fmt)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from core.cache import cached_parse, file_identity
+from core.diff import RISK_COLUMNS, DiffResult, build_diff_result, iter_open_rows, load_host_array, pick_ports_xmls
+from core.discovery import RunInfo
+from core.hosts import ipv4_prefix
+from core.ingest import COMPACTED_MARKER, build_run_meta, is_compacted, project_root
+from core.nmap_parse import PORT_COLUMNS
+from core.storage import atomic_write_text, run_lock
+
+log = logging.getLogger(__name__)
+
+
+# Merkle fingerprints: each run is hashed per /24 (its up hosts + open-port keys),
+# /24 hashes roll up into /16, /8 and a root. Equal roots mean compare_runs would
+# find nothing; otherwise only /24s under differing subtrees need comparing.
+
+LEVELS = (8, 16, 24)     # prefix lengths of the inner levels, root above /8
+LEAF_LEN = LEVELS[-1]
+FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class RunFingerprint:
+    run_folder: str
+    root: str
+    levels: Dict[int, Dict[int, str]]   # prefix_len -> {prefix: hex digest}; -1 = non-IPv4
+
+    def as_dict(self) -> Dict:
+        return {
+            "version": FORMAT_VERSION,
+            "run_folder": self.run_folder,
+            "root": self.root,
+            "levels": {str(k): {str(p): h for p, h in v.items()} for k, v in self.levels.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> RunFingerprint:
+        return cls(
+            run_folder=d["run_folder"],
+            root=d["root"],
+            levels={int(k): {int(p): h for p, h in v.items()} for k, v in d["levels"].items()},
+        )
+
+
+def digest(*chunks: bytes) -> str:
+    """
+    Hex blake2b-128 of the concatenated chunks: the hash behind fingerprints and
+    file names derived from run folders.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for c in chunks:
+        h.update(c)
+    return h.hexdigest()
+
+
+def _roll_up(children: Dict[int, str], shift: int) -> Dict[int, str]:
+    grouped: Dict[int, List[str]] = {}
+    for prefix, child in sorted(children.items()):
+        parent = prefix >> shift if prefix >= 0 else -1
+        grouped.setdefault(parent, []).append(f"{prefix}:{child}")
+    return {p: digest("\n".join(items).encode()) for p, items in grouped.items()}
+
+
+def build_fingerprint(run: RunInfo) -> RunFingerprint:
+    """
+    One streaming pass over the run's open ports plus its host array.
+    """
+    hosts: np.ndarray = load_host_array(run)  # sorted, so each /24 is one contiguous slice
+    host_prefixes = hosts >> (32 - LEAF_LEN)
+
+    keys: Dict[int, List[str]] = {}
+    for r in iter_open_rows(run):
+        ip, protocol, port = r[0], r[2], r[3]
+        keys.setdefault(ipv4_prefix(ip, LEAF_LEN), []).append(f"{ip}/{protocol}/{port}")
+
+    leaves: Dict[int, str] = {}
+    for prefix in sorted(set(keys).union(np.unique(host_prefixes).tolist())):
+        lo, hi = host_prefixes.searchsorted(prefix, "left"), host_prefixes.searchsorted(prefix, "right")
+        in_prefix = hosts[lo:hi] if prefix >= 0 else hosts[:0]
+        joined = "\n".join(sorted(set(keys.get(prefix, []))))
+        leaves[prefix] = digest(b"H", in_prefix.tobytes(), b"K", joined.encode())
+
+    levels: Dict[int, Dict[int, str]] = {LEAF_LEN: leaves}
+    for upper, lower in zip(reversed(LEVELS[:-1]), reversed(LEVELS[1:])):
+        levels[upper] = _roll_up(levels[lower], lower - upper)
+    root = digest("\n".join(f"{p}:{d}" for p, d in sorted(levels[LEVELS[0]].items())).encode())
+
+    return RunFingerprint(run_folder=str(run.run_folder), root=root, levels=levels)
+
+
+def fingerprint_inputs(run: RunInfo) -> List[Path]:
+    """
+    The files a run's open ports and hosts are read from; anything derived from
+    them (fingerprints, key sets, cached results) is stale once these change.
+    """
+    meta = build_run_meta(run.run_folder)
+    files = list(pick_ports_xmls(run.run_folder))
+    for label in ("hosts_up", "discovery"):
+        files += [p for p in meta.key_files.get(label, []) if p.exists()]
+    if is_compacted(run.run_folder):
+        files.append(run.run_folder / COMPACTED_MARKER)
+    return sorted(set(files))
+
+
+def fingerprints_dir(data_dir: Optional[Path] = None) -> Path:
+    return (data_dir or project_root() / "data") / "fingerprints"
+
+
+def _fingerprint_path(run: RunInfo, root: Path) -> Path:
+    # run_id can repeat across re-ingests of the same zip; the folder path cannot.
+    folder_hash = digest(str(run.run_folder).encode())[:8]
+    return root / run.network / f"{run.run_id}__{folder_hash}.json"
+
+
+def _load_stored(run: RunInfo, root: Path, identity: List) -> Optional[RunFingerprint]:
+    path = _fingerprint_path(run, root)
+    if not path.exists():
+        return None
+    try:
+        stored = json.loads(path.read_text(encoding="utf-8"))
+        if stored.get("version") == FORMAT_VERSION and stored.get("identity") == identity:
+            return RunFingerprint.from_dict(stored)
+    except (ValueError, KeyError):
+        log.warning("ignoring unreadable fingerprint %s", path)
+    return None
+
+
+def stored_fingerprint(run: RunInfo, root: Path) -> Optional[RunFingerprint]:
+    """
+    The fingerprint persisted under root, if it is still current; never builds one.
+    """
+    return _load_stored(run, root, [list(i) for i in file_identity(fingerprint_inputs(run))])
+
+
+def fingerprint_run(run: RunInfo, root: Optional[Path] = None) -> RunFingerprint:
+    """
+    Fingerprint for run, rebuilt only when its input files change. Persisted under
+    root (callers pass fingerprints_dir(<their data_dir>)); without a root it is
+    kept in this process only.
+    """
+    files = fingerprint_inputs(run)
+    if root is None:
+        return cached_parse("fingerprint", files, lambda: build_fingerprint(run))
+
+    def load_or_build() -> RunFingerprint:
+        # Per-run lock: another process building the same fingerprint is waited for, not repeated.
+        with run_lock(root, str(run.run_folder)):
+            return _load_or_build()
+
+    def _load_or_build() -> RunFingerprint:
+        identity = [list(i) for i in file_identity(files)]
+        fp = _load_stored(run, root, identity)
+        if fp is None:
+            fp = build_fingerprint(run)
+            atomic_write_text(_fingerprint_path(run, root),
+                              json.dumps(dict(fp.as_dict(), identity=identity), separators=(",", ":")))
+        return fp
+
+    # Keyed on root too: the same run fingerprinted into another data dir must still be written there.
+    return cached_parse(f"fingerprint:{root}", files, load_or_build)
+
+
+def changed_prefixes(a: RunFingerprint, b: RunFingerprint) -> Set[int]:
+    """
+    /24 prefixes whose leaves differ, descending only into differing subtrees.
+    Empty when the roots match.
+    """
+    if a.root == b.root:
+        return set()
+
+    candidates: Optional[Set[int]] = None  # differing prefixes at the previous level
+    for depth, prefix_len in enumerate(LEVELS):
+        la, lb = a.levels.get(prefix_len, {}), b.levels.get(prefix_len, {})
+        keys = set(la) | set(lb)
+        if candidates is not None:
+            shift = prefix_len - LEVELS[depth - 1]
+            keys = {k for k in keys if (k >> shift if k >= 0 else -1) in candidates}
+        candidates = {k for k in keys if la.get(k) != lb.get(k)}
+        if not candidates:
+            break
+    return candidates or set()
+
+
+def empty_diff(run_a: RunInfo, run_b: RunInfo) -> DiffResult:
+    """
+    The DiffResult compare_runs returns for two runs with identical keys and hosts.
+    """
+    import pandas as pd
+
+    return build_diff_result(
+        run_a, run_b, [], [],
+        pd.DataFrame(columns=PORT_COLUMNS),
+        pd.DataFrame(columns=PORT_COLUMNS),
+        pd.DataFrame(columns=RISK_COLUMNS),
+    )
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import shutil
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.cache import cached_parse
+from core.diff import PortKey, ip_sort_key, load_hosts, load_open_ports_df, port_key_delta, sort_ips
+from core.discovery import RunInfo, discover_runs
+from core.ingest import COMPACTED_MARKER, ensure_dir, is_compacted, project_root
+from core.nmap_parse import PORT_COLUMNS  # stored row layout == load_open_ports_df() columns
+from core.storage import atomic_write_text, atomic_writer, file_lock
+
+
+# ----------------------------
+# Models
+# ----------------------------
+
+HISTORY_FORMAT_VERSION = 1
+DEFAULT_CHECKPOINT_EVERY = 10
+
+Row = Tuple  # values in PORT_COLUMNS order
+
+
+@dataclass(frozen=True)
+class StoredRun:
+    run_id: str
+    run_name: str
+    timestamp_str: str
+    hosts: List[str]
+    ports: pd.DataFrame  # open-only, same columns as load_open_ports_df()
+
+
+def _row_key(row: Row) -> PortKey:
+    return (row[0], row[2], row[3])
+
+
+def _df_to_rows(df_open: pd.DataFrame) -> Dict[PortKey, Row]:
+    if df_open.empty:
+        return {}
+    cols = [df_open[c] if c in df_open else pd.Series([""] * len(df_open), index=df_open.index) for c in PORT_COLUMNS]
+    rows: Dict[PortKey, Row] = {}
+    for values in zip(*cols):
+        row = tuple("" if (isinstance(v, float) and pd.isna(v)) else v for v in values)
+        row = row[:3] + (int(row[3]),) + row[4:]
+        rows[_row_key(row)] = row
+    return rows
+
+
+def _rows_to_df(rows: Dict[PortKey, Row]) -> pd.DataFrame:
+    if not rows:
+        return pd.DataFrame(columns=PORT_COLUMNS)
+    ordered = sorted(rows.values(), key=lambda r: (ip_sort_key(r[0]), r[2], r[3]))
+    return pd.DataFrame([list(r) for r in ordered], columns=PORT_COLUMNS)
+
+
+def _write_gz_json(path: Path, payload: Dict) -> None:
+    with atomic_writer(path, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+
+
+def _read_gz_json(path: Path) -> Dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def history_root() -> Path:
+    return project_root() / "data" / "history"
+
+
+def _series_dir(root: Path, network: str, run_type: str) -> Path:
+    return Path(root) / network / (run_type or "_untyped")
+
+
+# ----------------------------
+# Store
+# ----------------------------
+
+class HistoryStore:
+    """
+    Long-term storage for one (network, run_type) series:
+
+      data/history/<network>/<run_type>/
+        manifest.json
+        000000_<run_name>.ckpt.json.gz    full open-port table + host list
+        000001_<run_name>.delta.json.gz   opened rows / closed keys / changed rows + host delta
+
+    Every checkpoint_every-th run is a checkpoint, the rest are deltas against the
+    previous run (port_key_delta, same as compare_runs). Rebuilding any run reads one
+    checkpoint plus at most checkpoint_every - 1 deltas.
+    """
+
+    def __init__(self, network: str, run_type: str, root: Optional[Path] = None,
+                 checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY) -> None:
+        self.network = network
+        self.run_type = run_type
+        self.root = Path(root or history_root())
+        self.dir = _series_dir(self.root, network, run_type)
+        self.manifest_path = self.dir / "manifest.json"
+        self.manifest = self._load_manifest(checkpoint_every)
+        self._tail: Optional[Tuple[Set[str], Dict[PortKey, Row]]] = None  # state of the newest run
+
+    def _load_manifest(self, checkpoint_every: int) -> Dict:
+        if self.manifest_path.exists():
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("version") != HISTORY_FORMAT_VERSION:
+                raise ValueError(f"Unsupported history format in {self.manifest_path}: {manifest.get('version')}")
+            return manifest
+        return {"version": HISTORY_FORMAT_VERSION, "network": self.network, "run_type": self.run_type,
+                "checkpoint_every": checkpoint_every, "runs": []}
+
+    def _save_manifest(self) -> None:
+        atomic_write_text(self.manifest_path, json.dumps(self.manifest, indent=2))
+
+    @property
+    def runs(self) -> List[Dict]:
+        return self.manifest["runs"]
+
+    def has_run(self, run_id: str) -> bool:
+        return any(r["run_id"] == run_id for r in self.runs)
+
+    # --- writing ---
+
+    def append(self, run: RunInfo, hosts: Optional[Set[str]] = None, df_open: Optional[pd.DataFrame] = None) -> Dict:
+        """
+        Add the next run of the series. Runs must arrive oldest first.
+
+        Holds the series lock and re-reads the manifest first, so appends from
+        several processes are serialized and none of them overwrites another's entry.
+        """
+        with file_lock(self.dir / ".lock"):
+            latest = self._load_manifest(int(self.manifest["checkpoint_every"]))
+            if latest["runs"] != self.runs:
+                self.manifest, self._tail = latest, None
+            return self._append_locked(run, hosts, df_open)
+
+    def _append_locked(self, run: RunInfo, hosts: Optional[Set[str]], df_open: Optional[pd.DataFrame]) -> Dict:
+        if run.network != self.network or run.run_type != self.run_type:
+            raise ValueError(f"Run {run.run_id} does not belong to {self.network}/{self.run_type}")
+        if self.has_run(run.run_id):
+            raise ValueError(f"Run already stored: {run.run_id}")
+        if self.runs and run.run_name <= self.runs[-1]["run_name"]:
+            raise ValueError(f"Runs must be appended oldest first: {run.run_name} <= {self.runs[-1]['run_name']}")
+
+        hosts = set(load_hosts(run) if hosts is None else hosts)
+        rows = _df_to_rows(load_open_ports_df(run) if df_open is None else df_open)
+
+        seq = len(self.runs)
+        is_checkpoint = seq % int(self.manifest["checkpoint_every"]) == 0
+        kind = "checkpoint" if is_checkpoint else "delta"
+        file_name = f"{seq:06d}_{run.run_name}.{'ckpt' if is_checkpoint else 'delta'}.json.gz"
+
+        ensure_dir(self.dir)
+        if is_checkpoint:
+            payload = {"hosts": sort_ips(list(hosts)), "ports": [list(r) for r in rows.values()]}
+        else:
+            prev_hosts, prev_rows = self._tail_state()
+            opened, closed = port_key_delta(set(prev_rows), set(rows))
+            changed = [list(rows[k]) for k in set(rows) & set(prev_rows) if rows[k] != prev_rows[k]]
+            payload = {
+                "new_hosts": sort_ips(list(hosts - prev_hosts)),
+                "removed_hosts": sort_ips(list(prev_hosts - hosts)),
+                "opened": [list(rows[k]) for k in opened],
+                "closed": [list(k) for k in closed],
+                "changed": changed,
+            }
+        _write_gz_json(self.dir / file_name, payload)
+
+        entry = {
+            "run_id": run.run_id,
+            "run_name": run.run_name,
+            "timestamp_str": run.timestamp_str,
+            "kind": kind,
+            "file": file_name,
+            "source": str(run.run_folder),
+            "hosts": len(hosts),
+            "open_ports": len(rows),
+        }
+        self.runs.append(entry)
+        self._save_manifest()
+        self._tail = (hosts, rows)
+        return entry
+
+    def _tail_state(self) -> Tuple[Set[str], Dict[PortKey, Row]]:
+        if self._tail is None:
+            self._tail = self._state_at(len(self.runs) - 1)
+        return self._tail
+
+    # --- reading ---
+
+    def _state_at(self, idx: int) -> Tuple[Set[str], Dict[PortKey, Row]]:
+        start = idx
+        while self.runs[start]["kind"] != "checkpoint":
+            start -= 1
+
+        ckpt = _read_gz_json(self.dir / self.runs[start]["file"])
+        hosts = set(ckpt["hosts"])
+        rows = {_row_key(tuple(r)): tuple(r) for r in ckpt["ports"]}
+
+        for entry in self.runs[start + 1: idx + 1]:
+            delta = _read_gz_json(self.dir / entry["file"])
+            hosts.difference_update(delta["removed_hosts"])
+            hosts.update(delta["new_hosts"])
+            for k in delta["closed"]:
+                rows.pop(tuple(k), None)
+            for r in delta["opened"] + delta["changed"]:
+                rows[_row_key(tuple(r))] = tuple(r)
+        return hosts, rows
+
+    def reconstruct(self, run_id: str) -> StoredRun:
+        for idx, entry in enumerate(self.runs):
+            if entry["run_id"] == run_id:
+                hosts, rows = self._state_at(idx)
+                return StoredRun(
+                    run_id=entry["run_id"],
+                    run_name=entry["run_name"],
+                    timestamp_str=entry["timestamp_str"],
+                    hosts=sort_ips(list(hosts)),
+                    ports=_rows_to_df(rows),
+                )
+        raise KeyError(f"Run not in history: {run_id}")
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.dir.glob("*") if p.is_file()) if self.dir.exists() else 0
+
+
+# ----------------------------
+# Raw archive
+# ----------------------------
+
+def archive_run_folder(run: RunInfo, archive_dir: Path) -> Path:
+    """
+    Tar + gzip the raw run folder to <archive_dir>/<network>/<run_id>.tar.gz.
+    """
+    dest_dir = ensure_dir(Path(archive_dir) / run.network)
+    dest = dest_dir / f"{run.run_id}.tar.gz"
+    with atomic_writer(dest, "wb") as raw, tarfile.open(fileobj=raw, mode="w:gz") as tar:
+        tar.add(run.run_folder, arcname=run.run_folder.name)
+    return dest
+
+
+# ----------------------------
+# Compacted run folders
+# ----------------------------
+
+def prune_run_folder(store: HistoryStore, run: RunInfo, hosts: Set[str], rows: Dict[PortKey, Row]) -> None:
+    """
+    Replace the raw files of a stored run with a COMPACTED marker, once the store
+    rebuilds exactly the hosts and open ports read from them. From then on
+    core.diff and core.run_data read the run through load_compacted().
+    """
+    stored = store.reconstruct(run.run_id)
+    if set(stored.hosts) != hosts or _df_to_rows(stored.ports) != rows:
+        raise ValueError(f"History of {run.run_id} does not reproduce its run folder; not pruning")
+
+    # Marker first: readers switch to history before any raw file disappears.
+    atomic_write_text(run.run_folder / COMPACTED_MARKER, json.dumps(
+        {"version": HISTORY_FORMAT_VERSION, "root": str(store.root.resolve()),
+         "network": store.network, "run_type": store.run_type, "run_id": run.run_id}, indent=2))
+    for p in run.run_folder.iterdir():
+        if p.name == COMPACTED_MARKER:
+            continue
+        if p.is_dir() and not p.is_symlink():
+            shutil.rmtree(p)
+        else:
+            p.unlink()
+
+
+def load_compacted(run_folder: Path) -> StoredRun:
+    """
+    A pruned run, rebuilt from the history store its marker names. Cached per
+    process (core.cache) on the marker and the store's manifest.
+    """
+    marker_path = Path(run_folder) / COMPACTED_MARKER
+    marker = json.loads(marker_path.read_text(encoding="utf-8"))
+    manifest_path = _series_dir(Path(marker["root"]), marker["network"], marker["run_type"]) / "manifest.json"
+
+    def load() -> StoredRun:
+        store = HistoryStore(marker["network"], marker["run_type"], root=Path(marker["root"]))
+        return store.reconstruct(marker["run_id"])
+
+    return cached_parse("compacted_run", [marker_path, manifest_path], load)
+
+
+def compact_history(
+    runs: Optional[List[RunInfo]] = None,
+    root: Optional[Path] = None,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    archive_dir: Optional[Path] = None,
+    prune: bool = False,
+) -> Dict[Tuple[str, str], HistoryStore]:
+    """
+    Append every not-yet-stored run (oldest first) to its series store.
+    Runs older than a series' newest stored run are skipped.
+    prune=True (needs archive_dir: scripts, titles and other scans live only in the
+    archive afterwards) then replaces each verified run folder with a marker.
+    """
+    if prune and archive_dir is None:
+        raise ValueError("prune needs archive_dir: raw scan files are only kept in the archive")
+    runs = discover_runs() if runs is None else runs
+    stores: Dict[Tuple[str, str], HistoryStore] = {}
+
+    for run in sorted(runs, key=lambda r: (r.network, r.run_type, r.run_name)):
+        group = (run.network, run.run_type)
+        if group not in stores:
+            stores[group] = HistoryStore(run.network, run.run_type, root=root, checkpoint_every=checkpoint_every)
+        store = stores[group]
+        if store.has_run(run.run_id) or (store.runs and run.run_name <= store.runs[-1]["run_name"]):
+            continue
+        if is_compacted(run.run_folder):  # pruned into another history root
+            continue
+        hosts, df_open = load_hosts(run), load_open_ports_df(run)
+        store.append(run, hosts, df_open)
+        if archive_dir is not None:
+            archive_run_folder(run, archive_dir)
+        if prune:
+            prune_run_folder(store, run, hosts, _df_to_rows(df_open))
+    return stores
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compact discovered runs into delta-encoded history.")
+    parser.add_argument("--root", type=Path, default=None, help="Defaults to <repo>/data/history")
+    parser.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY)
+    parser.add_argument("--archive-dir", type=Path, default=None, help="Also tar.gz each raw run folder here")
+    parser.add_argument("--prune", action="store_true",
+                        help="Replace archived run folders with a marker once history reproduces them; "
+                             "compare/index/scorecard then read those runs from history")
+    args = parser.parse_args(argv)
+
+    if args.prune and args.archive_dir is None:
+        parser.error("--prune requires --archive-dir")
+
+    stores = compact_history(
+        root=args.root,
+        checkpoint_every=args.checkpoint_every,
+        archive_dir=args.archive_dir,
+        prune=args.prune,
+    )
+    for (network, run_type), store in sorted(stores.items()):
+        print(f"{network}/{run_type or '(untyped)'}: {len(store.runs)} runs, {store.size_bytes() / 1024:.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
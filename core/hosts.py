@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+
+# IPv4 host sets are kept as sorted, de-duplicated uint32 arrays: set differences
+# via np.setdiff1d come out already in numeric order, so no per-IP sort is needed.
+
+READ_BLOCK_BYTES = 4 * 1024 * 1024
+
+_IPV4_LINE_RE = re.compile(rb"^[ \t]*(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})[ \t\r]*$", re.M)
+_GNMAP_UP_RE = re.compile(rb"^Host: (\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\b[^\n]*\bStatus: Up", re.M)
+_IPV4_STR_RE = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+
+EMPTY_IPS = np.empty(0, dtype=np.uint32)
+
+
+def _dotted_to_array(ips: List[bytes]) -> np.ndarray:
+    """
+    Dotted quads (already regex-checked) -> packed uint32; addresses with an octet
+    above 255 are not IPv4 and are dropped. One numpy conversion for the whole
+    batch; a malformed octet raises ValueError instead of parsing as garbage.
+    """
+    if not ips:
+        return EMPTY_IPS
+    octets = np.array(b".".join(ips).split(b"."), dtype=np.uint32)
+    if len(octets) != 4 * len(ips):
+        raise ValueError(f"Malformed IPv4 address among {len(ips)} parsed")
+    octets = octets.reshape(-1, 4)
+    octets = octets[(octets <= 255).all(axis=1)]
+    return (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+
+def _iter_blocks(path: Path) -> Iterator[bytes]:
+    """
+    Whole-line blocks of roughly READ_BLOCK_BYTES, so regexes never see a split line.
+    """
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_BLOCK_BYTES)
+            if not chunk:
+                break
+            chunk = carry + chunk
+            cut = chunk.rfind(b"\n")
+            if cut < 0:
+                carry = chunk
+                continue
+            carry = chunk[cut + 1:]
+            yield chunk[: cut + 1]
+    if carry:
+        yield carry
+
+
+def _stream_ips(path: Path, pattern: "re.Pattern[bytes]") -> np.ndarray:
+    parts = [_dotted_to_array(pattern.findall(block)) for block in _iter_blocks(path)]
+    if not parts:
+        return EMPTY_IPS
+    return np.unique(np.concatenate(parts))
+
+
+def read_hosts_up_array(path: Path) -> np.ndarray:
+    """
+    hosts_up.txt (one IPv4 per line) -> sorted unique uint32 array.
+    """
+    return _stream_ips(Path(path), _IPV4_LINE_RE)
+
+
+def read_gnmap_up_array(path: Path) -> np.ndarray:
+    """
+    "Host: 10.0.0.1 (...)<TAB>Status: Up" lines of a .gnmap -> sorted unique uint32 array.
+    """
+    return _stream_ips(Path(path), _GNMAP_UP_RE)
+
+
+def read_xml_up_array(path: Path) -> np.ndarray:
+    """
+    Up hosts of an Nmap XML (e.g. discovery_ping_sweep.xml), streamed with iterparse.
+    """
+    ips: List[str] = []
+    for _, elem in ET.iterparse(str(path), events=("end",)):
+        if elem.tag != "host":
+            continue
+        status = elem.find("status")
+        if status is None or status.get("state") == "up":
+            for addr in elem.findall("address"):
+                if addr.get("addrtype") == "ipv4":
+                    ips.append(addr.get("addr", ""))
+                    break
+        elem.clear()
+    return ip_array_from_strings(ips)
+
+
+def ip_array_from_strings(ips: Iterable[str]) -> np.ndarray:
+    dotted = [ip.encode("ascii") for ip in (str(x).strip() for x in ips) if _IPV4_STR_RE.match(ip)]
+    return np.unique(_dotted_to_array(dotted))
+
+
+def ip_array_to_strings(arr: np.ndarray) -> List[str]:
+    if len(arr) == 0:
+        return []
+    arr = np.asarray(arr, dtype=np.uint32)
+    out = ((arr >> 24) & 255).astype(str)
+    for shift in (16, 8, 0):
+        out = np.char.add(np.char.add(out, "."), ((arr >> shift) & 255).astype(str))
+    return out.tolist()
+
+
+def ip_array_union(arrays: Iterable[np.ndarray]) -> np.ndarray:
+    """
+    Sorted unique union, e.g. of the hosts_up parts of a split scan.
+    """
+    arrays = list(arrays)
+    if not arrays:
+        return EMPTY_IPS
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.unique(np.concatenate(arrays)).astype(np.uint32, copy=False)
+
+
+def ipv4_prefix(ip: str, prefix_len: int) -> int:
+    """
+    Network number of ip at /prefix_len; -1 for anything that is not a dotted quad.
+    """
+    parts = ip.split(".")
+    if len(parts) != 4 or not all(p.isdigit() for p in parts):
+        return -1
+    value = (int(parts[0]) << 24) | (int(parts[1]) << 16) | (int(parts[2]) << 8) | int(parts[3])
+    return value >> (32 - prefix_len)
+
+
+def host_delta(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (new_in_b, removed_from_a) as sorted arrays; inputs must be sorted + unique.
+    """
+    return np.setdiff1d(b, a, assume_unique=True), np.setdiff1d(a, b, assume_unique=True)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
+
+from core.ingest import project_root
+
+
+# Modules on the discovery / ingest-validation / CLI paths. None of these may pull
+# in the data stack at import time; pandas is imported inside the functions that
+# build frames.
+LIGHT_MODULES = (
+    "core.ingest",
+    "core.discovery",
+    "core.nmap_parse",
+    "core.diff",
+    "core.watch",
+    "core.cli",
+)
+HEAVY_PACKAGES = ("pandas", "pyarrow")
+DEFAULT_BUDGET_MS = 250.0
+
+
+@dataclass(frozen=True)
+class ImportTiming:
+    module: str
+    cumulative_ms: float
+    heavy: List[str]  # HEAVY_PACKAGES that got imported
+
+
+def measure_import(module: str, python: str = sys.executable) -> ImportTiming:
+    """
+    Import `module` in a fresh interpreter under `-X importtime` and read back its
+    cumulative import time and which heavy packages it dragged in.
+    """
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=project_root(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()[-2000:]}")
+
+    cumulative_ms = 0.0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        imported.add(name.split(".")[0])
+        if name == module:
+            cumulative_ms = int(parts[1]) / 1000.0
+
+    return ImportTiming(
+        module=module,
+        cumulative_ms=cumulative_ms,
+        heavy=sorted(p for p in HEAVY_PACKAGES if p in imported),
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import time of core modules and check for heavy imports.")
+    parser.add_argument("modules", nargs="*", default=list(LIGHT_MODULES))
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Fail if a module's cumulative import time exceeds this")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        t = measure_import(module)
+        problems = []
+        if t.heavy:
+            problems.append(f"imports {', '.join(t.heavy)}")
+        if t.cumulative_ms > args.budget_ms:
+            problems.append(f"over {args.budget_ms:.0f} ms budget")
+        failed = failed or bool(problems)
+        status = "FAIL " + "; ".join(problems) if problems else "ok"
+        print(f"{module:<24} {t.cumulative_ms:8.1f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
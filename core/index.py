@@ -0,0 +1,503 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.diff import ip_sort_key, load_open_ports_df
+from core.discovery import RunInfo, discover_runs
+
+
+# ----------------------------
+# Models
+# ----------------------------
+
+PortSpec = Tuple[str, int]  # (protocol, port)
+
+BANNER_FIELDS = ("service", "product", "version", "banner", "hostname")
+NGRAM = 3
+
+
+@dataclass(frozen=True)
+class PortHit:
+    network: str
+    run_id: str
+    run_type: str
+    timestamp_str: str
+    ip: str
+    protocol: str
+    port: int
+    service: str
+
+
+@dataclass(frozen=True)
+class BannerHit:
+    network: str
+    run_id: str
+    ip: str
+    protocol: str
+    port: Optional[int]  # None for hostname hits
+    field: str           # one of BANNER_FIELDS
+    value: str
+
+
+def _run_key(run: RunInfo) -> str:
+    # run_id can collide across re-ingests of the same zip; the folder path cannot.
+    return str(run.run_folder)
+
+
+def _run_order(run: RunInfo) -> Tuple[str, str]:
+    return (run.timestamp_str, run.run_name)
+
+
+# ----------------------------
+# Shared run bookkeeping
+# ----------------------------
+
+class _RunIndex(ABC):
+    """
+    Base for indexes fed one run at a time: tracks indexed runs and the newest run
+    per (network, run_type). Subclasses implement _index_run/_unindex_run.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._runs: Dict[str, RunInfo] = {}
+        self._latest: Dict[Tuple[str, str], str] = {}  # (network, run_type) -> run key
+
+    def add_run(self, run: RunInfo, df_open: Optional[pd.DataFrame] = None) -> None:
+        """
+        Index one run. df_open defaults to load_open_ports_df(run).
+        Re-adding an already indexed run replaces its postings.
+        """
+        if df_open is None:
+            df_open = load_open_ports_df(run)
+
+        key = _run_key(run)
+        with self._lock:
+            if key in self._runs:
+                self._drop_run(key)
+            self._runs[key] = run
+            if not df_open.empty:
+                self._index_run(key, df_open)
+            self._update_latest(run)
+
+    def remove_run(self, run: RunInfo) -> None:
+        with self._lock:
+            self._drop_run(_run_key(run))
+
+    def refresh(self, runs: Optional[Iterable[RunInfo]] = None) -> List[RunInfo]:
+        """
+        Sync the index with discover_runs() (or the given runs).
+        Only new runs are parsed; runs that disappeared are dropped.
+        Returns the runs that were newly indexed.
+        """
+        pending = self._sync(list(discover_runs() if runs is None else runs))
+        # Parse outside the lock so queries keep answering while new runs load.
+        for run in pending:
+            self.add_run(run)
+        return pending
+
+    def _sync(self, runs: List[RunInfo]) -> List[RunInfo]:
+        """
+        Drop runs no longer present; return the ones still to be indexed.
+        """
+        wanted = {_run_key(r): r for r in runs}
+        with self._lock:
+            for key in [k for k in self._runs if k not in wanted]:
+                self._drop_run(key)
+            return [r for k, r in wanted.items() if k not in self._runs]
+
+    def _drop_run(self, key: str) -> None:
+        run = self._runs.pop(key, None)
+        if run is None:
+            return
+        self._unindex_run(key)
+
+        group = (run.network, run.run_type)
+        if self._latest.get(group) == key:
+            del self._latest[group]
+            for other in self._runs.values():
+                if (other.network, other.run_type) == group:
+                    self._update_latest(other)
+
+    def _update_latest(self, run: RunInfo) -> None:
+        group = (run.network, run.run_type)
+        current = self._runs.get(self._latest.get(group, ""))
+        if current is None or _run_order(run) >= _run_order(current):
+            self._latest[group] = _run_key(run)
+
+    def _allowed_runs(self, latest_only: bool, network: Optional[str]) -> Set[str]:
+        keys = set(self._latest.values()) if latest_only else set(self._runs)
+        if network:
+            keys = {k for k in keys if self._runs[k].network == network}
+        return keys
+
+    @property
+    def run_count(self) -> int:
+        return len(self._runs)
+
+    @abstractmethod
+    def _index_run(self, key: str, df_open: pd.DataFrame) -> None:
+        """Add postings for one run (non-empty open-port frame). Called under the lock."""
+
+    @abstractmethod
+    def _unindex_run(self, key: str) -> None:
+        """Remove every posting of one run. Called under the lock."""
+
+
+# ----------------------------
+# Port / service inverted index
+# ----------------------------
+
+class PortIndex(_RunIndex):
+    """
+    Inverted index over open ports for every discovered run.
+
+      (protocol, port) -> run -> {ip: service}
+      service name     -> run -> {(protocol, port)}
+
+    Runs are added one at a time, so refresh() only parses runs it has not seen.
+    Safe to share between Streamlit sessions (all mutations hold a lock).
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._by_port: Dict[PortSpec, Dict[str, Dict[str, str]]] = {}
+        self._by_service: Dict[str, Dict[str, Set[PortSpec]]] = {}
+
+    def _index_run(self, key: str, df_open: pd.DataFrame) -> None:
+        services = df_open["service"].fillna("").astype(str) if "service" in df_open else [""] * len(df_open)
+        for ip, protocol, port, service in zip(df_open["ip"], df_open["protocol"], df_open["port"], services):
+            spec = (str(protocol).lower(), int(port))
+            self._by_port.setdefault(spec, {}).setdefault(key, {})[str(ip)] = service
+            svc = service.strip().lower()
+            if svc:
+                self._by_service.setdefault(svc, {}).setdefault(key, set()).add(spec)
+
+    def _unindex_run(self, key: str) -> None:
+        for spec in [s for s, per_run in self._by_port.items() if key in per_run]:
+            del self._by_port[spec][key]
+            if not self._by_port[spec]:
+                del self._by_port[spec]
+        for svc in [s for s, per_run in self._by_service.items() if key in per_run]:
+            del self._by_service[svc][key]
+            if not self._by_service[svc]:
+                del self._by_service[svc]
+
+    # --- queries ---
+
+    def ports(self) -> List[PortSpec]:
+        with self._lock:
+            return sorted(self._by_port)
+
+    def services(self) -> List[str]:
+        with self._lock:
+            return sorted(self._by_service)
+
+    def hosts_with_port(
+        self,
+        port: int,
+        protocol: str = "tcp",
+        latest_only: bool = True,
+        network: Optional[str] = None,
+    ) -> List[PortHit]:
+        """
+        Where is <protocol>/<port> open?
+        latest_only=True answers "right now": only the newest run per (network, run_type).
+        """
+        spec = (protocol.lower(), int(port))
+        with self._lock:
+            per_run = dict(self._by_port.get(spec, {}))
+            allowed = self._allowed_runs(latest_only, network)
+            hits = [
+                self._hit(key, ip, spec, service)
+                for key, hosts in per_run.items()
+                if key in allowed
+                for ip, service in hosts.items()
+            ]
+        return _sort_hits(hits)
+
+    def hosts_with_service(
+        self,
+        service: str,
+        latest_only: bool = True,
+        network: Optional[str] = None,
+    ) -> List[PortHit]:
+        """
+        Same as hosts_with_port, keyed by Nmap service name (case-insensitive, exact).
+        """
+        svc = service.strip().lower()
+        with self._lock:
+            per_run = dict(self._by_service.get(svc, {}))
+            allowed = self._allowed_runs(latest_only, network)
+            hits = []
+            for key, specs in per_run.items():
+                if key not in allowed:
+                    continue
+                for spec in specs:
+                    for ip, service_name in self._by_port.get(spec, {}).get(key, {}).items():
+                        if service_name.strip().lower() == svc:
+                            hits.append(self._hit(key, ip, spec, service_name))
+        return _sort_hits(hits)
+
+    def _hit(self, key: str, ip: str, spec: PortSpec, service: str) -> PortHit:
+        run = self._runs[key]
+        return PortHit(
+            network=run.network,
+            run_id=run.run_id,
+            run_type=run.run_type,
+            timestamp_str=run.timestamp_str,
+            ip=ip,
+            protocol=spec[0],
+            port=spec[1],
+            service=service,
+        )
+
+
+def _sort_hits(hits: List[PortHit]) -> List[PortHit]:
+    return sorted(hits, key=lambda h: (h.network, h.run_id, ip_sort_key(h.ip), h.protocol, h.port))
+
+
+def hits_to_df(hits: List[PortHit]) -> pd.DataFrame:
+    columns = ["network", "run_id", "run_type", "timestamp_str", "ip", "protocol", "port", "service"]
+    return pd.DataFrame([asdict(h) for h in hits], columns=columns)
+
+
+# ----------------------------
+# Banner n-gram index
+# ----------------------------
+
+BannerPosting = Tuple[str, str, Optional[int], str]  # (ip, protocol, port, field)
+
+
+def _ngrams(s: str, n: int = NGRAM) -> Set[str]:
+    return {s[i:i + n] for i in range(len(s) - n + 1)}
+
+
+class BannerIndex(_RunIndex):
+    """
+    Trigram + sorted-value index over service / product / version / hostname strings.
+
+    Each distinct lower-cased value is stored once:
+      trigram -> {value id}
+      value id -> run -> {(ip, protocol, port, field)}
+    plus a sorted list of values for prefix search. "banner" is "<product> <version>",
+    so a query like "OpenSSH 7." matches across the two fields.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._values: List[str] = []  # "" marks a freed id
+        self._free_ids: List[int] = []
+        self._value_ids: Dict[str, int] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._postings: Dict[int, Dict[str, Set[BannerPosting]]] = {}
+        self._sorted: List[str] = []
+        self._sorted_dirty = False
+
+    def _value_id(self, value: str) -> int:
+        vid = self._value_ids.get(value)
+        if vid is None:
+            if self._free_ids:
+                vid = self._free_ids.pop()
+                self._values[vid] = value
+            else:
+                vid = len(self._values)
+                self._values.append(value)
+            self._value_ids[value] = vid
+            for gram in _ngrams(value):
+                self._grams.setdefault(gram, set()).add(vid)
+            self._sorted_dirty = True
+        return vid
+
+    def _post(self, key: str, value: str, posting: BannerPosting) -> None:
+        value = value.strip().lower()
+        if value:
+            self._postings.setdefault(self._value_id(value), {}).setdefault(key, set()).add(posting)
+
+    def _index_run(self, key: str, df_open: pd.DataFrame) -> None:
+        cols = {c: (df_open[c].fillna("").astype(str) if c in df_open else [""] * len(df_open))
+                for c in ("hostname", "service", "product", "version")}
+        for ip, protocol, port, hostname, service, product, version in zip(
+            df_open["ip"], df_open["protocol"], df_open["port"],
+            cols["hostname"], cols["service"], cols["product"], cols["version"],
+        ):
+            ip, protocol, port = str(ip), str(protocol).lower(), int(port)
+            self._post(key, service, (ip, protocol, port, "service"))
+            self._post(key, product, (ip, protocol, port, "product"))
+            self._post(key, version, (ip, protocol, port, "version"))
+            if product.strip() and version.strip():
+                self._post(key, f"{product} {version}", (ip, protocol, port, "banner"))
+            self._post(key, hostname, (ip, "", None, "hostname"))
+
+    def _unindex_run(self, key: str) -> None:
+        for vid in [v for v, per_run in self._postings.items() if key in per_run]:
+            del self._postings[vid][key]
+            if not self._postings[vid]:
+                del self._postings[vid]
+                self._drop_value(vid)
+
+    def _drop_value(self, vid: int) -> None:
+        """
+        Forget a value no run posts any more: its grams, its id (reused later) and
+        its place in the prefix list.
+        """
+        value = self._values[vid]
+        for gram in _ngrams(value):
+            ids = self._grams[gram]
+            ids.discard(vid)
+            if not ids:
+                del self._grams[gram]
+        del self._value_ids[value]
+        self._values[vid] = ""
+        self._free_ids.append(vid)
+        self._sorted_dirty = True
+
+    # --- queries ---
+
+    def search(
+        self,
+        query: str,
+        mode: str = "substring",
+        fields: Optional[Iterable[str]] = None,
+        latest_only: bool = False,
+        network: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[BannerHit]:
+        """
+        Case-insensitive search. mode="substring" (default) or "prefix".
+        Defaults to all runs: advisories usually care about history too.
+        """
+        if mode not in {"substring", "prefix"}:
+            raise ValueError(f"Unknown search mode: {mode}")
+        q = query.strip().lower()
+        if not q:
+            return []
+        wanted_fields = set(fields or BANNER_FIELDS)
+
+        with self._lock:
+            vids = self._match_prefix(q) if mode == "prefix" else self._match_substring(q)
+            allowed = self._allowed_runs(latest_only, network)
+            hits: List[BannerHit] = []
+            for vid in vids:
+                for key, postings in self._postings.get(vid, {}).items():
+                    if key not in allowed:
+                        continue
+                    run = self._runs[key]
+                    for ip, protocol, port, field in postings:
+                        if field in wanted_fields:
+                            hits.append(BannerHit(run.network, run.run_id, ip, protocol, port, field, self._values[vid]))
+
+        hits.sort(key=lambda h: (h.network, h.run_id, ip_sort_key(h.ip), h.port or 0, h.field))
+        return hits[:limit] if limit else hits
+
+    def _match_substring(self, q: str) -> List[int]:
+        if len(q) < NGRAM:
+            return [vid for vid, v in enumerate(self._values) if q in v]
+
+        gram_sets = [self._grams.get(g) for g in _ngrams(q)]
+        if any(s is None for s in gram_sets):
+            return []
+        gram_sets.sort(key=len)
+        candidates = set(gram_sets[0])
+        for s in gram_sets[1:]:
+            candidates &= s
+            if not candidates:
+                return []
+        # Trigrams are a filter only: verify the real substring.
+        return [vid for vid in candidates if q in self._values[vid]]
+
+    def _match_prefix(self, q: str) -> List[int]:
+        if self._sorted_dirty:
+            self._sorted = sorted(self._value_ids)
+            self._sorted_dirty = False
+        out = []
+        for value in self._sorted[bisect.bisect_left(self._sorted, q):]:
+            if not value.startswith(q):
+                break
+            out.append(self._value_ids[value])
+        return out
+
+
+def banner_hits_to_df(hits: List[BannerHit]) -> pd.DataFrame:
+    columns = ["network", "run_id", "ip", "protocol", "port", "field", "value"]
+    return pd.DataFrame([asdict(h) for h in hits], columns=columns).astype({"port": "Int64"})
+
+
+# ----------------------------
+# Process-wide instances
+# ----------------------------
+
+# Queries never walk data/extracted themselves: runs ingested in this process are
+# added as they land (index_new_runs), and a full discover_runs() sync happens on
+# request or once the last one is older than the caller's max_age.
+INDEX_TTL_SECONDS = 300.0
+
+_PORT_INDEX = PortIndex()
+_BANNER_INDEX = BannerIndex()
+_REFRESH_LOCK = threading.Lock()
+_last_sync: Optional[float] = None  # time.monotonic() of the last full sync
+
+
+def refresh_fleet_indexes(runs: Optional[Iterable[RunInfo]] = None) -> List[RunInfo]:
+    """
+    Bring the shared port and banner indexes up to date.
+    Each newly discovered run is parsed once and fed to both.
+    """
+    global _last_sync
+    runs = list(discover_runs() if runs is None else runs)
+    with _REFRESH_LOCK:
+        pending_port = _PORT_INDEX._sync(runs)
+        pending_banner = _BANNER_INDEX._sync(runs)
+        pending = {_run_key(r): r for r in pending_port + pending_banner}
+        _add_to_both(pending.values(), pending_port, pending_banner)
+        _last_sync = time.monotonic()
+    return list(pending.values())
+
+
+def _add_to_both(runs: Iterable[RunInfo], to_port: List[RunInfo], to_banner: List[RunInfo]) -> None:
+    for run in runs:
+        df_open = load_open_ports_df(run)
+        if run in to_port:
+            _PORT_INDEX.add_run(run, df_open)
+        if run in to_banner:
+            _BANNER_INDEX.add_run(run, df_open)
+
+
+def index_new_runs(runs: Iterable[RunInfo]) -> None:
+    """
+    Add just-ingested runs to the shared indexes, without a discovery walk.
+    A no-op until the indexes were first synced: that sync picks the runs up.
+    """
+    runs = list(runs)
+    with _REFRESH_LOCK:
+        if _last_sync is None or not runs:
+            return
+        _add_to_both(runs, runs, runs)
+
+
+def _maybe_refresh(refresh: bool, max_age: Optional[float]) -> None:
+    stale = max_age is not None and (_last_sync is None or time.monotonic() - _last_sync > max_age)
+    if refresh or stale:
+        refresh_fleet_indexes()
+
+
+def get_port_index(refresh: bool = False, max_age: Optional[float] = None) -> PortIndex:
+    """
+    Shared index for this process (Streamlit sessions, CLI, watch daemon).
+    refresh=True re-syncs with discover_runs(); so does a last sync older than
+    max_age seconds (or none yet). Otherwise no filesystem access at all.
+    """
+    _maybe_refresh(refresh, max_age)
+    return _PORT_INDEX
+
+
+def get_banner_index(refresh: bool = False, max_age: Optional[float] = None) -> BannerIndex:
+    _maybe_refresh(refresh, max_age)
+    return _BANNER_INDEX
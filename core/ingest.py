@@ -1,17 +1,68 @@
 from __future__ import annotations
 
+import fnmatch
+import os
 import re
+import threading
 import uuid
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path, PurePosixPath
 from typing import Dict, List, Optional, Tuple
 
+from core.storage import atomic_write_bytes, staged_dir
+
 
 RUN_FOLDER_RE = re.compile(r"^(?P<date>\d{4}-\d{2}-\d{2})_(?P<hm>\d{4})_(?P<rest>.+)$")
 MAX_ZIP_ENTRY_COUNT = 2000
 MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES = 250 * 1024 * 1024
+ZIP_EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+ZIP_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def _with_parts(*names: str) -> List[str]:
+    """
+    names plus their split-scan variants: one nmap process per target slice writes
+    <stem>.partNN.<ext> (e.g. ports_top200_open.part01.xml).
+    """
+    parts = [f"{stem}.part*.{ext}" for stem, ext in (n.rsplit(".", 1) for n in names)]
+    return list(names) + parts
+
+
+# label -> filename globs used by find_key_files (baselinekit_v0 + smoketest outputs)
+KEY_FILE_PATTERNS: Dict[str, List[str]] = {
+    "discovery": _with_parts(
+        "discovery_ping_sweep.xml", "discovery_ping_sweep.nmap", "discovery_ping_sweep.gnmap",
+        "discovery_smoke.xml", "discovery_smoke.nmap", "discovery_smoke.gnmap",
+    ),
+    "hosts_up": _with_parts("hosts_up.txt"),
+    "ports": _with_parts(
+        "ports_top200_open.xml", "ports_top200_open.nmap", "ports_top200_open.gnmap",
+    ),
+    "http_titles": _with_parts(
+        "http_titles.xml", "http_titles.nmap", "http_titles.gnmap",
+    ),
+    "infra_services": _with_parts(
+        "infra_services_gw.xml", "infra_services_gw.nmap", "infra_services_gw.gnmap",
+        "infra_services.xml", "infra_services.nmap", "infra_services.gnmap",
+    ),
+    "gateway_smoke": _with_parts(
+        "gw_ports_smoke.xml", "gw_ports_smoke.nmap", "gw_ports_smoke.gnmap",
+    ),
+    "snapshots": ["arp*", "ipconfig*", "route*"],
+}
+# Labels whose globs are too loose to trust anywhere in an archive: only files
+# directly inside a run folder (where find_key_files looks) count.
+RUN_FOLDER_ONLY_LABELS = {"snapshots"}
+
+# Any scan output is kept too: detect_run_folders / core.diff.pick_ports_xmls fall back to *.xml.
+SCAN_OUTPUT_SUFFIXES = {".xml", ".nmap", ".gnmap"}
+
+# All that is left of a run folder pruned after compaction (core.history): its
+# hosts and open ports are read back from the history store the marker names.
+COMPACTED_MARKER = "COMPACTED.json"
 
 
 @dataclass(frozen=True)
@@ -22,6 +73,10 @@ class RunMeta:
     key_files: Dict[str, List[Path]]  # label -> list of paths
 
 
+def is_compacted(run_folder: Path) -> bool:
+    return (Path(run_folder) / COMPACTED_MARKER).is_file()
+
+
 def ensure_dir(p: Path) -> Path:
     p.mkdir(parents=True, exist_ok=True)
     return p
@@ -45,8 +100,7 @@ def save_upload(uploaded_file, uploads_dir: Optional[Path] = None) -> Path:
 
     upload_id = uuid.uuid4().hex[:10]
     out_path = uploads_dir / f"{Path(uploaded_file.name).stem}_{upload_id}.zip"
-    out_path.write_bytes(uploaded_file.getbuffer())
-    return out_path
+    return atomic_write_bytes(out_path, uploaded_file.getbuffer())
 
 
 def _validate_zip_member(member: zipfile.ZipInfo, out_dir: Path) -> None:
@@ -74,38 +128,173 @@ def _validate_zip_member(member: zipfile.ZipInfo, out_dir: Path) -> None:
         raise ValueError(f"Unsafe ZIP entry rejected: {name}") from exc
 
 
-def _inspect_zip_before_extraction(z: zipfile.ZipFile, out_dir: Path) -> None:
+def is_key_member(member: zipfile.ZipInfo) -> bool:
+    """
+    True for members find_key_files (or the *.xml fallbacks) would ever look at.
+    Snapshot globs only match directly inside a run folder, where find_key_files
+    looks; elsewhere they would pull in any route*.js or arp*.png.
+    """
+    if member.is_dir():
+        return False
+    path = PurePosixPath(member.filename)
+    if path.suffix.lower() in SCAN_OUTPUT_SUFFIXES:
+        return True
+    in_run_folder = RUN_FOLDER_RE.match(path.parent.name) is not None
+    return any(
+        fnmatch.fnmatch(path.name, g)
+        for label, globs in KEY_FILE_PATTERNS.items()
+        if in_run_folder or label not in RUN_FOLDER_ONLY_LABELS
+        for g in globs
+    )
+
+
+def inspect_zip_before_extraction(
+    z: zipfile.ZipFile,
+    out_dir: Path,
+    key_files_only: bool = False,
+) -> List[zipfile.ZipInfo]:
+    """
+    Validate every entry name and the entry count, then check the declared size of
+    the entries that will be extracted. Returns those entries.
+    """
     members = z.infolist()
     if len(members) > MAX_ZIP_ENTRY_COUNT:
         raise ValueError(f"ZIP archive has too many entries: {len(members)} > {MAX_ZIP_ENTRY_COUNT}")
 
-    total_uncompressed_bytes = 0
     for member in members:
         _validate_zip_member(member, out_dir)
+
+    selected = [m for m in members if is_key_member(m)] if key_files_only else members
+
+    total_uncompressed_bytes = 0
+    for member in selected:
         total_uncompressed_bytes += member.file_size
         if total_uncompressed_bytes > MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES:
             raise ValueError(
                 "ZIP archive uncompressed size exceeds limit: "
                 f"{total_uncompressed_bytes} > {MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES}"
             )
+    return selected
+
 
+class _ByteBudget:
+    """
+    Running count of bytes actually written, shared by extraction workers.
+    Declared sizes can lie; this cannot.
+    """
 
-def extract_zip(zip_path: Path, out_dir: Optional[Path] = None) -> Path:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+        self.abort = threading.Event()
+
+    def consume(self, n: int) -> None:
+        with self._lock:
+            self.used += n
+            if self.used > self.limit:
+                self.abort.set()
+                raise ValueError(
+                    "ZIP archive uncompressed size exceeds limit: "
+                    f"{self.used} > {self.limit} (bytes written)"
+                )
+
+
+def _extract_members(zip_path: Path, members: List[zipfile.ZipInfo], out_dir: Path, budget: _ByteBudget) -> None:
+    # One ZipFile handle per worker: ZipFile objects are not safe to read concurrently.
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            for member in members:
+                if budget.abort.is_set():
+                    return
+                target = out_dir.joinpath(*[s for s in member.filename.split("/") if s])
+                if member.is_dir():
+                    ensure_dir(target)
+                    continue
+
+                ensure_dir(target.parent)
+                written = 0
+                with z.open(member) as src, open(target, "wb") as dst:
+                    while not budget.abort.is_set():
+                        chunk = src.read(ZIP_COPY_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        written += len(chunk)
+                        if written > member.file_size:
+                            raise ValueError(f"ZIP entry larger than declared size: {member.filename}")
+                        budget.consume(len(chunk))
+                        dst.write(chunk)
+    except BaseException:
+        # Tell the other workers to stop instead of finishing their share.
+        budget.abort.set()
+        raise
+
+
+def _partition_by_size(members: List[zipfile.ZipInfo], n: int) -> List[List[zipfile.ZipInfo]]:
+    """
+    Greedy largest-first split so workers finish at roughly the same time.
+    """
+    buckets: List[List[zipfile.ZipInfo]] = [[] for _ in range(n)]
+    loads = [0] * n
+    for member in sorted(members, key=lambda m: m.file_size, reverse=True):
+        i = loads.index(min(loads))
+        buckets[i].append(member)
+        loads[i] += member.file_size
+    return [b for b in buckets if b]
+
+
+def extract_zip(
+    zip_path: Path,
+    out_dir: Optional[Path] = None,
+    key_files_only: bool = True,
+    workers: Optional[int] = None,
+) -> Path:
     """
     Extract zip to: data/extracted/<zip_stem>_<id>/
     Returns the extracted root folder path.
+
+    By default only scan outputs and key files are extracted (logs, screenshots etc.
+    are skipped), members are decompressed in parallel, and the bytes actually
+    written are counted against MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES so a lying archive
+    stops early.
+
+    out_dir must not exist: it is built under a staging name and renamed into place
+    once every member is written, so concurrent readers never see a half-extracted
+    run, and any failure removes the partial extraction.
     """
     root = project_root()
     out_dir = out_dir or (root / "data" / "extracted" / f"{zip_path.stem}_{uuid.uuid4().hex[:8]}")
+    if out_dir.exists():
+        raise FileExistsError(f"Extraction target already exists: {out_dir}")
 
     with zipfile.ZipFile(zip_path, "r") as z:
-        _inspect_zip_before_extraction(z, out_dir)
-        out_dir = ensure_dir(out_dir)
-        z.extractall(out_dir)
+        members = inspect_zip_before_extraction(z, out_dir, key_files_only=key_files_only)
 
+    with staged_dir(out_dir) as staging:
+        _extract_all(zip_path, members, staging, workers)
     return out_dir
 
 
+def _extract_all(zip_path: Path, members: List[zipfile.ZipInfo], out_dir: Path, workers: Optional[int]) -> None:
+    budget = _ByteBudget(MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES)
+    n_workers = max(1, min(workers or ZIP_EXTRACT_WORKERS, len(members)))
+
+    try:
+        if n_workers == 1:
+            _extract_members(zip_path, members, out_dir, budget)
+        else:
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                futures = [
+                    pool.submit(_extract_members, zip_path, part, out_dir, budget)
+                    for part in _partition_by_size(members, n_workers)
+                ]
+                for f in futures:
+                    f.result()
+    except BaseException:
+        budget.abort.set()
+        raise
+
+
 def _parse_run_folder_name(name: str) -> Tuple[Optional[datetime], str]:
     """
     Example: 2025-12-31_2044_baselinekit_v0 -> (datetime, "baselinekit_v0")
@@ -144,7 +333,7 @@ def detect_run_folders(extracted_root: Path) -> List[Path]:
             if d.is_dir():
                 ts, run_type = _parse_run_folder_name(d.name)
                 if ts or run_type:
-                    if any(d.glob("*.xml")) or any(d.glob("*.nmap")) or any(d.glob("*.gnmap")):
+                    if any(d.glob("*.xml")) or any(d.glob("*.nmap")) or any(d.glob("*.gnmap")) or is_compacted(d):
                         run_candidates.append(d)
 
     unique = list({p.resolve(): p for p in run_candidates}.values())
@@ -163,30 +352,8 @@ def find_key_files(run_folder: Path) -> Dict[str, List[Path]]:
     """
     run_folder = Path(run_folder)
 
-    patterns = {
-        "discovery": [
-            "discovery_ping_sweep.xml", "discovery_ping_sweep.nmap", "discovery_ping_sweep.gnmap",
-            "discovery_smoke.xml", "discovery_smoke.nmap", "discovery_smoke.gnmap",
-        ],
-        "hosts_up": ["hosts_up.txt"],
-        "ports": [
-            "ports_top200_open.xml", "ports_top200_open.nmap", "ports_top200_open.gnmap",
-        ],
-        "http_titles": [
-            "http_titles.xml", "http_titles.nmap", "http_titles.gnmap",
-        ],
-        "infra_services": [
-            "infra_services_gw.xml", "infra_services_gw.nmap", "infra_services_gw.gnmap",
-            "infra_services.xml", "infra_services.nmap", "infra_services.gnmap",
-        ],
-        "gateway_smoke": [
-            "gw_ports_smoke.xml", "gw_ports_smoke.nmap", "gw_ports_smoke.gnmap",
-        ],
-        "snapshots": ["arp*", "ipconfig*", "route*"],
-    }
-
     found: Dict[str, List[Path]] = {}
-    for label, globs in patterns.items():
+    for label, globs in KEY_FILE_PATTERNS.items():
         hits: List[Path] = []
         for g in globs:
             hits.extend(run_folder.glob(g))
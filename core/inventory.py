@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import csv
+import ipaddress
+import json
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.cache import cached_parse
+from core.diff import load_host_array, load_open_ports_df, sort_ips
+from core.discovery import RunInfo
+from core.hosts import ip_array_from_strings, ip_array_to_strings, ip_array_union
+from core.ingest import project_root
+from core.storage import atomic_write_bytes
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+# Asset-inventory reconciliation: which up hosts are not in the inventory, which
+# open ports an asset is not expected to have, which assets did not show up.
+# Hosts are matched to assets by exact IP, then MAC, then the longest CIDR that
+# contains them. All three are array / hash joins: a sorted uint32 array of exact
+# IPs, one sorted array of network numbers per prefix length, and a MAC dict.
+
+# Accepted column names (CSV header / JSON keys), first match wins.
+FIELD_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "target": ("ip", "cidr", "address", "target", "network"),
+    "mac": ("mac", "mac_address"),
+    "owner": ("owner", "team"),
+    "name": ("name", "hostname", "asset"),
+    "expected_ports": ("expected_ports", "ports"),
+}
+INVENTORY_SUFFIXES = (".csv", ".json")
+NO_PORTS = ("none", "-")   # expected_ports value meaning "no open ports allowed"
+
+UNKNOWN_COLUMNS = ["ip", "mac", "open_ports"]
+UNEXPECTED_COLUMNS = ["ip", "asset", "owner", "match", "protocol", "port", "service", "product", "version"]
+MISSING_COLUMNS = ["target", "mac", "name", "owner"]
+
+_PORT_RE = re.compile(r"^(?:(tcp|udp)[/:])?(\d{1,5})(?:/(tcp|udp))?$", re.I)
+_MAC_STRIP_RE = re.compile(r"[^0-9a-f]")
+
+PortSpec = Tuple[str, int]   # (protocol, port)
+
+
+# ----------------------------
+# Models
+# ----------------------------
+
+@dataclass(frozen=True)
+class Asset:
+    target: str                                   # "10.0.0.5", "10.0.1.0/24", or "" for MAC-only
+    mac: str                                      # normalized aa:bb:cc:dd:ee:ff, or ""
+    owner: str
+    name: str
+    expected_ports: Optional[FrozenSet[PortSpec]]  # None = ports not checked
+
+    @property
+    def is_range(self) -> bool:
+        return "/" in self.target
+
+    @property
+    def label(self) -> str:
+        return self.name or self.target or self.mac
+
+
+@dataclass(frozen=True)
+class AssetIndex:
+    assets: List[Asset]
+    exact_ips: np.ndarray                            # sorted uint32
+    exact_idx: np.ndarray                            # asset index per exact_ips entry
+    ranges: Dict[int, Tuple[np.ndarray, np.ndarray]]  # prefix_len -> (sorted network numbers, asset index)
+    by_ip_str: Dict[str, int]                        # non-IPv4 exact addresses
+    by_mac: Dict[str, int]
+    port_checked: np.ndarray                         # bool per asset: has expected_ports
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    def match(self, ips: np.ndarray, macs: Optional[Dict[str, str]] = None) -> Tuple[np.ndarray, List[str]]:
+        """
+        Asset index per IPv4 in ips (-1 = unknown) and how each was matched
+        ("ip", "mac", "cidr/<len>" or "").
+        """
+        ips = np.asarray(ips, dtype=np.uint32)
+        out = np.full(len(ips), -1, dtype=np.int64)
+        how = np.full(len(ips), "", dtype=object)
+
+        _lookup_sorted(self.exact_ips, self.exact_idx, ips, out, how, "ip")
+
+        if macs and self.by_mac:
+            todo = np.flatnonzero(out < 0)
+            for i, ip in zip(todo.tolist(), ip_array_to_strings(ips[todo])):
+                idx = self.by_mac.get(normalize_mac(macs.get(ip, "")), -1)
+                if idx >= 0:
+                    out[i], how[i] = idx, "mac"
+
+        # Longest prefix first, so a /28 entry wins over the /16 around it.
+        for prefix_len in sorted(self.ranges, reverse=True):
+            nets, idx = self.ranges[prefix_len]
+            probe = ips >> np.uint32(32 - prefix_len) if prefix_len else np.zeros_like(ips)
+            _lookup_sorted(nets, idx, probe, out, how, f"cidr/{prefix_len}")
+        return out, how.tolist()
+
+
+def _lookup_sorted(keys: np.ndarray, idx: np.ndarray, probe: np.ndarray,
+                   out: np.ndarray, how: np.ndarray, label: str) -> None:
+    # Fills only still-unmatched slots.
+    if len(keys) == 0:
+        return
+    todo = out < 0
+    pos = np.minimum(np.searchsorted(keys, probe), len(keys) - 1)
+    hit = todo & (keys[pos] == probe)
+    out[hit] = idx[pos[hit]]
+    how[hit] = label
+
+
+@dataclass(frozen=True)
+class Reconciliation:
+    run: RunInfo
+    assets: int
+    hosts: int
+    matched_hosts: int
+    unknown_hosts: pd.DataFrame       # UNKNOWN_COLUMNS
+    unexpected_ports: pd.DataFrame    # UNEXPECTED_COLUMNS
+    missing_assets: pd.DataFrame      # MISSING_COLUMNS
+
+    def summary(self) -> Dict:
+        return {
+            "network": self.run.network,
+            "run_id": self.run.run_id,
+            "assets": self.assets,
+            "hosts": self.hosts,
+            "matched_hosts": self.matched_hosts,
+            "unknown_hosts": len(self.unknown_hosts),
+            "unexpected_ports": len(self.unexpected_ports),
+            "missing_assets": len(self.missing_assets),
+        }
+
+
+# ----------------------------
+# Loading
+# ----------------------------
+
+def normalize_mac(mac: str) -> str:
+    digits = _MAC_STRIP_RE.sub("", str(mac or "").lower())
+    if len(digits) != 12:
+        return ""
+    return ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def parse_expected_ports(value) -> Optional[FrozenSet[PortSpec]]:
+    """
+    "22, 443/tcp, udp/53" or [22, "53/udp"] -> {("tcp", 22), ("tcp", 443), ("udp", 53)}.
+    Blank -> None (not checked); "none" -> empty set (no open port expected).
+    """
+    if value is None:
+        return None
+    items = value if isinstance(value, (list, tuple)) else re.split(r"[,;\s]+", str(value).strip())
+    items = [str(i).strip() for i in items if str(i).strip()]
+    if not items:
+        return None
+    if len(items) == 1 and items[0].lower() in NO_PORTS:
+        return frozenset()
+
+    out = set()
+    for item in items:
+        m = _PORT_RE.match(item)
+        if not m or int(m.group(2)) > 65535:
+            raise ValueError(f"Invalid expected port: {item!r}")
+        out.add(((m.group(1) or m.group(3) or "tcp").lower(), int(m.group(2))))
+    return frozenset(out)
+
+
+def _ipv4_int(text: str) -> Optional[int]:
+    # Fast path for plain dotted quads (the bulk of any inventory); ipaddress is ~20x slower.
+    parts = text.split(".")
+    if len(parts) != 4 or not all(p.isdigit() and len(p) <= 3 for p in parts):
+        return None
+    a, b, c, d = (int(p) for p in parts)
+    if max(a, b, c, d) > 255:
+        return None
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def _canonical_target(target: str) -> str:
+    """
+    "10.0.0.05" -> "10.0.0.5", "10.0.1.7/24" -> "10.0.1.0/24", "10.0.0.5/32" -> "10.0.0.5".
+    """
+    value = _ipv4_int(target)
+    if value is not None:
+        return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+    net = ipaddress.ip_network(target, strict=False)
+    return str(net.network_address) if net.num_addresses == 1 else str(net)
+
+
+def _field(record: Dict, name: str):
+    for alias in FIELD_ALIASES[name]:
+        if alias in record and record[alias] not in (None, ""):
+            return record[alias]
+    return None
+
+
+def _read_records(path: Path) -> List[Dict]:
+    if path.suffix.lower() == ".json":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            data = data.get("assets", [])
+        if not isinstance(data, list):
+            raise ValueError(f"Inventory JSON must be a list of assets (or {{\"assets\": [...]}}): {path}")
+        return [{str(k).strip().lower(): v for k, v in r.items()} for r in data]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames or []]
+        return list(reader)
+
+
+def parse_assets(records: Iterable[Dict]) -> List[Asset]:
+    """
+    Inventory records (lower-case keys, see FIELD_ALIASES) -> validated assets.
+    """
+    assets: List[Asset] = []
+    for n, record in enumerate(records, start=1):
+        target, mac = str(_field(record, "target") or "").strip(), normalize_mac(_field(record, "mac") or "")
+        if target:
+            try:
+                target = _canonical_target(target)
+            except ValueError:
+                raise ValueError(f"Inventory row {n}: invalid IP/CIDR {target!r}") from None
+        elif not mac:
+            raise ValueError(f"Inventory row {n}: needs an IP/CIDR or a MAC")
+        try:
+            expected = parse_expected_ports(_field(record, "expected_ports"))
+        except ValueError as e:
+            raise ValueError(f"Inventory row {n}: {e}") from None
+        assets.append(Asset(
+            target=target,
+            mac=mac,
+            owner=str(_field(record, "owner") or "").strip(),
+            name=str(_field(record, "name") or "").strip(),
+            expected_ports=expected,
+        ))
+    return assets
+
+
+def merge_duplicates(assets: Sequence[Asset]) -> List[Asset]:
+    """
+    One asset per IP/CIDR (or per MAC for MAC-only rows), first row first. Later
+    rows for the same target only fill in what the first left blank, and their
+    expected ports are added to the first row's.
+    """
+    merged: Dict[str, Asset] = {}
+    for a in assets:
+        key = a.target or f"mac:{a.mac}"
+        first = merged.get(key)
+        if first is None:
+            merged[key] = a
+            continue
+        if first.expected_ports is None or a.expected_ports is None:
+            expected = first.expected_ports if a.expected_ports is None else a.expected_ports
+        else:
+            expected = first.expected_ports | a.expected_ports
+        merged[key] = Asset(
+            target=first.target,
+            mac=first.mac or a.mac,
+            owner=first.owner or a.owner,
+            name=first.name or a.name,
+            expected_ports=expected,
+        )
+    if len(merged) < len(assets):
+        log.warning("inventory: %d duplicate IP/CIDR/MAC rows merged into the first", len(assets) - len(merged))
+    return list(merged.values())
+
+
+def build_index(assets: Sequence[Asset]) -> AssetIndex:
+    assets = merge_duplicates(assets)
+    exact: Dict[int, int] = {}
+    ranges: Dict[int, Dict[int, int]] = {}
+    by_ip_str: Dict[str, int] = {}
+    by_mac: Dict[str, int] = {}
+
+    for i, a in enumerate(assets):
+        if a.mac:
+            by_mac.setdefault(a.mac, i)
+        if not a.target:
+            continue
+        value = _ipv4_int(a.target)
+        if value is not None:
+            exact[value] = i
+            continue
+        net = ipaddress.ip_network(a.target)
+        if net.version != 4:  # IPv6: exact addresses only
+            by_ip_str[a.target] = i
+        else:
+            ranges.setdefault(net.prefixlen, {})[int(net.network_address) >> (32 - net.prefixlen)] = i
+
+    def sorted_pair(d: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        keys = np.fromiter(d.keys(), dtype=np.uint32, count=len(d))
+        vals = np.fromiter(d.values(), dtype=np.int64, count=len(d))
+        order = np.argsort(keys, kind="stable")
+        return keys[order], vals[order]
+
+    exact_ips, exact_idx = sorted_pair(exact)
+    return AssetIndex(
+        assets=assets,
+        exact_ips=exact_ips,
+        exact_idx=exact_idx,
+        ranges={plen: sorted_pair(d) for plen, d in ranges.items()},
+        by_ip_str=by_ip_str,
+        by_mac=by_mac,
+        port_checked=np.array([a.expected_ports is not None for a in assets], dtype=bool),
+    )
+
+
+def inventory_dir() -> Path:
+    return project_root() / "data" / "inventory"
+
+
+def save_inventory(name: str, data: bytes, out_dir: Optional[Path] = None) -> Path:
+    """
+    Store an uploaded inventory as data/inventory/<name> (replaced atomically).
+    """
+    suffix = Path(name).suffix.lower()
+    if suffix not in INVENTORY_SUFFIXES:
+        raise ValueError(f"Inventory must be one of {', '.join(INVENTORY_SUFFIXES)}: {name}")
+    return atomic_write_bytes((out_dir or inventory_dir()) / Path(name).name, data)
+
+
+def load_inventory(path: Path) -> AssetIndex:
+    """
+    CSV or JSON inventory -> AssetIndex, parsed once per file version (core.cache).
+    """
+    path = Path(path)
+    return cached_parse("inventory", [path], lambda: build_index(parse_assets(_read_records(path))))
+
+
+# ----------------------------
+# Reconciliation
+# ----------------------------
+
+def _run_macs(run: RunInfo) -> Dict[str, str]:
+    from core.run_data import load_run_data
+
+    hosts = load_run_data(run.run_folder).hosts
+    hosts = hosts[hosts["mac"] != ""].drop_duplicates("ip")
+    return dict(zip(hosts["ip"], hosts["mac"]))
+
+
+def reconcile_run(run: RunInfo, index: AssetIndex) -> Reconciliation:
+    """
+    Reconcile one run's up hosts and open ports against the inventory.
+    MACs are only parsed out of the run when the inventory has any.
+    """
+    import pandas as pd
+
+    df_open = load_open_ports_df(run)
+    if df_open.empty:
+        df_open = pd.DataFrame(columns=["ip", "protocol", "port", "service", "product", "version"])
+    hosts = ip_array_union([load_host_array(run), ip_array_from_strings(df_open["ip"].unique())])
+    macs = _run_macs(run) if index.by_mac else None
+
+    asset_idx, how = index.match(hosts, macs)
+    host_strs = ip_array_to_strings(hosts)
+    idx_by_ip = dict(zip(host_strs, asset_idx.tolist()))
+    how_by_ip = dict(zip(host_strs, how))
+    for ip in set(df_open["ip"]) - set(idx_by_ip):  # IPv6 etc.: exact string match only
+        idx_by_ip[ip] = index.by_ip_str.get(ip, -1)
+        how_by_ip[ip] = "ip" if idx_by_ip[ip] >= 0 else ""
+
+    # Unknown devices: up hosts (or hosts with open ports) no asset claims.
+    port_counts = df_open.drop_duplicates(["ip", "protocol", "port"]).groupby("ip").size()
+    unknown_ips = sort_ips([ip for ip, i in idx_by_ip.items() if i < 0])
+    unknown = pd.DataFrame({
+        "ip": unknown_ips,
+        "mac": [(macs or {}).get(ip, "") for ip in unknown_ips],
+        "open_ports": [int(port_counts.get(ip, 0)) for ip in unknown_ips],
+    }, columns=UNKNOWN_COLUMNS)
+
+    # Unexpected ports: hash join of (asset, protocol, port) against the expected set.
+    row_idx = df_open["ip"].map(idx_by_ip).fillna(-1).astype(np.int64).to_numpy()
+    if index.port_checked.any():
+        checked = (row_idx >= 0) & index.port_checked[np.maximum(row_idx, 0)]
+    else:  # empty inventory, or no asset lists expected ports
+        checked = np.zeros(len(row_idx), dtype=bool)
+    rows, rows_idx = df_open[checked], row_idx[checked].tolist()
+    expected = {(i, proto, port) for i in set(rows_idx) for proto, port in index.assets[i].expected_ports}
+    flags = np.array([k not in expected for k in zip(rows_idx, rows["protocol"].tolist(), rows["port"].tolist())],
+                     dtype=bool)
+    bad, bad_idx = rows[flags], [i for i, f in zip(rows_idx, flags.tolist()) if f]
+    unexpected = pd.DataFrame({
+        "ip": bad["ip"].tolist(),
+        "asset": [index.assets[i].label for i in bad_idx],
+        "owner": [index.assets[i].owner for i in bad_idx],
+        "match": [how_by_ip[ip] for ip in bad["ip"]],
+        "protocol": bad["protocol"].tolist(),
+        "port": bad["port"].tolist(),
+        "service": bad["service"].tolist(),
+        "product": bad["product"].tolist(),
+        "version": bad["version"].tolist(),
+    }, columns=UNEXPECTED_COLUMNS).drop_duplicates(["ip", "protocol", "port"])
+
+    # Missing: single-address or MAC-only assets nothing in the run matched. Ranges
+    # describe where hosts may be, not that every address must be up.
+    seen = {i for i in idx_by_ip.values() if i >= 0}
+    missing = [a for i, a in enumerate(index.assets) if i not in seen and not a.is_range]
+    missing_df = pd.DataFrame([[a.target, a.mac, a.name, a.owner] for a in missing], columns=MISSING_COLUMNS)
+
+    return Reconciliation(
+        run=run,
+        assets=len(index),
+        hosts=len(idx_by_ip),
+        matched_hosts=sum(1 for i in idx_by_ip.values() if i >= 0),
+        unknown_hosts=unknown,
+        unexpected_ports=unexpected.reset_index(drop=True),
+        missing_assets=missing_df,
+    )
@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zipfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+
+# End-to-end load scenario: generate a synthetic fleet of baselinekit zips, then
+# run every pipeline stage over it (ingest, discovery, scorecard, consecutive
+# diffs per network) and record per-stage throughput, latency percentiles and
+# tracemalloc peak memory. Budgets turn it into a regression gate:
+#
+#   python -m core.loadtest --networks 24 --runs 100 --hosts 2000 \
+#       --budget diff.p95_ms=400 --budget scorecard.peak_mb=300 --json report.json
+#
+# The parse cache is cleared before each stage so every stage pays for its own
+# parsing, as a fresh worker process would. Peak memory comes from a second,
+# untimed pass of each stage under tracemalloc; --no-memory skips it.
+
+STAGES = ("generate", "ingest", "discovery", "scorecard", "diff")
+BUDGET_METRICS = ("p50_ms", "p95_ms", "p99_ms", "total_s", "peak_mb", "ops_per_s")
+RUN_TYPE = "baselinekit_v0"
+DISCOVERY_REPEATS = 5
+SPARE_HOST_FACTOR = 1.25        # address pool per network vs live hosts, for churn
+MAX_HOSTS_PER_NETWORK = int(256 * 250 / SPARE_HOST_FACTOR)
+# What run_scenario writes under work_dir; all a user-supplied --work-dir ever loses.
+SCENARIO_SUBDIRS = ("drop", "extracted", "fingerprints")
+
+# (port, service, product, version) drawn for synthetic hosts; mixes risky and benign.
+PORT_POOL: Tuple[Tuple[int, str, str, str], ...] = (
+    (22, "ssh", "OpenSSH", "8.9p1"),
+    (80, "http", "nginx", "1.24.0"),
+    (443, "https", "nginx", "1.24.0"),
+    (445, "microsoft-ds", "", ""),
+    (3389, "ms-wbt-server", "", ""),
+    (8080, "http-proxy", "", ""),
+    (53, "domain", "dnsmasq", "2.89"),
+    (161, "snmp", "", ""),
+    (631, "ipp", "CUPS", "2.4"),
+    (9100, "jetdirect", "", ""),
+    (23, "telnet", "BusyBox telnetd", ""),
+    (5900, "vnc", "", ""),
+)
+PORT_POOL_BY_PORT = {p[0]: p for p in PORT_POOL}
+
+
+# ----------------------------
+# Models
+# ----------------------------
+
+@dataclass(frozen=True)
+class Scenario:
+    networks: int = 4
+    runs_per_network: int = 10
+    hosts: int = 500               # live hosts per network per run (before churn)
+    ports_per_host: int = 3        # average open ports per host
+    churn: float = 0.05            # fraction of hosts / ports that change run to run
+    seed: int = 1
+
+
+@dataclass
+class StageResult:
+    name: str
+    latencies_ms: List[float] = field(default_factory=list)
+    total_s: float = 0.0
+    peak_mb: Optional[float] = None
+
+    @property
+    def ops(self) -> int:
+        return len(self.latencies_ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+    def metrics(self) -> Dict[str, float]:
+        out = {
+            "ops": self.ops,
+            "total_s": round(self.total_s, 3),
+            "ops_per_s": round(self.ops / self.total_s, 2) if self.total_s else 0.0,
+            "p50_ms": round(self.percentile(50), 1),
+            "p95_ms": round(self.percentile(95), 1),
+            "p99_ms": round(self.percentile(99), 1),
+        }
+        if self.peak_mb is not None:
+            out["peak_mb"] = round(self.peak_mb, 1)
+        return out
+
+
+@dataclass(frozen=True)
+class Budget:
+    stage: str
+    metric: str
+    limit: float
+
+    @classmethod
+    def parse(cls, spec: str) -> Budget:
+        """
+        "diff.p95_ms=400" -> Budget("diff", "p95_ms", 400.0).
+        """
+        try:
+            key, value = spec.split("=", 1)
+            stage, metric = key.strip().split(".", 1)
+            limit = float(value)
+        except ValueError:
+            raise ValueError(f"Budget must look like <stage>.<metric>=<number>: {spec!r}") from None
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage in budget {spec!r} (expected one of {', '.join(STAGES)})")
+        if metric not in BUDGET_METRICS:
+            raise ValueError(f"Unknown metric in budget {spec!r} (expected one of {', '.join(BUDGET_METRICS)})")
+        return cls(stage, metric, limit)
+
+    def violated_by(self, metrics: Dict[str, float]) -> Optional[str]:
+        value = metrics.get(self.metric)
+        if value is None:
+            return None
+        # Throughput is a floor, everything else a ceiling.
+        over = value < self.limit if self.metric == "ops_per_s" else value > self.limit
+        if not over:
+            return None
+        return f"{self.stage}.{self.metric} = {value:g} (budget {self.limit:g})"
+
+
+@dataclass
+class LoadReport:
+    scenario: Scenario
+    stages: List[StageResult]
+    violations: List[str]
+
+    def as_dict(self) -> Dict:
+        return {
+            "scenario": asdict(self.scenario),
+            "stages": {s.name: s.metrics() for s in self.stages},
+            "violations": self.violations,
+        }
+
+    def describe(self) -> str:
+        lines = [f"{'stage':<10} {'ops':>6} {'total s':>9} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                 f"{'p99 ms':>9} {'peak MB':>9}"]
+        for s in self.stages:
+            m = s.metrics()
+            peak = f"{m['peak_mb']:9.1f}" if "peak_mb" in m else f"{'-':>9}"
+            lines.append(f"{s.name:<10} {m['ops']:>6} {m['total_s']:>9.2f} {m['ops_per_s']:>9.1f} "
+                         f"{m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f} {m['p99_ms']:>9.1f} {peak}")
+        return "\n".join(lines)
+
+
+# ----------------------------
+# Synthetic fleet
+# ----------------------------
+
+def _host_xml(ip: str, ports: Iterable[int]) -> str:
+    rows = []
+    for port in sorted(ports):
+        _, service, product, version = PORT_POOL_BY_PORT[port]
+        attrs = f'name="{service}"' + (f' product="{product}"' if product else "") + (
+            f' version="{version}"' if version else "")
+        rows.append(f'<port protocol="tcp" portid="{port}"><state state="open"/><service {attrs}/></port>')
+    return (f'<host><status state="up"/><address addr="{ip}" addrtype="ipv4"/>'
+            f'<ports>{"".join(rows)}</ports></host>')
+
+
+def _evolve(rng: random.Random, state: Dict[str, Set[int]], free: List[str], scenario: Scenario) -> None:
+    """
+    One run's worth of churn: hosts leave and join, some hosts open/close a port.
+    """
+    n = max(1, int(len(state) * scenario.churn))
+    for ip in rng.sample(sorted(state), min(n, len(state))):
+        del state[ip]
+        free.append(ip)
+    for _ in range(n):
+        if free:
+            ip = free.pop(rng.randrange(len(free)))
+            state[ip] = _random_ports(rng, scenario)
+    for ip in rng.sample(sorted(state), min(n, len(state))):
+        port = rng.choice(PORT_POOL)[0]
+        state[ip] ^= {port}
+
+
+def _random_ports(rng: random.Random, scenario: Scenario) -> Set[int]:
+    k = max(1, min(len(PORT_POOL), int(rng.expovariate(1 / scenario.ports_per_host)) + 1))
+    return {p[0] for p in rng.sample(PORT_POOL, k)}
+
+
+def generate_fleet(scenario: Scenario, drop_dir: Path, stage: Optional[StageResult] = None) -> List[Path]:
+    """
+    One zip per (network, run) in drop_dir, laid out like a baselinekit export:
+    rawscans/<YYYY-MM-DD_HHMM_baselinekit_v0>/{ports_top200_open.xml, hosts_up.txt}.
+    """
+    if scenario.hosts > MAX_HOSTS_PER_NETWORK:
+        raise ValueError(f"At most {MAX_HOSTS_PER_NETWORK:,} hosts per network (one /16 each, plus churn spares)")
+    drop_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(scenario.seed)
+    start = datetime(2025, 1, 1)
+    zips: List[Path] = []
+
+    for n in range(scenario.networks):
+        network = f"net{n:03d}"
+        # Each network lives in its own 10.x/16; spare addresses feed host churn.
+        pool = [f"10.{n % 256}.{i // 250}.{i % 250 + 1}" for i in range(int(scenario.hosts * SPARE_HOST_FACTOR))]
+        rng.shuffle(pool)
+        state = {ip: _random_ports(rng, scenario) for ip in pool[:scenario.hosts]}
+        free = pool[scenario.hosts:]
+
+        for r in range(scenario.runs_per_network):
+            t0 = time.perf_counter()
+            if r:
+                _evolve(rng, state, free, scenario)
+            run_name = f"{(start + timedelta(hours=6 * r)).strftime('%Y-%m-%d_%H%M')}_{RUN_TYPE}"
+            xml = "".join(['<?xml version="1.0"?><nmaprun>',
+                           *(_host_xml(ip, ports) for ip, ports in state.items() if ports),
+                           "</nmaprun>"])
+            zip_path = drop_dir / f"{network}_{run_name}.zip"
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+                z.writestr(f"rawscans/{run_name}/ports_top200_open.xml", xml)
+                z.writestr(f"rawscans/{run_name}/hosts_up.txt", "\n".join(state) + "\n")
+            zips.append(zip_path)
+            if stage is not None:
+                stage.latencies_ms.append((time.perf_counter() - t0) * 1000)
+    return zips
+
+
+# ----------------------------
+# Pipeline stages
+# ----------------------------
+
+def _timed_pass(ops: Sequence[Callable[[Path], object]], out_root: Path) -> Tuple[List[float], float]:
+    from core.cache import get_parse_cache
+
+    get_parse_cache().clear()
+    latencies = []
+    started = time.perf_counter()
+    for op in ops:
+        t0 = time.perf_counter()
+        op(out_root)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies, time.perf_counter() - started
+
+
+def _measure(name: str, ops: Sequence[Callable[[Path], object]], work_dir: Path, memory: bool) -> StageResult:
+    """
+    Time the ops, then (memory=True) run them again under tracemalloc for the peak.
+    tracemalloc slows Python code several-fold, so it never runs during the timed
+    pass. Each op gets the directory to write into; the memory pass writes into a
+    scratch dir so it neither sees nor disturbs the timed pass's output.
+    """
+    result = StageResult(name)
+    result.latencies_ms, result.total_s = _timed_pass(ops, work_dir)
+    if memory:
+        scratch = work_dir / f".memory-{name}"
+        tracemalloc.start()
+        try:
+            _timed_pass(ops, scratch)
+            result.peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+            shutil.rmtree(scratch, ignore_errors=True)
+    log.info("%s: %d ops in %.2fs", name, result.ops, result.total_s)
+    return result
+
+
+def _scorecard(run) -> None:
+    # Same work as the Scorecard page: every XML parsed, top ports, risk flags.
+    from core.diff import risk_flags
+    from core.nmap_parse import top_ports
+    from core.run_data import load_run_data
+
+    data = load_run_data(run.run_folder)
+    ports = data.ports_for("ports", open_only=True) if "ports" in data.xml_files else data.ports
+    top_ports(ports)
+    risk_flags(ports)
+
+
+def run_scenario(scenario: Scenario, work_dir: Path, memory: bool = True) -> List[StageResult]:
+    from core.discovery import discover_runs
+    from core.ingest import extract_zip
+    from core.planner import run_compare
+
+    drop_dir, extracted = work_dir / "drop", work_dir / "extracted"
+    stages: List[StageResult] = []
+
+    gen = StageResult("generate")
+    t0 = time.perf_counter()
+    zips = generate_fleet(scenario, drop_dir, gen)
+    gen.total_s = time.perf_counter() - t0
+    stages.append(gen)
+
+    stages.append(_measure("ingest", [
+        (lambda out, z=z: extract_zip(z, out / "extracted" / f"{z.stem}_{uuid.uuid4().hex[:8]}")) for z in zips
+    ], work_dir, memory))
+
+    stages.append(_measure("discovery", [lambda out: discover_runs(extracted)] * DISCOVERY_REPEATS,
+                           work_dir, memory))
+    runs = discover_runs(extracted)
+    if len(runs) != len(zips):
+        raise RuntimeError(f"Discovered {len(runs)} runs from {len(zips)} zips")
+
+    stages.append(_measure("scorecard", [(lambda out, r=r: _scorecard(r)) for r in runs], work_dir, memory))
+
+    by_network: Dict[str, list] = {}
+    for r in runs:
+        by_network.setdefault(r.network, []).append(r)
+    pairs = []
+    for net_runs in by_network.values():
+        ordered = sorted(net_runs, key=lambda r: r.run_name)
+        pairs.extend(zip(ordered, ordered[1:]))
+    stages.append(_measure("diff", [
+        (lambda out, a=a, b=b: run_compare(a, b, fingerprint_root=out / "fingerprints")) for a, b in pairs
+    ], work_dir, memory))
+    return stages
+
+
+def check_budgets(stages: List[StageResult], budgets: Iterable[Budget]) -> List[str]:
+    metrics = {s.name: s.metrics() for s in stages}
+    return [v for b in budgets if b.stage in metrics for v in [b.violated_by(metrics[b.stage])] if v]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = Scenario()
+    parser = argparse.ArgumentParser(description="End-to-end load test over a synthetic fleet, with budgets.")
+    parser.add_argument("--networks", type=int, default=defaults.networks)
+    parser.add_argument("--runs", type=int, default=defaults.runs_per_network, help="Runs per network")
+    parser.add_argument("--hosts", type=int, default=defaults.hosts, help="Live hosts per network")
+    parser.add_argument("--ports-per-host", type=int, default=defaults.ports_per_host)
+    parser.add_argument("--churn", type=float, default=defaults.churn)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--budget", action="append", default=[], metavar="STAGE.METRIC=LIMIT",
+                        help=f"Fail when exceeded (ops_per_s: when below); metrics: {', '.join(BUDGET_METRICS)}")
+    parser.add_argument("--work-dir", type=Path, default=None,
+                        help=f"Default: a temp dir, removed afterwards. Given dirs keep everything but "
+                             f"the {'/'.join(SCENARIO_SUBDIRS)} subdirs this run creates")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated files")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass (half the runtime, no peak_mb)")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        budgets = [Budget.parse(b) for b in args.budget]
+    except ValueError as e:
+        parser.error(str(e))
+    scenario = Scenario(args.networks, args.runs, args.hosts, args.ports_per_host, args.churn, args.seed)
+    if args.work_dir is not None:
+        taken = [name for name in SCENARIO_SUBDIRS if (args.work_dir / name).exists()]
+        if taken:
+            parser.error(f"--work-dir already has {', '.join(taken)}; pick an empty or new directory")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Only a dir made here is removed whole; a user's dir only loses what the run created.
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="psec-loadtest-"))
+    try:
+        stages = run_scenario(scenario, work_dir, memory=not args.no_memory)
+    finally:
+        if not args.keep:
+            if args.work_dir is None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            else:
+                for name in SCENARIO_SUBDIRS:
+                    shutil.rmtree(work_dir / name, ignore_errors=True)
+
+    report = LoadReport(scenario, stages, check_budgets(stages, budgets))
+    print(report.describe())
+    if args.json:
+        from core.storage import atomic_write_text
+
+        atomic_write_text(args.json, json.dumps(report.as_dict(), indent=2))
+    for v in report.violations:
+        print(f"FAIL {v}")
+    return 1 if report.violations else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,65 +1,233 @@
 from __future__ import annotations
 
+import io
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
 import xml.etree.ElementTree as ET
-from typing import Dict, List
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
 
 
-def parse_ports(xml_path: Path) -> pd.DataFrame:
+PORT_COLUMNS = ["ip", "hostname", "protocol", "port", "state", "service", "product", "version", "source_xml"]
+HOST_COLUMNS = ["ip", "hostname", "mac", "vendor", "state", "source_xml"]
+SCRIPT_COLUMNS = ["ip", "protocol", "port", "script_id", "output", "source_xml"]
+
+# A <host> element start (not <hosthint>, <hostnames>, <hostscript>).
+_HOST_START_RE = re.compile(rb"<host[\s>]")
+_HOST_END = b"</host>"
+_SEARCH_BLOCK_BYTES = 1024 * 1024
+
+
+@dataclass
+class ScanRecords:
     """
-    One row per (host, port) from an Nmap XML.
-    Columns: ip, hostname, protocol, port, state, service, product, version, source_xml
+    Everything one Nmap XML holds that we use, collected in a single pass.
+    """
+    hosts: List[Dict] = field(default_factory=list)    # HOST_COLUMNS (up hosts only)
+    ports: List[Dict] = field(default_factory=list)    # PORT_COLUMNS
+    scripts: List[Dict] = field(default_factory=list)  # SCRIPT_COLUMNS; port is None for host scripts
+
+
+def iter_hosts(xml_path: Union[Path, BinaryIO]) -> Iterator[ET.Element]:
+    """
+    Stream <host> elements with iterparse; each is cleared after the caller is done,
+    so memory stays flat however large the XML is.
+    """
+    root: Optional[ET.Element] = None
+    source = xml_path if hasattr(xml_path, "read") else str(xml_path)
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if root is None:
+            root = elem
+        if event == "end" and elem.tag == "host":
+            yield elem
+            elem.clear()
+            root.clear()
+
+
+def _host_is_up(host: ET.Element) -> bool:
+    status = host.find("status")
+    return status is None or status.get("state") == "up"
+
+
+def _host_ip(host: ET.Element) -> str:
+    for addr in host.findall("address"):
+        if addr.get("addrtype") == "ipv4":
+            return addr.get("addr", "")
+    return ""
+
+
+def _host_hostname(host: ET.Element) -> str:
+    hn = host.find("hostnames/hostname")
+    return hn.get("name", "") if hn is not None else ""
+
+
+def _port_row(ip: str, hostname: str, port: ET.Element, source_xml: str) -> Dict:
+    portid = port.get("portid", "")
+
+    state_el = port.find("state")
+    state = state_el.get("state", "") if state_el is not None else ""
+
+    svc = port.find("service")
+    service = svc.get("name", "") if svc is not None else ""
+    product = svc.get("product", "") if svc is not None else ""
+    version = svc.get("version", "") if svc is not None else ""
+
+    return {
+        "ip": ip,
+        "hostname": hostname,
+        "protocol": port.get("protocol", ""),
+        "port": int(portid) if str(portid).isdigit() else portid,
+        "state": state,
+        "service": service,
+        "product": product,
+        "version": version,
+        "source_xml": source_xml,
+    }
+
+
+def _find(f: BinaryIO, pattern: "re.Pattern[bytes]", start: int, stop: int, overlap: int = 16) -> int:
+    """
+    Offset of the first match of pattern in f[start:stop], or -1.
+    """
+    pos = start
+    while pos < stop:
+        f.seek(pos)
+        block = f.read(min(_SEARCH_BLOCK_BYTES, stop - pos))
+        m = pattern.search(block)
+        if m:
+            return pos + m.start()
+        if pos + len(block) >= stop:
+            break
+        pos += len(block) - overlap
+    return -1
+
+
+def _rfind_host_end(f: BinaryIO, size: int) -> int:
+    """
+    Offset just past the last </host>, or -1.
+    """
+    end = size
+    while end > 0:
+        start = max(0, end - _SEARCH_BLOCK_BYTES)
+        f.seek(start)
+        i = f.read(end - start + len(_HOST_END)).rfind(_HOST_END)
+        if i >= 0:
+            return start + i + len(_HOST_END)
+        end = start
+    return -1
+
+
+def host_byte_ranges(xml_path: Path, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Split an Nmap XML into [start, end) byte ranges of about chunk_bytes, each
+    holding whole <host> elements, so the ranges can be parsed independently
+    (iter_port_rows(..., byte_range=...)).
+    """
+    size = Path(xml_path).stat().st_size
+    with open(xml_path, "rb") as f:
+        first = _find(f, _HOST_START_RE, 0, size)
+        last = _rfind_host_end(f, size) if first >= 0 else -1
+        if first < 0 or last <= first:
+            return []
+        bounds = [first]
+        while bounds[-1] + chunk_bytes < last:
+            nxt = _find(f, _HOST_START_RE, bounds[-1] + chunk_bytes, last)
+            if nxt < 0:
+                break
+            bounds.append(nxt)
+    bounds.append(last)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _open_range(xml_path: Path, byte_range: Tuple[int, int]) -> BinaryIO:
+    start, end = byte_range
+    with open(xml_path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start)
+    return io.BytesIO(b"<nmaprun>" + body + b"</nmaprun>")
+
+
+def iter_port_rows(xml_path: Path, byte_range: Optional[Tuple[int, int]] = None) -> Iterator[Dict]:
+    """
+    Streaming form of parse_ports: yields one dict per (host, port).
+    byte_range (see host_byte_ranges) limits it to the hosts in that slice of the file.
     """
     xml_path = Path(xml_path)
-    root = ET.parse(xml_path).getroot()
+    for host in iter_hosts(_open_range(xml_path, byte_range) if byte_range else xml_path):
+        if not _host_is_up(host):
+            continue
+        ip, hostname = _host_ip(host), _host_hostname(host)
+        for port in host.findall("ports/port"):
+            yield _port_row(ip, hostname, port, xml_path.name)
+
 
-    rows: List[Dict] = []
+def iter_port_rows_merged(xml_paths: Iterable[Path]) -> Iterator[Dict]:
+    """
+    iter_port_rows over the parts of a split scan, in order. An (ip, protocol, port)
+    already yielded by an earlier part is skipped, so overlapping slices count once.
+    """
+    xml_paths = list(xml_paths)
+    if len(xml_paths) == 1:
+        yield from iter_port_rows(xml_paths[0])
+        return
+
+    seen = set()
+    for xml_path in xml_paths:
+        for r in iter_port_rows(xml_path):
+            key = (r["ip"], r["protocol"], r["port"])
+            if key not in seen:
+                seen.add(key)
+                yield r
+
+
+def parse_scan(xml_path: Path) -> ScanRecords:
+    """
+    Hosts, ports and NSE <script> output (port and host scripts) from one Nmap XML,
+    in one streaming pass.
+    """
+    xml_path = Path(xml_path)
+    out = ScanRecords()
 
-    for host in root.findall("host"):
-        status = host.find("status")
-        if status is not None and status.get("state") != "up":
+    for host in iter_hosts(xml_path):
+        if not _host_is_up(host):
             continue
+        ip, hostname = _host_ip(host), _host_hostname(host)
 
-        ip = ""
+        mac, vendor = "", ""
         for addr in host.findall("address"):
-            if addr.get("addrtype") == "ipv4":
-                ip = addr.get("addr", "")
+            if addr.get("addrtype") == "mac":
+                mac, vendor = addr.get("addr", ""), addr.get("vendor", "")
                 break
-
-        hostname = ""
-        hn = host.find("hostnames/hostname")
-        if hn is not None:
-            hostname = hn.get("name", "")
+        out.hosts.append({"ip": ip, "hostname": hostname, "mac": mac, "vendor": vendor,
+                          "state": "up", "source_xml": xml_path.name})
 
         for port in host.findall("ports/port"):
-            protocol = port.get("protocol", "")
-            portid = port.get("portid", "")
-
-            state_el = port.find("state")
-            state = state_el.get("state", "") if state_el is not None else ""
-
-            svc = port.find("service")
-            service = svc.get("name", "") if svc is not None else ""
-            product = svc.get("product", "") if svc is not None else ""
-            version = svc.get("version", "") if svc is not None else ""
-
-            rows.append(
-                {
-                    "ip": ip,
-                    "hostname": hostname,
-                    "protocol": protocol,
-                    "port": int(portid) if str(portid).isdigit() else portid,
-                    "state": state,
-                    "service": service,
-                    "product": product,
-                    "version": version,
-                    "source_xml": xml_path.name,
-                }
-            )
-
-    return pd.DataFrame(rows)
+            row = _port_row(ip, hostname, port, xml_path.name)
+            out.ports.append(row)
+            for script in port.findall("script"):
+                out.scripts.append({"ip": ip, "protocol": row["protocol"], "port": row["port"],
+                                    "script_id": script.get("id", ""), "output": script.get("output", ""),
+                                    "source_xml": xml_path.name})
+
+        for script in host.findall("hostscript/script"):
+            out.scripts.append({"ip": ip, "protocol": "", "port": None,
+                                "script_id": script.get("id", ""), "output": script.get("output", ""),
+                                "source_xml": xml_path.name})
+
+    return out
+
+
+def parse_ports(xml_path: Path) -> pd.DataFrame:
+    """
+    One row per (host, port) from an Nmap XML.
+    Columns: ip, hostname, protocol, port, state, service, product, version, source_xml
+    """
+    import pandas as pd
+
+    return pd.DataFrame(list(iter_port_rows(xml_path)))
 
 
 def top_ports(df_ports: pd.DataFrame, n: int = 25) -> pd.DataFrame:
@@ -80,3 +248,20 @@ def top_ports(df_ports: pd.DataFrame, n: int = 25) -> pd.DataFrame:
         .sort_values(["hosts_affected", "port"], ascending=[False, True])
         .head(n)
     )
+
+
+def top_ports_streaming(xml_paths: Iterable[Path], n: int = 25) -> pd.DataFrame:
+    """
+    top_ports() computed while streaming the XML (or the parts of a split scan),
+    for runs too large to hold as a frame.
+    """
+    import pandas as pd
+
+    hosts_by_port: Dict[tuple, set] = {}
+    for r in iter_port_rows_merged(xml_paths):
+        if r["state"] == "open":
+            hosts_by_port.setdefault((r["protocol"], r["port"], r["service"]), set()).add(r["ip"])
+
+    rows = [(proto, port, svc, len(ips)) for (proto, port, svc), ips in hosts_by_port.items()]
+    df = pd.DataFrame(rows, columns=["protocol", "port", "service", "hosts_affected"])
+    return df.sort_values(["hosts_affected", "port"], ascending=[False, True]).head(n)
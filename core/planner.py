@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import fnmatch
+import logging
+import os
+import zipfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from core.diff import DiffResult, compare_runs, compare_runs_streaming, pick_ports_xmls
+from core.discovery import RunInfo
+from core.fingerprint import changed_prefixes, empty_diff, fingerprint_run, stored_fingerprint
+from core.ingest import KEY_FILE_PATTERNS, build_run_meta, is_compacted
+
+log = logging.getLogger(__name__)
+
+
+# Size-adaptive execution: estimate the workload from file sizes alone (nothing
+# is parsed), then pick how to run the compare.
+
+IN_MEMORY = "in_memory"    # compare_runs: both runs as DataFrames
+STREAMING = "streaming"    # compare_runs_streaming: key sets only, two passes
+SHARDED = "sharded"        # compare_runs_sharded: per-/24 shards across processes
+STRATEGIES = (IN_MEMORY, STREAMING, SHARDED)
+
+# Nmap port rows cost ~230-400 bytes of XML each; the low end over-estimates
+# rows, which errs toward the cheaper strategies.
+XML_BYTES_PER_PORT_ROW = 200
+HOSTS_UP_BYTES_PER_HOST = 12
+# Rough resident cost of one open-port row held in a DataFrame (object columns).
+FRAME_BYTES_PER_ROW = 1_000
+
+# Port rows across both runs.
+IN_MEMORY_MAX_ROWS = 250_000
+SHARDED_MIN_ROWS = 2_000_000
+
+
+@dataclass(frozen=True)
+class WorkloadEstimate:
+    ports_xml_bytes: int
+    hosts_up_bytes: int
+    est_port_rows: int
+    est_hosts: int
+
+    def __add__(self, other: WorkloadEstimate) -> WorkloadEstimate:
+        return WorkloadEstimate(
+            ports_xml_bytes=self.ports_xml_bytes + other.ports_xml_bytes,
+            hosts_up_bytes=self.hosts_up_bytes + other.hosts_up_bytes,
+            est_port_rows=self.est_port_rows + other.est_port_rows,
+            est_hosts=self.est_hosts + other.est_hosts,
+        )
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    strategy: str
+    estimate: WorkloadEstimate
+    est_frame_bytes: int
+    workers: int
+    reason: str
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+    def describe(self) -> str:
+        return (
+            f"{self.strategy} ({self.reason}); ~{self.estimate.est_port_rows:,} port rows, "
+            f"~{self.estimate.est_hosts:,} hosts, {self.estimate.ports_xml_bytes / 1e6:.1f} MB XML"
+        )
+
+
+def _estimate(ports_xml_bytes: int, hosts_up_bytes: int) -> WorkloadEstimate:
+    return WorkloadEstimate(
+        ports_xml_bytes=ports_xml_bytes,
+        hosts_up_bytes=hosts_up_bytes,
+        est_port_rows=ports_xml_bytes // XML_BYTES_PER_PORT_ROW,
+        est_hosts=hosts_up_bytes // HOSTS_UP_BYTES_PER_HOST,
+    )
+
+
+def estimate_run(run_folder: Path) -> WorkloadEstimate:
+    """
+    Estimate from on-disk sizes of the ports XML(s) compare would read and hosts_up.txt.
+    """
+    xml_paths = pick_ports_xmls(Path(run_folder))
+    hosts_up = build_run_meta(Path(run_folder)).key_files.get("hosts_up", [])
+    return _estimate(
+        sum(p.stat().st_size for p in xml_paths),
+        sum(p.stat().st_size for p in hosts_up if p.exists()),
+    )
+
+
+def estimate_zip(zip_path: Path) -> WorkloadEstimate:
+    """
+    Estimate from the declared (uncompressed) member sizes, before extraction.
+    """
+    xml_bytes = 0
+    hosts_bytes = 0
+    with zipfile.ZipFile(zip_path) as z:
+        for info in z.infolist():
+            name = Path(info.filename).name
+            if any(fnmatch.fnmatch(name, g) for g in KEY_FILE_PATTERNS["ports"]) and name.lower().endswith(".xml"):
+                xml_bytes += info.file_size
+            elif any(fnmatch.fnmatch(name, g) for g in KEY_FILE_PATTERNS["hosts_up"]):
+                hosts_bytes += info.file_size
+    return _estimate(xml_bytes, hosts_bytes)
+
+
+def choose_strategy(estimate: WorkloadEstimate, workers: Optional[int] = None) -> ExecutionPlan:
+    n_workers = workers or os.cpu_count() or 1
+    rows = estimate.est_port_rows
+    frame_bytes = rows * FRAME_BYTES_PER_ROW
+
+    if rows <= IN_MEMORY_MAX_ROWS:
+        strategy, reason = IN_MEMORY, f"<= {IN_MEMORY_MAX_ROWS:,} rows"
+    elif rows >= SHARDED_MIN_ROWS and n_workers > 1:
+        strategy, reason = SHARDED, f">= {SHARDED_MIN_ROWS:,} rows, {n_workers} workers"
+    else:
+        strategy, reason = STREAMING, f"> {IN_MEMORY_MAX_ROWS:,} rows"
+        if rows >= SHARDED_MIN_ROWS:
+            reason += ", single CPU"
+
+    return ExecutionPlan(strategy=strategy, estimate=estimate, est_frame_bytes=frame_bytes,
+                         workers=n_workers, reason=reason)
+
+
+def plan_compare(run_a: RunInfo, run_b: RunInfo, workers: Optional[int] = None) -> ExecutionPlan:
+    plan = choose_strategy(estimate_run(run_a.run_folder) + estimate_run(run_b.run_folder), workers)
+    log.info("compare plan %s -> %s: %s", run_a.run_id, run_b.run_id, plan.describe())
+    return plan
+
+
+def run_compare(
+    run_a: RunInfo,
+    run_b: RunInfo,
+    plan: Optional[ExecutionPlan] = None,
+    strategy: Optional[str] = None,
+    fingerprint_root: Optional[Path] = None,
+) -> DiffResult:
+    """
+    compare_runs() with the strategy picked by plan_compare(); strategy forces one.
+    fingerprint_root (fingerprints_dir(<data_dir>)) persists fingerprints across
+    processes; without it they are kept in memory for this process only.
+    """
+    if strategy is not None and strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+
+    plan = plan or plan_compare(run_a, run_b)
+    strategy = strategy or plan.strategy
+    if strategy == SHARDED and (is_compacted(run_a.run_folder) or is_compacted(run_b.run_folder)):
+        # Shards split XML files; a compacted run has none (its rows come from history).
+        strategy = STREAMING
+
+    # Merkle fingerprints: identical runs need no compare at all, and the
+    # out-of-core strategies only compare the /24s whose hashes differ. In memory,
+    # building one costs as much as the compare it would save, so only fingerprints
+    # already stored under fingerprint_root are used there.
+    if strategy == IN_MEMORY:
+        if fingerprint_root is not None:
+            fp_a = stored_fingerprint(run_a, fingerprint_root)
+            fp_b = stored_fingerprint(run_b, fingerprint_root) if fp_a else None
+            if fp_a and fp_b and not changed_prefixes(fp_a, fp_b):
+                log.info("compare %s -> %s: fingerprints match, no changes", run_a.run_id, run_b.run_id)
+                return empty_diff(run_a, run_b)
+        return compare_runs(run_a, run_b)
+
+    changed = changed_prefixes(fingerprint_run(run_a, fingerprint_root), fingerprint_run(run_b, fingerprint_root))
+    if not changed:
+        log.info("compare %s -> %s: fingerprints match, no changes", run_a.run_id, run_b.run_id)
+        return empty_diff(run_a, run_b)
+
+    if strategy == SHARDED:
+        from core.shard import compare_runs_sharded
+
+        return compare_runs_sharded(run_a, run_b, workers=plan.workers, prefixes=changed)
+    return compare_runs_streaming(run_a, run_b, prefixes=changed)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import logging
+import shlex
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from core.diff import DiffResult, sort_ips
+from core.storage import atomic_write_text, file_lock
+
+log = logging.getLogger(__name__)
+
+# Targeted confirmation scans for a diff: every opened / closed / risky key and
+# every new host, grouped into as few nmap invocations as is sensible.
+
+DEFAULT_MAX_JOBS = 8          # per protocol; groups beyond this are merged
+INLINE_TARGETS_MAX = 16       # more targets than this go to an -iL file
+PRIORITY_ORDER = {"P0": 0, "P1": 1, "P2": 2, "": 9}
+SCAN_TYPES = {"tcp": ["-sV"], "udp": ["-sU", "-sV"], "sctp": ["-sY", "-sV"]}   # protocol -> nmap flags
+
+
+@dataclass(frozen=True)
+class RescanJob:
+    name: str                 # rescan_01, also the -oX / targets file stem
+    protocol: str             # tcp | udp | sctp | "" (host discovery only)
+    ports: Tuple[int, ...]
+    targets: Tuple[str, ...]
+    priority: str             # best risk priority covered, else ""
+    kinds: Tuple[str, ...]    # opened / closed / risky / new_host
+
+    def nmap_args(self, targets_file: Optional[Path] = None, output_dir: Optional[Path] = None) -> List[str]:
+        if not self.protocol:
+            args = ["nmap", "-sn"]
+        elif self.protocol in SCAN_TYPES:
+            args = ["nmap", *SCAN_TYPES[self.protocol], "-Pn", "-p", _port_spec(self.ports)]
+        else:
+            raise ValueError(f"No nmap scan type for protocol: {self.protocol}")
+
+        if targets_file is not None:
+            args += ["-iL", str(targets_file)]
+        else:
+            args += list(self.targets)
+
+        out_xml = f"{self.name}.xml"
+        args += ["-oX", str(output_dir / out_xml) if output_dir else out_xml]
+        return args
+
+    def command(self, targets_file: Optional[Path] = None, output_dir: Optional[Path] = None) -> str:
+        """
+        Ready-to-run shell line. Long target lists need targets_file (see write_rescan_plan).
+        """
+        return shlex.join(self.nmap_args(targets_file, output_dir))
+
+
+@dataclass
+class RescanPlan:
+    network: str
+    run_a_id: str
+    run_b_id: str
+    jobs: List[RescanJob] = field(default_factory=list)
+    keys: int = 0     # distinct (ip, protocol, port) keys covered
+    hosts: int = 0    # distinct targets across jobs
+
+    def probes(self) -> int:
+        """
+        Host x port probes the plan sends (what grouping trades against invocations).
+        """
+        return sum(len(j.targets) * max(len(j.ports), 1) for j in self.jobs)
+
+
+def _port_spec(ports: Tuple[int, ...]) -> str:
+    """
+    (22, 80, 8000, 8001, 8002) -> "22,80,8000-8002"
+    """
+    out: List[str] = []
+    ports = sorted(ports)
+    i = 0
+    while i < len(ports):
+        j = i
+        while j + 1 < len(ports) and ports[j + 1] == ports[j] + 1:
+            j += 1
+        out.append(str(ports[i]) if i == j else f"{ports[i]}-{ports[j]}")
+        i = j + 1
+    return ",".join(out)
+
+
+def _merge_groups(groups: Dict[FrozenSet[int], List[str]], max_jobs: int) -> Dict[FrozenSet[int], List[str]]:
+    """
+    Greedy: fold the smallest group into whichever partner adds the fewest extra
+    probes, until at most max_jobs remain.
+    """
+    groups = {ports: list(ips) for ports, ips in groups.items()}
+    while len(groups) > max(max_jobs, 1):
+        smallest = min(groups, key=lambda p: (len(p) * len(groups[p]), sorted(p)))
+        ips = groups.pop(smallest)
+
+        def extra(other: FrozenSet[int]) -> int:
+            merged = smallest | other
+            return (len(merged) * (len(ips) + len(groups[other]))
+                    - len(smallest) * len(ips) - len(other) * len(groups[other]))
+
+        partner = min(groups, key=lambda p: (extra(p), sorted(p)))
+        merged_ips = groups.pop(partner) + ips
+        key = smallest | partner
+        groups[key] = groups.get(key, []) + merged_ips
+    return groups
+
+
+def plan_rescan(diff: DiffResult, max_jobs: int = DEFAULT_MAX_JOBS) -> RescanPlan:
+    """
+    One job per distinct port set per protocol (merged down to max_jobs), plus one
+    host-discovery job for new hosts that have no port keys. Highest priority first.
+    """
+    ports_by_ip: Dict[Tuple[str, str], Set[int]] = {}   # (protocol, ip) -> ports
+    kinds_by_ip: Dict[Tuple[str, str], Set[str]] = {}
+    prio_by_ip: Dict[Tuple[str, str], str] = {}
+
+    def add(kind: str, ip, protocol, port, priority: str = "") -> None:
+        port = int(port)
+        if port < 0:
+            return
+        k = (str(protocol), str(ip))
+        ports_by_ip.setdefault(k, set()).add(port)
+        kinds_by_ip.setdefault(k, set()).add(kind)
+        if PRIORITY_ORDER.get(priority, 9) < PRIORITY_ORDER.get(prio_by_ip.get(k, ""), 9):
+            prio_by_ip[k] = priority
+
+    for kind, df in (("opened", diff.ports_opened), ("closed", diff.ports_closed)):
+        if not df.empty:
+            for ip, protocol, port in zip(df["ip"], df["protocol"], df["port"]):
+                add(kind, ip, protocol, port)
+    risk = diff.risky_opened
+    if not risk.empty:
+        for ip, protocol, port, priority in zip(risk["ip"], risk["protocol"], risk["port"], risk["priority"]):
+            add("risky", ip, protocol, port, priority)
+
+    jobs: List[Tuple[str, FrozenSet[int], List[str]]] = []
+    for protocol in sorted({p for p, _ in ports_by_ip}):
+        if protocol not in SCAN_TYPES:
+            skipped = [k for k in ports_by_ip if k[0] == protocol]
+            log.warning("Skipping %d %s host(s) in rescan plan: no nmap scan type", len(skipped), protocol)
+            for k in skipped:
+                del ports_by_ip[k]
+            continue
+        groups: Dict[FrozenSet[int], List[str]] = {}
+        for (p, ip), ports in ports_by_ip.items():
+            if p == protocol:
+                groups.setdefault(frozenset(ports), []).append(ip)
+        for ports, ips in _merge_groups(groups, max_jobs).items():
+            jobs.append((protocol, ports, ips))
+
+    new_hosts = set(diff.new_hosts)
+    with_ports = {ip for _, ip in ports_by_ip}
+    bare_new = [ip for ip in diff.new_hosts if ip not in with_ports]
+    if bare_new:
+        jobs.append(("", frozenset(), bare_new))
+
+    built: List[RescanJob] = []
+    for protocol, ports, ips in jobs:
+        if protocol:
+            priority = min((prio_by_ip.get((protocol, ip), "") for ip in ips), key=PRIORITY_ORDER.get)
+            kinds = set().union(*(kinds_by_ip[(protocol, ip)] for ip in ips))
+            if new_hosts.intersection(ips):
+                kinds.add("new_host")
+        else:
+            priority, kinds = "", {"new_host"}
+        built.append(RescanJob(name="", protocol=protocol, ports=tuple(sorted(ports)),
+                               targets=tuple(sort_ips(list(dict.fromkeys(ips)))),
+                               priority=priority, kinds=tuple(sorted(kinds))))
+
+    # P0 first, discovery-only last, bigger jobs first within a priority.
+    built.sort(key=lambda j: (PRIORITY_ORDER[j.priority], not j.protocol, -len(j.targets), j.protocol, j.ports))
+
+    plan = RescanPlan(network=diff.run_a.network, run_a_id=diff.run_a.run_id, run_b_id=diff.run_b.run_id)
+    plan.jobs = [replace(j, name=f"rescan_{i:02d}") for i, j in enumerate(built, start=1)]
+    plan.keys = sum(len(p) for p in ports_by_ip.values())
+    plan.hosts = len({ip for j in plan.jobs for ip in j.targets})
+    return plan
+
+
+def _comment(line: str) -> str:
+    """
+    Keep a '#' line on one line: a newline in a run name must not start a command.
+    """
+    return " ".join(line.splitlines())
+
+
+def render_rescan_script(plan: RescanPlan, targets_dir: Optional[Path] = None) -> str:
+    """
+    POSIX shell script, one nmap line per job. With targets_dir, lists longer than
+    INLINE_TARGETS_MAX are read from <targets_dir>/<job>.targets.txt.
+    """
+    lines = [
+        "#!/bin/sh",
+        _comment(f"# Re-scan plan — {plan.network}: {plan.run_a_id} -> {plan.run_b_id}"),
+        f"# {len(plan.jobs)} jobs, {plan.keys} keys, {plan.hosts} hosts, {plan.probes()} probes",
+        "set -e",
+        "",
+    ]
+    for job in plan.jobs:
+        targets_file = None
+        if targets_dir is not None and len(job.targets) > INLINE_TARGETS_MAX:
+            targets_file = targets_dir / f"{job.name}.targets.txt"
+        what = f"{job.protocol}/{_port_spec(job.ports)}" if job.protocol else "host discovery"
+        lines.append(f"# {job.name}: {job.priority or '-'} | {', '.join(job.kinds)} | "
+                     f"{len(job.targets)} hosts | {what}")
+        lines.append(job.command(targets_file, targets_dir))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_rescan_plan(plan: RescanPlan, out_dir: Path) -> Tuple[Path, List[Path]]:
+    """
+    <out_dir>/rescan.sh plus one <job>.targets.txt per job (used by -iL when long).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    target_files = []
+    script = out_dir / "rescan.sh"
+    with file_lock(out_dir / ".lock"):
+        for job in plan.jobs:
+            p = out_dir / f"{job.name}.targets.txt"
+            atomic_write_text(p, "\n".join(job.targets) + "\n")
+            target_files.append(p)
+        # Script last: once it is visible, every targets file it references is too.
+        atomic_write_text(script, render_rescan_script(plan, out_dir))
+        script.chmod(0o755)
+    return script, target_files
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from core.cache import cached_parse
+from core.ingest import COMPACTED_MARKER, RunMeta, build_run_meta, is_compacted
+from core.nmap_parse import HOST_COLUMNS, PORT_COLUMNS, SCRIPT_COLUMNS, parse_scan
+
+
+# Scan families with Nmap XML output, in the order they are parsed. Any other
+# *.xml in the run folder is parsed too, under the "other" family.
+XML_FAMILIES = ("discovery", "ports", "http_titles", "infra_services", "gateway_smoke")
+OTHER_FAMILY = "other"
+
+
+@dataclass
+class RunData:
+    """
+    Unified per-run store: every XML in the run parsed once and stacked, with a
+    `scan` column naming the family each row came from.
+    """
+    meta: RunMeta
+    hosts: pd.DataFrame    # HOST_COLUMNS + scan
+    ports: pd.DataFrame    # PORT_COLUMNS + scan + http_title
+    scripts: pd.DataFrame  # SCRIPT_COLUMNS + scan
+    xml_files: Dict[str, List[Path]]  # family -> parsed files
+
+    @property
+    def run_folder(self) -> Path:
+        return self.meta.run_folder
+
+    def scans(self) -> List[str]:
+        return [f for f in (*XML_FAMILIES, OTHER_FAMILY) if f in self.xml_files]
+
+    def ports_for(self, scan: str, open_only: bool = False) -> pd.DataFrame:
+        df = self.ports[self.ports["scan"] == scan]
+        if open_only:
+            df = df[df["state"] == "open"]
+        return df.drop(columns=["scan"])
+
+    def host_table(self) -> pd.DataFrame:
+        """
+        One row per IP: first non-empty hostname / MAC / vendor across scans, plus
+        which scans saw it up and how many distinct open ports it has.
+        """
+        if self.hosts.empty:
+            return pd.DataFrame(columns=["ip", "hostname", "mac", "vendor", "scans", "open_ports"])
+
+        def first_non_empty(s: pd.Series) -> str:
+            for v in s:
+                if v:
+                    return v
+            return ""
+
+        table = self.hosts.groupby("ip", sort=False).agg(
+            hostname=("hostname", first_non_empty),
+            mac=("mac", first_non_empty),
+            vendor=("vendor", first_non_empty),
+            scans=("scan", lambda s: ",".join(dict.fromkeys(s))),
+        ).reset_index()
+
+        open_ports = self.ports[self.ports["state"] == "open"]
+        counts = open_ports.drop_duplicates(["ip", "protocol", "port"]).groupby("ip").size()
+        table["open_ports"] = table["ip"].map(counts).fillna(0).astype(int)
+        return table
+
+
+def _xml_files_by_family(meta: RunMeta) -> Dict[str, List[Path]]:
+    out: Dict[str, List[Path]] = {}
+    seen = set()
+    for family in XML_FAMILIES:
+        for p in sorted(meta.key_files.get(family, [])):
+            if p.suffix.lower() == ".xml" and p.resolve() not in seen:
+                seen.add(p.resolve())
+                out.setdefault(family, []).append(p)
+
+    for p in sorted(meta.run_folder.glob("*.xml")):
+        if p.is_file() and p.resolve() not in seen:
+            seen.add(p.resolve())
+            out.setdefault(OTHER_FAMILY, []).append(p)
+    return out
+
+
+def load_run_data(run_folder: Path, meta: Optional[RunMeta] = None) -> RunData:
+    """
+    One scan of the run folder (build_run_meta) and one streaming parse per XML.
+    Cached per process (core.cache) on the run folder and the identity of its
+    XMLs; treat as read-only.
+    """
+    meta = meta or build_run_meta(Path(run_folder))
+    if is_compacted(meta.run_folder):
+        return cached_parse(f"run_data:{Path(run_folder).resolve()}", [meta.run_folder / COMPACTED_MARKER],
+                            lambda: _compacted_run_data(meta))
+    xml_files = _xml_files_by_family(meta)
+    paths = [p for family_paths in xml_files.values() for p in family_paths]
+    # The folder is part of the key: folders without XMLs all share the empty identity.
+    return cached_parse(f"run_data:{Path(run_folder).resolve()}", paths, lambda: _parse_run_data(meta, xml_files))
+
+
+def _compacted_run_data(meta: RunMeta) -> RunData:
+    """
+    What history keeps of a pruned run: its up hosts and the open rows of its ports
+    scan, both under the "ports" family. Other scans and script output are only in
+    the raw archive.
+    """
+    from core.history import load_compacted
+
+    stored = load_compacted(meta.run_folder)
+    hosts = pd.DataFrame({"ip": stored.hosts, "state": "up"}).reindex(columns=HOST_COLUMNS, fill_value="")
+    return RunData(
+        meta=meta,
+        hosts=hosts.assign(scan="ports"),
+        ports=stored.ports.assign(scan="ports", http_title=""),
+        scripts=pd.DataFrame(columns=SCRIPT_COLUMNS + ["scan"]),
+        xml_files={"ports": []},  # the family is known, its files are gone
+    )
+
+
+def _dedupe_split(df: pd.DataFrame, families: List[str], key: List[str]) -> pd.DataFrame:
+    dup = df.duplicated(["scan"] + key) & df["scan"].isin(families)
+    return df[~dup].reset_index(drop=True) if dup.any() else df
+
+
+def _parse_run_data(meta: RunMeta, xml_files: Dict[str, List[Path]]) -> RunData:
+    hosts: List[Dict] = []
+    ports: List[Dict] = []
+    scripts: List[Dict] = []
+    for family, paths in xml_files.items():
+        for p in paths:
+            rec = parse_scan(p)
+            hosts.extend(dict(r, scan=family) for r in rec.hosts)
+            ports.extend(dict(r, scan=family) for r in rec.ports)
+            scripts.extend(dict(r, scan=family) for r in rec.scripts)
+
+    df_hosts = pd.DataFrame(hosts, columns=HOST_COLUMNS + ["scan"])
+    df_ports = pd.DataFrame(ports, columns=PORT_COLUMNS + ["scan"])
+    df_scripts = pd.DataFrame(scripts, columns=SCRIPT_COLUMNS + ["scan"])
+
+    # Parts of a split scan (*.partNN.xml) can overlap on hosts; keep the first sighting.
+    split = [f for f, paths in xml_files.items() if len(paths) > 1]
+    if split:
+        df_hosts = _dedupe_split(df_hosts, split, ["ip"])
+        df_ports = _dedupe_split(df_ports, split, ["ip", "protocol", "port"])
+        df_scripts = _dedupe_split(df_scripts, split, ["ip", "protocol", "port", "script_id"])
+
+    # Join http-title script output onto the port rows it describes (any scan).
+    titles = df_scripts[(df_scripts["script_id"] == "http-title") & df_scripts["port"].notna()]
+    if titles.empty:
+        df_ports["http_title"] = ""
+    else:
+        titles = (
+            titles.drop_duplicates(["ip", "protocol", "port"])
+            .set_index(["ip", "protocol", "port"])["output"]
+        )
+        keys = pd.MultiIndex.from_frame(df_ports[["ip", "protocol", "port"]])
+        df_ports["http_title"] = titles.reindex(keys).fillna("").to_numpy()
+
+    return RunData(meta=meta, hosts=df_hosts, ports=df_ports, scripts=df_scripts, xml_files=xml_files)
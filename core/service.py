@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from core.cache import cached_parse, get_parse_cache
+from core.discovery import RunInfo, discover_runs
+from core.ingest import project_root
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+# Long-lived JSON service over the core, for the Next.js API routes and any other
+# local client. It lives in one process, so discovery, parsed runs (core.cache),
+# the fleet indexes and derived results (scorecards, diffs) stay warm across
+# requests: anything already seen is answered from memory. Binds to localhost
+# by default and has no auth; put it behind the frontend, not on the network.
+#
+#   GET  /health                 cache + discovery status
+#   GET  /runs?network=          discovered runs
+#   POST /parse      {"xmlPath"}                         ports + top ports of one XML
+#   POST /scorecard  {"runId"}                           open ports, top ports, risk flags
+#   POST /compare    {"runA", "runB"} | {"network", "runType"?}
+#   POST /query      {"port", "protocol"?} | {"service"} | {"banner", "mode"?}
+#   POST /batch      {"requests": [{"endpoint": "/compare", "body": {...}}, ...]}
+#
+# Responses use the frontend's envelope: {"success": true, ...} or
+# {"success": false, "error": "..."}.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_ROW_LIMIT = 1000
+MAX_ROW_LIMIT = 50_000       # larger limits are clamped; a response is built in memory
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_REQUESTS = 64
+BATCH_WORKERS = min(8, os.cpu_count() or 1)
+DISCOVERY_TTL_SECONDS = 5.0   # how stale the run list may get before re-scanning data/extracted
+
+
+class RequestError(ValueError):
+    """
+    Client error with an HTTP status (400 unless said otherwise).
+    """
+
+    def __init__(self, message: str, status: int = HTTPStatus.BAD_REQUEST) -> None:
+        super().__init__(message)
+        self.status = int(status)
+
+
+def _records(df: pd.DataFrame, limit: int) -> List[Dict]:
+    if df is None or df.empty:
+        return []
+    # to_json handles numpy scalars and NaN -> null in one C pass.
+    return json.loads(df.head(limit).to_json(orient="records"))
+
+
+def _run_dict(r: RunInfo) -> Dict:
+    return {"network": r.network, "runType": r.run_type, "timestamp": r.timestamp_str,
+            "runId": r.run_id, "runName": r.run_name}
+
+
+def _int(body: Dict, name: str, default: Optional[int] = None) -> int:
+    value = body.get(name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"{name} must be an integer") from None
+
+
+def _limit(body: Dict) -> int:
+    limit = _int(body, "limit", DEFAULT_ROW_LIMIT)
+    if limit < 0:
+        raise RequestError("limit must be zero or more")
+    return min(limit, MAX_ROW_LIMIT)
+
+
+class ComputeService:
+    """
+    The endpoints as plain methods (body dict in, payload dict out); ServiceHandler
+    only does HTTP. Safe to call from many threads.
+    """
+
+    def __init__(self, data_dir: Optional[Path] = None, discovery_ttl: float = DISCOVERY_TTL_SECONDS) -> None:
+        self.data_dir = Path(data_dir or (project_root() / "data"))
+        self.discovery_ttl = discovery_ttl
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()   # one fleet-index refresh at a time; guards _indexed
+        self._runs: List[RunInfo] = []
+        self._runs_at = 0.0
+        self._indexed: Tuple[str, ...] = ()
+        self.routes: Dict[str, Callable[[Dict], Dict]] = {
+            "/health": self.health,
+            "/runs": self.runs,
+            "/parse": self.parse,
+            "/scorecard": self.scorecard,
+            "/compare": self.compare,
+            "/query": self.query,
+            "/batch": self.batch,
+        }
+
+    # --- state ---
+
+    def discovered(self, refresh: bool = False) -> List[RunInfo]:
+        with self._lock:
+            if refresh or time.monotonic() - self._runs_at > self.discovery_ttl:
+                self._runs = discover_runs(self.data_dir / "extracted")
+                self._runs_at = time.monotonic()
+            return self._runs
+
+    def _run(self, run_id: str) -> RunInfo:
+        if not run_id:
+            raise RequestError("runId is required")
+        for refresh in (False, True):  # a just-ingested run may predate the TTL
+            for r in self.discovered(refresh):
+                if r.run_id == run_id:
+                    return r
+        raise RequestError(f"Unknown run: {run_id}", HTTPStatus.NOT_FOUND)
+
+    def warm(self) -> None:
+        """
+        Discover runs and build the fleet indexes, so the first queries are fast too.
+        """
+        self._fleet_indexes()
+
+    def _fleet_indexes(self):
+        from core.index import get_banner_index, get_port_index, refresh_fleet_indexes
+
+        runs = self.discovered()
+        keys = tuple(sorted(str(r.run_folder) for r in runs))
+        with self._index_lock:
+            if keys != self._indexed:
+                refresh_fleet_indexes(runs)
+                self._indexed = keys
+            return get_port_index(refresh=False), get_banner_index(refresh=False)
+
+    # --- endpoints ---
+
+    def handle(self, endpoint: str, body: Dict) -> Tuple[int, Dict]:
+        """
+        (status, payload) for one request; never raises.
+        """
+        route = self.routes.get(endpoint)
+        if route is None:
+            return HTTPStatus.NOT_FOUND, {"success": False, "error": f"Unknown endpoint: {endpoint}"}
+        if not isinstance(body, dict):  # batch sub-requests reach here unchecked
+            return HTTPStatus.BAD_REQUEST, {"success": False, "error": "Body must be a JSON object"}
+        try:
+            return HTTPStatus.OK, dict(success=True, **route(body))
+        except RequestError as e:
+            return e.status, {"success": False, "error": str(e)}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"success": False, "error": str(e)}
+        except Exception:
+            log.exception("%s failed", endpoint)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"success": False, "error": f"{endpoint} failed"}
+
+    def health(self, body: Dict) -> Dict:
+        runs = self.discovered()
+        return {
+            "uptimeSeconds": round(time.time() - self.started, 1),
+            "runs": len(runs),
+            "networks": len({r.network for r in runs}),
+            "cache": get_parse_cache().stats().as_dict(),
+        }
+
+    def runs(self, body: Dict) -> Dict:
+        network = body.get("network")
+        runs = [r for r in self.discovered(bool(body.get("refresh"))) if not network or r.network == network]
+        return {"runs": [_run_dict(r) for r in runs]}
+
+    def parse(self, body: Dict) -> Dict:
+        from core.nmap_parse import parse_ports, top_ports
+
+        xml = str(body.get("xmlPath") or "")
+        if not xml.lower().endswith(".xml"):
+            raise RequestError("xmlPath must be an .xml file")
+        extracted = (self.data_dir / "extracted").resolve()
+        path = (extracted / xml).resolve()
+        try:
+            path.relative_to(extracted)
+        except ValueError:
+            raise RequestError("xmlPath must reference a file in data/extracted") from None
+        if not path.is_file():
+            raise RequestError("XML file not found", HTTPStatus.NOT_FOUND)
+
+        ports = cached_parse("ports", [path], lambda: parse_ports(path))
+        limit = _limit(body)
+        return {
+            "total": len(ports),
+            "ports": _records(ports, limit),
+            "topPorts": _records(top_ports(ports, n=25), limit),
+        }
+
+    def scorecard(self, body: Dict) -> Dict:
+        run = self._run(str(body.get("runId") or ""))
+        limit = _limit(body)
+        card = cached_parse("service_scorecard", _run_inputs(run), lambda: _build_scorecard(run))
+        return dict(card, run=_run_dict(run), riskFlags=_records(card["riskFlags"], limit),
+                    topPorts=_records(card["topPorts"], limit))
+
+    def compare(self, body: Dict) -> Dict:
+        from core.fingerprint import fingerprints_dir
+        from core.planner import run_compare
+
+        if body.get("runA") or body.get("runB"):
+            run_a, run_b = self._run(str(body.get("runA") or "")), self._run(str(body.get("runB") or ""))
+        else:
+            run_a, run_b = self._latest_pair(str(body.get("network") or ""), body.get("runType"))
+        limit = _limit(body)
+
+        diff = cached_parse("service_compare", _run_inputs(run_a) + _run_inputs(run_b),
+                            lambda: run_compare(run_a, run_b, fingerprint_root=fingerprints_dir(self.data_dir)))
+        return {
+            "runA": _run_dict(run_a),
+            "runB": _run_dict(run_b),
+            "counts": {
+                "newHosts": len(diff.new_hosts),
+                "removedHosts": len(diff.removed_hosts),
+                "portsOpened": len(diff.ports_opened),
+                "portsClosed": len(diff.ports_closed),
+                "riskyOpened": len(diff.risky_opened),
+            },
+            "newHosts": diff.new_hosts[:limit],
+            "removedHosts": diff.removed_hosts[:limit],
+            "portsOpened": _records(diff.ports_opened, limit),
+            "portsClosed": _records(diff.ports_closed, limit),
+            "riskyOpened": _records(diff.risky_opened, limit),
+        }
+
+    def _latest_pair(self, network: str, run_type: Optional[str]) -> Tuple[RunInfo, RunInfo]:
+        if not network:
+            raise RequestError("Pass runA + runB, or a network")
+        runs = sorted((r for r in self.discovered() if r.network == network), key=lambda r: r.run_name)
+        # Never pair different run types; default to the latest run's.
+        run_type = run_type or (runs[-1].run_type if runs else None)
+        runs = [r for r in runs if r.run_type == run_type]
+        if len(runs) < 2:
+            raise RequestError(f"Need at least two runs for {network} to compare", HTTPStatus.NOT_FOUND)
+        return runs[-2], runs[-1]
+
+    def query(self, body: Dict) -> Dict:
+        from core.index import banner_hits_to_df, hits_to_df
+
+        ports, banners = self._fleet_indexes()
+        latest_only = bool(body.get("latestOnly", True))
+        network = body.get("network")
+        limit = _limit(body)
+
+        if body.get("banner"):
+            mode = body.get("mode", "substring")
+            if mode not in ("substring", "prefix"):
+                raise RequestError("mode must be substring or prefix")
+            hits = banner_hits_to_df(banners.search(str(body["banner"]), mode=mode, latest_only=latest_only))
+            if network:
+                hits = hits[hits["network"] == network]
+        elif body.get("service"):
+            hits = hits_to_df(ports.hosts_with_service(str(body["service"]), latest_only=latest_only, network=network))
+        elif body.get("port") is not None:
+            hits = hits_to_df(ports.hosts_with_port(_int(body, "port"), protocol=str(body.get("protocol", "tcp")),
+                                                    latest_only=latest_only, network=network))
+        else:
+            raise RequestError("Pass one of port, service or banner")
+        return {"total": len(hits), "hits": _records(hits, limit)}
+
+    def batch(self, body: Dict) -> Dict:
+        """
+        Several requests in one round trip, run concurrently. Identical requests in
+        a batch are computed once.
+        """
+        requests = body.get("requests")
+        if not isinstance(requests, list) or not requests:
+            raise RequestError("requests must be a non-empty list")
+        if len(requests) > MAX_BATCH_REQUESTS:
+            raise RequestError(f"At most {MAX_BATCH_REQUESTS} requests per batch")
+
+        unique: Dict[str, Tuple[str, Dict]] = {}
+        keys = []
+        for req in requests:
+            if not isinstance(req, dict) or req.get("endpoint") in (None, "/batch"):
+                raise RequestError("Each request needs an endpoint (not /batch)")
+            sub = req.get("body") or {}
+            key = json.dumps([req["endpoint"], sub], sort_keys=True)
+            unique.setdefault(key, (str(req["endpoint"]), sub))
+            keys.append(key)
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(unique))) as pool:
+            futures = {k: pool.submit(self.handle, endpoint, sub) for k, (endpoint, sub) in unique.items()}
+            results = {k: f.result() for k, f in futures.items()}
+        return {"responses": [dict(results[k][1], status=int(results[k][0])) for k in keys]}
+
+
+def _run_inputs(run: RunInfo) -> List[Path]:
+    # Same inputs the fingerprint tracks: derived results go stale when these change.
+    from core.fingerprint import fingerprint_inputs
+
+    return fingerprint_inputs(run)
+
+
+def _build_scorecard(run: RunInfo) -> Dict:
+    from core.diff import load_host_array, load_open_ports_df, risk_flags
+    from core.nmap_parse import top_ports
+
+    df_open = load_open_ports_df(run)
+    risky = risk_flags(df_open)
+    return {
+        "hosts": int(len(load_host_array(run))),
+        "openPorts": int(len(df_open)),
+        "hostsWithOpenPorts": int(df_open["ip"].nunique()) if not df_open.empty else 0,
+        "riskCounts": {p: int((risky["priority"] == p).sum()) for p in ("P0", "P1", "P2")} if not risky.empty else {},
+        "riskFlags": risky,
+        "topPorts": top_ports(df_open, n=25),
+    }
+
+
+# ----------------------------
+# HTTP
+# ----------------------------
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service: ComputeService  # set on the subclass built by make_server()
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        body = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self._respond(url.path, body)
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"success": False, "error": "Request body too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(HTTPStatus.BAD_REQUEST, {"success": False, "error": "Body must be JSON"})
+            return
+        if not isinstance(body, dict):
+            self._send(HTTPStatus.BAD_REQUEST, {"success": False, "error": "Body must be a JSON object"})
+            return
+        self._respond(url.path, body)
+
+    def _respond(self, endpoint: str, body: Dict) -> None:
+        started = time.perf_counter()
+        status, payload = self.service.handle(endpoint.rstrip("/") or "/", body)
+        self._send(status, payload, elapsed_ms=(time.perf_counter() - started) * 1000)
+
+    def _send(self, status: int, payload: Dict, elapsed_ms: Optional[float] = None) -> None:
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if elapsed_ms is not None:
+            self.send_header("X-Elapsed-Ms", f"{elapsed_ms:.1f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt: str, *args) -> None:
+        log.debug("%s %s", self.address_string(), fmt % args)
+
+
+def make_server(service: ComputeService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve parse / scorecard / compare / query as local JSON over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", type=Path, default=None, help="Defaults to <repo>/data")
+    parser.add_argument("--no-warm", action="store_true", help="Skip building the fleet indexes at startup")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    service = ComputeService(args.data_dir)
+    server = make_server(service, args.host, args.port)
+    if not args.no_warm:
+        threading.Thread(target=service.warm, name="warm", daemon=True).start()
+    log.info("serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
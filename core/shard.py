@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import math
+import os
+import pickle
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.diff import (
+    RISK_COLUMNS,
+    DiffResult,
+    build_diff_result,
+    load_host_array,
+    pick_ports_xmls,
+    risk_row,
+    sort_risk,
+)
+from core.discovery import RunInfo
+from core.hosts import host_delta, ip_array_to_strings, ipv4_prefix
+from core.nmap_parse import PORT_COLUMNS, host_byte_ranges, iter_port_rows
+
+
+# Sharded compare for very large networks, as a two-phase job over a process pool:
+#
+#   map     each worker parses one byte range of a ports XML (whole <host>s),
+#           drops rows outside the wanted /24s, and spills the rest to disk split
+#           into partitions by shard prefix;
+#   reduce  each worker loads one partition of both runs (every key of a shard
+#           lands in the same partition), diffs it, and returns only the deltas.
+#
+# Parsing scales with the cores, a worker holds one XML range or one partition at
+# a time, and the parent only ever sees opened / closed / risk rows.
+
+DEFAULT_PREFIX_LEN = 24
+# XML bytes per map task; the XML is split at <host> boundaries near these offsets.
+CHUNK_XML_BYTES = 64 * 1024 * 1024
+# XML bytes (both runs) per reduce partition: ~1M rows held by one worker at most.
+PARTITION_XML_BYTES = 200 * 1024 * 1024
+# Below this much XML in total, a process pool costs more than it saves.
+MIN_PARALLEL_XML_BYTES = 8 * 1024 * 1024
+
+Row = Tuple  # values in PORT_COLUMNS order
+# (side "a"/"b", task number, xml path, byte range, keep non-open rows)
+MapTask = Tuple[str, int, Path, Tuple[int, int], bool]
+
+
+def _row(r: Dict) -> Row:
+    # Normalized like core.diff.iter_open_rows.
+    port = r["port"] if isinstance(r["port"], int) else -1
+    return (str(r["ip"]), r["hostname"], str(r["protocol"]), port,
+            r["state"], r["service"], r["product"], r["version"], r["source_xml"])
+
+
+def _spill_path(spill_dir: Path, side: str, task: int, partition: int) -> Path:
+    return spill_dir / f"{side}.{task:05d}.{partition:04d}.pkl"
+
+
+def _map_range(task: MapTask, spill_dir: Path, prefix_len: int, partitions: int,
+               prefixes: Optional[Set[int]]) -> None:
+    """
+    Worker: parse one XML range into per-partition spill files.
+    Non-open rows are kept only for split scans, where they decide which part's
+    row wins (see nmap_parse.iter_port_rows_merged).
+    """
+    side, number, xml_path, byte_range, keep_all = task
+    out: Dict[int, List[Row]] = {}
+    for r in iter_port_rows(xml_path, byte_range):
+        if not keep_all and r["state"] != "open":
+            continue
+        ip = str(r["ip"])
+        if prefixes is not None and ipv4_prefix(ip, 24) not in prefixes:
+            continue
+        out.setdefault(ipv4_prefix(ip, prefix_len) % partitions, []).append(_row(r))
+    for partition, rows in out.items():
+        with open(_spill_path(spill_dir, side, number, partition), "wb") as f:
+            pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_partition(spill_dir: Path, side: str, tasks: int, partition: int) -> Dict[Tuple, Row]:
+    """
+    Open rows of one side's partition by (ip, protocol, port); the first sighting
+    wins, in XML order across ranges and split-scan parts.
+    """
+    first: Dict[Tuple, Row] = {}
+    for number in range(tasks):
+        path = _spill_path(spill_dir, side, number, partition)
+        if not path.exists():
+            continue
+        with open(path, "rb") as f:
+            for r in pickle.load(f):
+                first.setdefault((r[0], r[2], r[3]), r)
+        path.unlink()
+    return {k: r for k, r in first.items() if r[4] == "open"}
+
+
+def _reduce_partition(partition: int, spill_dir: Path, tasks_a: int, tasks_b: int,
+                      prefix_len: int) -> Tuple[List[Tuple[int, Row]], List[Tuple[int, Row]], List[Dict]]:
+    """
+    Worker: opened rows from B, closed rows from A (each with its shard prefix,
+    for ordering) and risk rows for the opened ones, for one partition.
+    """
+    a = _load_partition(spill_dir, "a", tasks_a, partition)
+    b = _load_partition(spill_dir, "b", tasks_b, partition)
+    opened = [(ipv4_prefix(r[0], prefix_len), r) for k, r in b.items() if k not in a]
+    closed = [(ipv4_prefix(r[0], prefix_len), r) for k, r in a.items() if k not in b]
+    # ip, protocol, port, service, product, version
+    risk = [row for row in (risk_row(r[0], r[2], r[3], r[5], r[6], r[7]) for _, r in opened) if row]
+    return opened, closed, risk
+
+
+def _map_tasks(side: str, run: RunInfo, chunk_bytes: int) -> List[MapTask]:
+    xml_paths = pick_ports_xmls(run.run_folder)
+    keep_all = len(xml_paths) > 1
+    ranges = [(p, r) for p in xml_paths for r in host_byte_ranges(p, chunk_bytes)]
+    return [(side, i, p, r, keep_all) for i, (p, r) in enumerate(ranges)]
+
+
+def _run_all(pool: Optional[Executor], fn: Callable, args: Iterable[Tuple]) -> List:
+    args = list(args)
+    if pool is None:
+        return [fn(*a) for a in args]
+    return [f.result() for f in [pool.submit(fn, *a) for a in args]]
+
+
+def compare_runs_sharded(
+    run_a: RunInfo,
+    run_b: RunInfo,
+    prefix_len: int = DEFAULT_PREFIX_LEN,
+    workers: Optional[int] = None,
+    prefixes: Optional[Set[int]] = None,
+    spill_dir: Optional[Path] = None,
+) -> DiffResult:
+    """
+    Same result as compare_runs(), computed per /prefix_len shard across processes.
+    Rows come out grouped by prefix (ascending) instead of in XML order.
+    prefixes (/24s, see core.fingerprint) skips shards known to be unchanged.
+    Spill files go to a temporary directory under spill_dir (default: system temp).
+    """
+    if not 1 <= prefix_len <= 32:
+        raise ValueError(f"prefix_len must be between 1 and 32: {prefix_len}")
+
+    new_arr, removed_arr = host_delta(load_host_array(run_a), load_host_array(run_b))
+
+    xml_bytes = sum(p.stat().st_size for r in (run_a, run_b) for p in pick_ports_xmls(r.run_folder))
+    n_workers = workers or os.cpu_count() or 1
+    parallel = n_workers > 1 and xml_bytes >= MIN_PARALLEL_XML_BYTES
+    # Enough map tasks to keep every worker busy, never more XML per task than CHUNK_XML_BYTES.
+    chunk_bytes = max(1, min(CHUNK_XML_BYTES, math.ceil(xml_bytes / n_workers))) if parallel else CHUNK_XML_BYTES
+    partitions = max(n_workers if parallel else 1, math.ceil(xml_bytes / PARTITION_XML_BYTES))
+
+    tasks_a = _map_tasks("a", run_a, chunk_bytes)
+    tasks_b = _map_tasks("b", run_b, chunk_bytes)
+
+    with tempfile.TemporaryDirectory(prefix="psec-shard-", dir=spill_dir) as tmp:
+        spill = Path(tmp)
+        pool: Optional[Executor] = ProcessPoolExecutor(max_workers=n_workers) if parallel else None
+        try:
+            _run_all(pool, _map_range, ((t, spill, prefix_len, partitions, prefixes) for t in tasks_a + tasks_b))
+            results = _run_all(pool, _reduce_partition,
+                               ((p, spill, len(tasks_a), len(tasks_b), prefix_len) for p in range(partitions)))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    # Stable sorts: within a shard, rows keep their XML order.
+    opened_rows = [r for _, r in sorted((x for opened, _, _ in results for x in opened), key=lambda x: x[0])]
+    closed_rows = [r for _, r in sorted((x for _, closed, _ in results for x in closed), key=lambda x: x[0])]
+    risk_rows = [r for _, _, risk in results for r in risk]
+
+    return build_diff_result(
+        run_a,
+        run_b,
+        ip_array_to_strings(new_arr),
+        ip_array_to_strings(removed_arr),
+        pd.DataFrame(opened_rows, columns=PORT_COLUMNS),
+        pd.DataFrame(closed_rows, columns=PORT_COLUMNS),
+        sort_risk(pd.DataFrame(risk_rows, columns=RISK_COLUMNS)),
+    )
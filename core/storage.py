@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import IO, Dict, Iterator, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+# Shared data/ is written by several server processes at once. Every writer goes
+# through here: files are written to a temp name in the same directory and renamed
+# into place, directories are built under a dot-prefixed staging name and renamed
+# when complete, and read-modify-write sequences hold an inter-process file lock.
+# Readers (discover_runs etc.) skip dot-prefixed entries, so they only ever see
+# fully published files and run folders.
+
+STAGING_PREFIX = ".staging-"
+LOCKS_DIRNAME = ".locks"
+
+
+def is_hidden(path: Path) -> bool:
+    """
+    Staging dirs, temp files and lock files: never part of the published view.
+    """
+    return Path(path).name.startswith(".")
+
+
+def _tmp_sibling(path: Path) -> Path:
+    return path.parent / f".{path.name}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+@contextlib.contextmanager
+def atomic_writer(
+    path: Path,
+    mode: str = "w",
+    encoding: Optional[str] = "utf-8",
+    newline: Optional[str] = None,
+) -> Iterator[IO]:
+    """
+    Open a temp file next to path; on clean exit fsync it and rename it over path.
+    Readers see the old file or the complete new one, never a partial write.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_sibling(path)
+    kwargs = {} if "b" in mode else {"encoding": encoding, "newline": newline}
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            tmp.unlink()
+        raise
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> Path:
+    with atomic_writer(path, "wb") as f:
+        f.write(data)
+    return Path(path)
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8") -> Path:
+    with atomic_writer(path, "w", encoding=encoding) as f:
+        f.write(text)
+    return Path(path)
+
+
+@contextlib.contextmanager
+def staged_dir(final_dir: Path) -> Iterator[Path]:
+    """
+    Yield a dot-prefixed staging dir beside final_dir; rename it to final_dir when
+    the block completes, remove it if the block raises. final_dir must not exist
+    (FileExistsError otherwise, also when another writer publishes it first).
+    """
+    final_dir = Path(final_dir)
+    final_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = final_dir.parent / f"{STAGING_PREFIX}{final_dir.name}.{uuid.uuid4().hex[:8]}"
+    staging.mkdir()
+    try:
+        yield staging
+        _publish_dir(staging, final_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _publish_dir(staging: Path, final_dir: Path) -> None:
+    # No exists() check first: it races with other writers. Windows rename never
+    # replaces an existing path. POSIX rename silently replaces an empty directory,
+    # so final_dir is claimed with mkdir (atomic, fails if taken) and the rename
+    # then only ever replaces the empty directory created here.
+    if os.name == "nt":
+        try:
+            os.rename(staging, final_dir)
+        except FileExistsError:
+            raise FileExistsError(f"Refusing to publish over existing directory: {final_dir}") from None
+        return
+    try:
+        final_dir.mkdir()
+    except FileExistsError:
+        raise FileExistsError(f"Refusing to publish over existing directory: {final_dir}") from None
+    try:
+        os.rename(staging, final_dir)
+    except OSError as e:  # something wrote into the claimed dir meanwhile (ENOTEMPTY)
+        with contextlib.suppress(OSError):
+            final_dir.rmdir()
+        raise FileExistsError(f"Refusing to publish over existing directory: {final_dir}") from e
+
+
+# ----------------------------
+# Locks
+# ----------------------------
+
+# flock is per open file description, so threads of one process are serialized by
+# the OS lock as well; the in-process lock just avoids hammering it.
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _thread_lock(key: str) -> threading.Lock:
+    with _THREAD_LOCKS_GUARD:
+        return _THREAD_LOCKS.setdefault(key, threading.Lock())
+
+
+def _msvcrt_lock(f: IO) -> None:
+    # LK_LOCK gives up with OSError after ~10 one-second retries; keep waiting.
+    while True:
+        f.seek(0)
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+@contextlib.contextmanager
+def file_lock(lock_path: Path) -> Iterator[None]:
+    """
+    Exclusive inter-process lock on lock_path (created if missing), blocking.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with _thread_lock(str(lock_path.resolve())):
+        with open(lock_path, "a+b") as f:
+            if os.name == "nt":
+                _msvcrt_lock(f)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def run_lock(data_dir: Path, key: str) -> contextlib.AbstractContextManager:
+    """
+    Lock for one run / comparison / series, shared by every process using data_dir.
+    """
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return file_lock(Path(data_dir) / LOCKS_DIRNAME / f"{digest}.lock")
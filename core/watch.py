@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import queue
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.diff import comparison_dir, save_markdown_pair
+from core.discovery import RunInfo, discover_runs, runs_for_extracted_root
+from core.ingest import (
+    MAX_ZIP_ENTRY_COUNT,
+    MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES,
+    ensure_dir,
+    extract_zip,
+    is_key_member,
+    project_root,
+)
+from core.fingerprint import fingerprints_dir
+from core.planner import run_compare
+from core.storage import atomic_write_text, staged_dir
+
+log = logging.getLogger(__name__)
+
+PROCESSED_DIRNAME = "processed"
+FAILED_DIRNAME = "failed"
+
+
+# ----------------------------
+# Models
+# ----------------------------
+
+@dataclass
+class IngestOutcome:
+    source: Path
+    extracted_root: Optional[Path] = None
+    runs: List[RunInfo] = field(default_factory=list)
+    comparisons: List[Path] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+# ----------------------------
+# Validation + staging
+# ----------------------------
+
+def _wait_until_stable(path: Path, settle_seconds: float, timeout: float = 600.0) -> None:
+    """
+    Sensors copy archives in over the network; wait until size + file count stop changing.
+    """
+    def snapshot() -> Tuple[int, int]:
+        if path.is_file():
+            return (1, path.stat().st_size)
+        files = [p for p in path.rglob("*") if p.is_file()]
+        return (len(files), sum(p.stat().st_size for p in files))
+
+    deadline = time.monotonic() + timeout
+    last = snapshot()
+    while True:
+        time.sleep(settle_seconds)
+        current = snapshot()
+        if current == last:
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Drop did not settle within {timeout:.0f}s: {path}")
+        last = current
+
+
+def _inspect_run_folder_before_copy(src: Path) -> List[Path]:
+    """
+    Same limits as inspect_zip_before_extraction, applied to a dropped folder.
+    Returns the key files to copy.
+    """
+    src_resolved = src.resolve()
+    entries = list(src.rglob("*"))
+    if len(entries) > MAX_ZIP_ENTRY_COUNT:
+        raise ValueError(f"Run folder has too many entries: {len(entries)} > {MAX_ZIP_ENTRY_COUNT}")
+
+    selected: List[Path] = []
+    total_bytes = 0
+    for p in entries:
+        if p.is_symlink():
+            raise ValueError(f"Unsafe folder entry rejected (symlink): {p}")
+        if not p.is_file():
+            continue
+        try:
+            p.resolve().relative_to(src_resolved)
+        except ValueError as exc:
+            raise ValueError(f"Unsafe folder entry rejected: {p}") from exc
+        rel = p.relative_to(src).as_posix()
+        if not is_key_member(zipfile.ZipInfo(rel)):
+            continue
+        total_bytes += p.stat().st_size
+        if total_bytes > MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES:
+            raise ValueError(
+                f"Run folder size exceeds limit: {total_bytes} > {MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES}"
+            )
+        selected.append(p)
+    return selected
+
+
+def stage_drop(src: Path, extracted_dir: Path) -> Path:
+    """
+    Validate a dropped .zip or run folder and place it under data/extracted/.
+    """
+    out_dir = extracted_dir / f"{src.stem if src.is_file() else src.name}_{uuid.uuid4().hex[:8]}"
+
+    if src.is_file():
+        # extract_zip validates names, entry count and sizes before writing anything.
+        return extract_zip(src, out_dir)
+
+    files = _inspect_run_folder_before_copy(src)
+    # Keep the dropped folder's own name so detect_run_folders still sees the run folder.
+    with staged_dir(out_dir) as staging:
+        base = staging / src.name
+        for p in files:
+            target = base / p.relative_to(src)
+            ensure_dir(target.parent)
+            shutil.copy2(p, target)
+    return out_dir
+
+
+# ----------------------------
+# Pipeline
+# ----------------------------
+
+class RunCatalog:
+    """
+    Known runs, seeded from discover_runs() once and extended as drops are ingested,
+    so finding the previous run never rescans all of data/extracted.
+    """
+
+    def __init__(self, runs: List[RunInfo]) -> None:
+        self._lock = threading.Lock()
+        self._by_group: Dict[Tuple[str, str], List[RunInfo]] = {}
+        for r in runs:
+            self._by_group.setdefault((r.network, r.run_type), []).append(r)
+
+    def add_and_get_previous(self, run: RunInfo) -> Optional[RunInfo]:
+        with self._lock:
+            group = self._by_group.setdefault((run.network, run.run_type), [])
+            older = [r for r in group if r.run_name < run.run_name and r.run_folder != run.run_folder]
+            group.append(run)
+        return max(older, key=lambda r: r.run_name) if older else None
+
+
+def ingest_drop(src: Path, catalog: RunCatalog, data_dir: Path, diff: bool = True) -> IngestOutcome:
+    """
+    extract/copy -> detect runs -> diff each new run against the previous run of the same
+    network + run_type, writing CHANGES.md + WATCHLIST.md under data/comparisons/.
+    """
+    started = time.perf_counter()
+    outcome = IngestOutcome(source=src)
+
+    outcome.extracted_root = stage_drop(src, ensure_dir(data_dir / "extracted"))
+    outcome.runs = runs_for_extracted_root(outcome.extracted_root)
+    if not outcome.runs:
+        raise ValueError("No run folders detected. Zip layout might be unusual.")
+    # Only if this process already serves fleet queries; keeps them current without rescans.
+    from core.index import index_new_runs
+
+    index_new_runs(outcome.runs)
+
+    fingerprint_root = fingerprints_dir(data_dir)
+    # Oldest first, so runs in the same drop diff against each other in order.
+    for run in sorted(outcome.runs, key=lambda r: r.run_name):
+        previous = catalog.add_and_get_previous(run)
+        if not diff or previous is None or not run.run_type:
+            continue
+        result = run_compare(previous, run, fingerprint_root=fingerprint_root)
+        save_markdown_pair(result, comparison_dir(result, data_dir))
+        outcome.comparisons.append(comparison_dir(result, data_dir))
+
+    outcome.seconds = time.perf_counter() - started
+    return outcome
+
+
+class IngestWorkQueue:
+    """
+    Bounded queue + fixed worker pool. submit() blocks once max_pending drops are
+    waiting, which pushes back on the watcher instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        drop_dir: Path,
+        data_dir: Optional[Path] = None,
+        workers: int = 2,
+        max_pending: int = 16,
+        settle_seconds: float = 2.0,
+        diff: bool = True,
+    ) -> None:
+        self.drop_dir = Path(drop_dir)
+        self.data_dir = data_dir or (project_root() / "data")
+        self.settle_seconds = settle_seconds
+        self.diff = diff
+        self.catalog = RunCatalog(discover_runs(self.data_dir / "extracted"))
+
+        self._queue: "queue.Queue[Optional[Path]]" = queue.Queue(maxsize=max_pending)
+        self._seen: Set[Path] = set()
+        self._seen_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        self.processed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        for t in self._threads:
+            t.start()
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    def submit(self, path: Path, timeout: Optional[float] = None) -> bool:
+        """
+        Queue a drop once. Returns False if it is already queued or in flight.
+        """
+        path = Path(path)
+        with self._seen_lock:
+            if path in self._seen:
+                return False
+            self._seen.add(path)
+        try:
+            self._queue.put(path, timeout=timeout)
+        except queue.Full:
+            with self._seen_lock:
+                self._seen.discard(path)
+            raise
+        log.info("queued %s (pending=%d)", path.name, self._queue.qsize())
+        return True
+
+    def _worker(self) -> None:
+        while True:
+            path = self._queue.get()
+            try:
+                if path is None:
+                    return
+                self._process(path)
+            except Exception:
+                # _process handles ingest errors; this keeps the worker alive if that fails too.
+                log.exception("worker error on %s", path)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, path: Path) -> None:
+        try:
+            _wait_until_stable(path, self.settle_seconds)
+            outcome = ingest_drop(path, self.catalog, self.data_dir, diff=self.diff)
+        except Exception as e:
+            log.error("failed %s: %s", path.name, e)
+            # Archiving can fail too (permissions, full disk); never let that kill the worker.
+            try:
+                archived = self._archive(path, FAILED_DIRNAME)
+                if archived is not None:
+                    atomic_write_text(archived.with_name(archived.name + ".error.txt"), f"{e}\n")
+            except Exception:
+                log.exception("could not archive failed drop %s", path.name)
+            with self._seen_lock:
+                self.failed += 1
+        else:
+            log.info(
+                "ingested %s: %d runs, %d comparisons in %.1fs",
+                path.name, len(outcome.runs), len(outcome.comparisons), outcome.seconds,
+            )
+            try:
+                self._archive(path, PROCESSED_DIRNAME)
+            except Exception:
+                log.exception("could not archive processed drop %s", path.name)
+            with self._seen_lock:
+                self.processed += 1
+        finally:
+            with self._seen_lock:
+                self._seen.discard(path)
+
+    def _archive(self, path: Path, dirname: str) -> Optional[Path]:
+        """
+        Move the drop out of the watched folder so restarts never re-ingest it.
+        """
+        if not path.exists():
+            return None
+        dest_dir = ensure_dir(self.drop_dir / dirname)
+        dest = dest_dir / path.name
+        if dest.exists():
+            dest = dest_dir / f"{path.stem}_{uuid.uuid4().hex[:8]}{path.suffix}"
+        shutil.move(str(path), str(dest))
+        return dest
+
+
+# ----------------------------
+# Watcher
+# ----------------------------
+
+def _is_drop(path: Path, drop_dir: Path) -> bool:
+    if path.parent != drop_dir or path.name.startswith("."):
+        return False
+    if path.name in {PROCESSED_DIRNAME, FAILED_DIRNAME}:
+        return False
+    return path.is_dir() or path.suffix.lower() == ".zip"
+
+
+def watch(
+    drop_dir: Path,
+    data_dir: Optional[Path] = None,
+    workers: int = 2,
+    max_pending: int = 16,
+    settle_seconds: float = 2.0,
+    diff: bool = True,
+    stop_event: Optional[threading.Event] = None,
+) -> IngestWorkQueue:
+    """
+    Watch drop_dir for new .zip files / run folders until stop_event is set (or Ctrl+C).
+    Drops already present at startup are queued first.
+    """
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    drop_dir = ensure_dir(Path(drop_dir)).resolve()
+    work = IngestWorkQueue(drop_dir, data_dir, workers, max_pending, settle_seconds, diff)
+
+    class _Handler(FileSystemEventHandler):
+        def on_created(self, event):
+            self._maybe_submit(Path(event.src_path))
+
+        def on_moved(self, event):
+            self._maybe_submit(Path(event.dest_path))
+
+        def _maybe_submit(self, path: Path) -> None:
+            if _is_drop(path, drop_dir):
+                # Blocks when the queue is full: this is the backpressure.
+                work.submit(path)
+
+    work.start()
+    for existing in sorted(drop_dir.iterdir()):
+        if _is_drop(existing, drop_dir):
+            work.submit(existing)
+
+    observer = Observer()
+    observer.schedule(_Handler(), str(drop_dir), recursive=False)
+    observer.start()
+    log.info("watching %s with %d workers (max %d pending)", drop_dir, workers, max_pending)
+
+    stop_event = stop_event or threading.Event()
+    try:
+        while not stop_event.is_set():
+            stop_event.wait(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        work.stop()
+    return work
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Watch a drop folder and ingest baselinekit zips / run folders.")
+    parser.add_argument("drop_dir", type=Path)
+    parser.add_argument("--data-dir", type=Path, default=None, help="Defaults to <repo>/data")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=16, help="Queue bound; the watcher blocks beyond it")
+    parser.add_argument("--settle-seconds", type=float, default=2.0)
+    parser.add_argument("--no-diff", action="store_true", help="Ingest only; skip diff-against-previous")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+    work = watch(
+        args.drop_dir,
+        data_dir=args.data_dir,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        settle_seconds=args.settle_seconds,
+        diff=not args.no_diff,
+    )
+    log.info("stopped: %d processed, %d failed", work.processed, work.failed)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,7 +3,6 @@ import _bootstrap  # noqa: F401
 
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
 
 from core.ingest import build_run_meta, detect_run_folders, extract_zip, save_upload
@@ -61,14 +60,17 @@ if extract_clicked and uploaded is not None:
             st.warning("No run folders detected. Zip layout might be unusual.")
             st.stop()
 
+        from core.discovery import runs_for_extracted_root
+        from core.index import index_new_runs
+
+        index_new_runs(runs_for_extracted_root(extracted_root))
+
         networks = sorted({guess_network_name(rf) for rf in run_folders if guess_network_name(rf)})
         if len(networks) == 1:
             st.info(f"Detected network: **{networks[0]}**")
         elif len(networks) > 1:
             st.info(f"Detected networks: **{', '.join(networks)}**")
 
-        st.subheader(f"Detected runs: {len(run_folders)}")
-
         rows = []
         metas = []
         for rf in run_folders:
@@ -94,31 +96,34 @@ if extract_clicked and uploaded is not None:
                 }
             )
 
-        df = pd.DataFrame(rows)
-        st.dataframe(df, width='stretch', hide_index=True)
+        # Kept across reruns so the paging/filter widgets below keep working.
+        st.session_state["ingest_runs"] = rows
+        st.session_state["ingest_key_files"] = [
+            {
+                "run_folder": meta.run_folder.name,
+                "network": guess_network_name(meta.run_folder),
+                "label": label,
+                "path": str(p),
+            }
+            for meta in metas
+            for label, paths in meta.key_files.items()
+            for p in paths
+        ]
 
-        st.divider()
-        st.subheader("Per-run details")
+    except Exception as e:
+        st.error(f"Error: {e}")
+        st.exception(e)
 
-        for meta in metas:
-            ts_str = meta.timestamp.strftime("%Y-%m-%d %H:%M") if meta.timestamp else "(no timestamp parsed)"
-            net = guess_network_name(meta.run_folder) or "(unknown network)"
-            st.markdown(
-                f"### `{meta.run_folder.name}`  \n"
-                f"**Network:** {net}  \n"
-                f"**Timestamp:** {ts_str}  \n"
-                f"**Run type:** `{meta.run_type}`"
-            )
+if st.session_state.get("ingest_runs"):
+    import pandas as pd
 
-            if not meta.key_files:
-                st.write("No key files detected in this run folder.")
-                continue
+    from _paging import paged_dataframe
 
-            for label, paths in meta.key_files.items():
-                st.markdown(f"**{label}** ({len(paths)}):")
-                for p in paths:
-                    st.code(str(p), language="text")
+    st.subheader(f"Detected runs: {len(st.session_state['ingest_runs'])}")
+    paged_dataframe(pd.DataFrame(st.session_state["ingest_runs"]), key="ingest_runs")
 
-    except Exception as e:
-        st.error(f"Error: {e}")
-        st.exception(e)
+    st.divider()
+    st.subheader("Key files (all runs)")
+    paged_dataframe(pd.DataFrame(st.session_state["ingest_key_files"],
+                                 columns=["run_folder", "network", "label", "path"]),
+                    key="ingest_key_files")
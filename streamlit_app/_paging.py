@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+import streamlit as st
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Server-side paging for large tables: filtering and slicing happen here, so only
+# the visible page is serialized to the browser however large the frame is.
+
+PAGE_SIZES = (25, 50, 100, 250, 500)
+DEFAULT_PAGE_SIZE = 50
+PREVIEW_MAX_LINES = 200
+
+
+def paged_dataframe(
+    df: pd.DataFrame,
+    key: str,
+    filter_columns: Optional[Sequence[str]] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> None:
+    """
+    Text filter (case-insensitive substring over filter_columns, default: all text
+    columns) + page picker above one st.dataframe showing the current page.
+    """
+    if df is None or df.empty:
+        st.write("(none)")
+        return
+
+    c1, c2, c3 = st.columns([3, 1, 1])
+    with c1:
+        query = st.text_input("Filter", key=f"{key}__filter", placeholder="substring, any column")
+    with c2:
+        size = st.selectbox("Rows / page", PAGE_SIZES,
+                            index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 0,
+                            key=f"{key}__size")
+
+    view = df
+    if query:
+        cols = list(filter_columns or [c for c in df.columns if df[c].dtype == object])
+        mask = None
+        for c in cols:
+            hit = df[c].astype(str).str.contains(query, case=False, regex=False, na=False)
+            mask = hit if mask is None else (mask | hit)
+        view = df[mask] if mask is not None else df.iloc[0:0]
+
+    total = len(view)
+    pages = max(1, math.ceil(total / size))
+    # A new filter or page size starts from page 1; never leave the widget out of range.
+    page_key, last_key = f"{key}__page", f"{key}__last"
+    if st.session_state.get(last_key) != (query, size):
+        st.session_state[last_key] = (query, size)
+        st.session_state[page_key] = 1
+    elif st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    with c3:
+        page = int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key))
+    start = (page - 1) * size
+    end = min(start + size, total)
+
+    st.dataframe(view.iloc[start:end], width="stretch", hide_index=True)
+    suffix = f" (filtered from {len(df):,})" if query else ""
+    st.caption(f"Rows {start + 1 if total else 0:,}–{end:,} of {total:,}{suffix}")
+
+
+def paged_list(items: List[str], key: str, column: str = "ip", page_size: int = DEFAULT_PAGE_SIZE) -> None:
+    """
+    paged_dataframe() for a flat list (e.g. host IPs).
+    """
+    import pandas as pd
+
+    paged_dataframe(pd.DataFrame({column: items}), key=key, page_size=page_size)
+
+
+def text_preview(text: str, max_lines: int = PREVIEW_MAX_LINES, language: str = "markdown") -> None:
+    """
+    First max_lines of a (possibly huge) document; the download button has the rest.
+    """
+    lines = text.splitlines()
+    st.code("\n".join(lines[:max_lines]), language=language)
+    if len(lines) > max_lines:
+        st.caption(f"Preview truncated: showing {max_lines:,} of {len(lines):,} lines. Download for the full file.")
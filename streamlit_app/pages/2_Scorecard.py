@@ -1,14 +1,18 @@
 import _bootstrap  # noqa: F401
 
-from pathlib import Path
 import streamlit as st
 
+from _paging import paged_dataframe
+from core.cache import get_parse_cache
 from core.ingest import build_run_meta, detect_run_folders, extract_zip, save_upload
-from core.nmap_parse import parse_ports, top_ports
+from core.nmap_parse import top_ports, top_ports_streaming
+from core.planner import IN_MEMORY, choose_strategy, estimate_run
+from core.run_data import load_run_data
 
 st.set_page_config(page_title="Scorecard", layout="wide")
+st.sidebar.caption(f"Parse cache: {get_parse_cache().stats().describe()}")
 st.title("Scorecard (Session 2)")
-st.caption("Upload → detect runs → parse Nmap XML → summarize open ports & gateway services.")
+st.caption("Upload → detect runs → parse every Nmap XML once → summarize open ports, gateway services & NSE output.")
 
 uploaded = st.file_uploader("Upload a baselinekit zip", type=["zip"])
 
@@ -24,15 +28,36 @@ if uploaded and st.button("Extract + Build Scorecard", type="primary"):
 
     metas = [build_run_meta(rf) for rf in run_folders]
     baseline = next((m for m in metas if m.run_type == "baselinekit_v0"), metas[0])
+    # Kept across reruns (paging/filter widgets); parsed data comes from the shared cache.
+    st.session_state["scorecard_run"] = baseline.run_folder
+
+run_folder = st.session_state.get("scorecard_run")
+if run_folder is not None:
+    baseline = build_run_meta(run_folder)
 
     st.subheader(f"Selected run: `{baseline.run_folder.name}`")
 
-    # --- ports_top200_open.xml ---
-    ports_files = baseline.key_files.get("ports", [])
-    ports_xml = next((p for p in ports_files if str(p).endswith(".xml")), None)
+    plan = choose_strategy(estimate_run(baseline.run_folder))
+    st.caption(f"Execution plan: {plan.describe()}")
+    if plan.strategy != IN_MEMORY:
+        # Too large to hold every scan as frames: stream the summaries only.
+        st.warning("Large run: showing streamed summaries only (no per-row detail tables).")
+        for family, label in (("ports", "Top open ports (hosts affected)"),
+                              ("infra_services", "Gateway services (open ports)")):
+            xmls = [p for p in baseline.key_files.get(family, []) if p.suffix.lower() == ".xml"]
+            if xmls:
+                st.markdown(f"### {label}")
+                with st.spinner(f"Streaming {len(xmls)} file(s)..."):
+                    st.dataframe(top_ports_streaming(xmls, n=50), width="stretch", hide_index=True)
+        st.stop()
+
+    with st.spinner("Parsing scans..."):
+        run = load_run_data(baseline.run_folder, meta=baseline)
+    st.caption(f"Parsed scans: {', '.join(run.scans()) or '(none)'}")
 
-    if ports_xml:
-        df_ports = parse_ports(Path(ports_xml))
+    # --- ports_top200_open.xml ---
+    if "ports" in run.xml_files:
+        df_ports = run.ports_for("ports")
         df_open = df_ports[df_ports["state"] == "open"]
 
         st.metric("Open ports (rows)", int(len(df_open)))
@@ -42,17 +67,21 @@ if uploaded and st.button("Extract + Build Scorecard", type="primary"):
         st.dataframe(top_ports(df_ports, n=25), width="stretch", hide_index=True)
 
         st.markdown("### Open ports (detail)")
-        st.dataframe(df_open, width="stretch", hide_index=True)
+        paged_dataframe(df_open, key="scorecard_open")
     else:
         st.warning("No ports XML found in this run.")
 
     # --- infra_services_gw.xml ---
-    infra_files = baseline.key_files.get("infra_services", [])
-    infra_xml = next((p for p in infra_files if str(p).endswith(".xml")), None)
-
-    if infra_xml:
-        df_infra = parse_ports(Path(infra_xml))
+    if "infra_services" in run.xml_files:
         st.markdown("### Gateway services (open ports)")
-        st.dataframe(top_ports(df_infra, n=50), width="stretch", hide_index=True)
+        st.dataframe(top_ports(run.ports_for("infra_services"), n=50), width="stretch", hide_index=True)
     else:
         st.warning("No infra_services_gw XML found in this run.")
+
+    # --- hosts across all scans ---
+    st.markdown("### Hosts (all scans)")
+    paged_dataframe(run.host_table(), key="scorecard_hosts")
+
+    # --- NSE script output (http-title etc.) ---
+    st.markdown("### NSE script output")
+    paged_dataframe(run.scripts, key="scorecard_scripts")
@@ -8,14 +8,25 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from core.diff import compare_runs, discover_runs, save_markdown_pair  # noqa: E402
+from _paging import paged_dataframe, paged_list, text_preview  # noqa: E402
+from core.baseline import DEFAULT_WINDOW, rolling_compare, window_members  # noqa: E402
+from core.cache import get_parse_cache  # noqa: E402
+from core.diff import comparison_dir, discover_runs, save_markdown_pair  # noqa: E402
+from core.export import export_diff  # noqa: E402
+from core.fingerprint import fingerprints_dir  # noqa: E402
+from core.nmap_parse import top_ports  # noqa: E402
+from core.planner import STRATEGIES, plan_compare, run_compare  # noqa: E402
+from core.rescan import plan_rescan, render_rescan_script, write_rescan_plan  # noqa: E402
 
 
 st.set_page_config(page_title="Diff Mode", layout="wide")
+st.sidebar.caption(f"Parse cache: {get_parse_cache().stats().describe()}")
 
 st.title("Diff Mode — Baseline Comparison")
 st.caption("Pick Network → Run type → Comparison → Compare → Review deltas → Export CHANGES.md + WATCHLIST.md")
 
+QUICK_VIEW_ROWS = 20
+
 
 @st.cache_data(show_spinner=False)
 def _cached_runs():
@@ -112,15 +123,43 @@ with st.expander("Advanced: manual override Run A / Run B"):
         st.info(
             "Pick two different runs to override. (Otherwise preset selection is used.)")
 
-# Clear, always-visible pairing summary
-st.caption(
-    f"Comparing: **A (older)** = `{run_a.run_id}`  →  **B (newer)** = `{run_b.run_id}`")
+mode = st.radio("Baseline", ["Pairwise (A vs B)", "Rolling window (last N runs vs B)"], horizontal=True,
+                help="Rolling: a port or host counts as new only if it was missing from the last N runs, "
+                     "so intermittently online devices stop showing up as new exposures.")
+rolling = mode.startswith("Rolling")
+
+if rolling:
+    w1, w2 = st.columns(2)
+    window_size = int(w1.number_input("Window (runs)", min_value=1, max_value=50, value=DEFAULT_WINDOW))
+    min_presence = int(w2.number_input("Established when seen in at least", min_value=1,
+                                       max_value=window_size, value=1,
+                                       help="1 = union of the window; N = present in every run"))
+    members = window_members(run_b, net_runs, window_size)
+    if not members:
+        st.warning("B has no earlier runs of this run type to build a window from.")
+        st.stop()
+    st.caption(
+        f"Comparing: **last {len(members)} runs** (`{members[0].run_id}` … `{members[-1].run_id}`)  →  "
+        f"**B (newer)** = `{run_b.run_id}`")
+else:
+    # Clear, always-visible pairing summary
+    st.caption(
+        f"Comparing: **A (older)** = `{run_a.run_id}`  →  **B (newer)** = `{run_b.run_id}`")
+
+    plan = plan_compare(run_a, run_b)
+    st.caption(f"Execution plan: {plan.describe()}")
+    with st.expander("Advanced: override execution strategy"):
+        forced = st.selectbox("Strategy", ["(planned)"] + list(STRATEGIES), index=0)
 
 compare_clicked = st.button("Compare", type="primary")
 
 if compare_clicked:
     with st.spinner("Computing diff..."):
-        diff = compare_runs(run_a, run_b)
+        if rolling:
+            diff = rolling_compare(run_b, net_runs, window_size, min_presence)
+        else:
+            diff = run_compare(run_a, run_b, plan, strategy=None if forced == "(planned)" else forced,
+                               fingerprint_root=fingerprints_dir())
         st.session_state["last_diff"] = diff
 
 diff = st.session_state.get("last_diff")
@@ -138,7 +177,7 @@ m3.metric("Ports opened", len(diff.ports_opened))
 m4.metric("Ports closed", len(diff.ports_closed))
 m5.metric("New risky exposures", len(diff.risky_opened))
 
-tabs = st.tabs(["Summary", "Hosts", "Ports", "Risk Flags", "Export"])
+tabs = st.tabs(["Summary", "Hosts", "Ports", "Risk Flags", "Re-scan", "Export"])
 
 # -----------------------------
 # Tabs
@@ -153,42 +192,35 @@ with tabs[0]:
     if diff.risky_opened.empty:
         st.success("No new risky exposures detected by current rules.")
     else:
-        st.dataframe(diff.risky_opened,
-                     use_container_width=True, hide_index=True)
+        st.dataframe(diff.risky_opened.head(QUICK_VIEW_ROWS), width="stretch", hide_index=True)
+        if len(diff.risky_opened) > QUICK_VIEW_ROWS:
+            st.caption(f"Top {QUICK_VIEW_ROWS} of {len(diff.risky_opened):,} — see **Risk Flags** for all.")
 
 with tabs[1]:
     colL, colR = st.columns(2)
     with colL:
         st.markdown("### New hosts")
-        if diff.new_hosts:
-            st.code("\n".join(diff.new_hosts))
-        else:
-            st.write("(none)")
+        paged_list(diff.new_hosts, key="diff_new_hosts")
 
     with colR:
         st.markdown("### Removed hosts")
-        if diff.removed_hosts:
-            st.code("\n".join(diff.removed_hosts))
-        else:
-            st.write("(none)")
+        paged_list(diff.removed_hosts, key="diff_removed_hosts")
 
 with tabs[2]:
     colL, colR = st.columns(2)
     with colL:
         st.markdown("### Ports opened (new exposures)")
-        if diff.ports_opened.empty:
-            st.write("(none)")
-        else:
-            st.dataframe(diff.ports_opened,
-                         use_container_width=True, hide_index=True)
+        if not diff.ports_opened.empty:
+            st.caption("Most-opened ports (hosts affected)")
+            st.dataframe(top_ports(diff.ports_opened, n=10), width="stretch", hide_index=True)
+        paged_dataframe(diff.ports_opened, key="diff_opened")
 
     with colR:
         st.markdown("### Ports closed")
-        if diff.ports_closed.empty:
-            st.write("(none)")
-        else:
-            st.dataframe(diff.ports_closed,
-                         use_container_width=True, hide_index=True)
+        if not diff.ports_closed.empty:
+            st.caption("Most-closed ports (hosts affected)")
+            st.dataframe(top_ports(diff.ports_closed, n=10), width="stretch", hide_index=True)
+        paged_dataframe(diff.ports_closed, key="diff_closed")
 
 with tabs[3]:
     st.subheader("Risk flags (new exposures only)")
@@ -207,10 +239,36 @@ with tabs[3]:
         b.metric("P1", len(p1))
         c.metric("P2", len(p2))
 
-        st.dataframe(diff.risky_opened,
-                     use_container_width=True, hide_index=True)
+        paged_dataframe(diff.risky_opened, key="diff_risk")
 
 with tabs[4]:
+    st.subheader("Targeted re-scan")
+    st.caption("Confirm every opened / closed / risky port and new host without a full top-200 sweep.")
+
+    max_jobs = st.number_input("Max nmap invocations per protocol", min_value=1, max_value=64, value=8)
+    rescan = plan_rescan(diff, max_jobs=int(max_jobs))
+    r1, r2, r3, r4 = st.columns(4)
+    r1.metric("Jobs", len(rescan.jobs))
+    r2.metric("Keys", rescan.keys)
+    r3.metric("Hosts", rescan.hosts)
+    r4.metric("Probes", rescan.probes())
+
+    if not rescan.jobs:
+        st.success("Nothing to re-scan.")
+    else:
+        script = render_rescan_script(rescan)
+        text_preview(script, language="bash")
+        st.download_button(
+            "Download rescan.sh",
+            data=script,
+            file_name=f"{diff.run_a.network}__RESCAN__{diff.run_a.run_id}__VS__{diff.run_b.run_id}.sh",
+            mime="text/x-shellscript",
+        )
+        if st.button("Write rescan.sh + target files to data/comparisons/"):
+            script_path, target_files = write_rescan_plan(rescan, comparison_dir(diff) / "rescan")
+            st.success(f"Wrote {script_path} and {len(target_files)} target file(s)")
+
+with tabs[5]:
     st.subheader("Export")
 
     colA, colB = st.columns(2)
@@ -223,7 +281,7 @@ with tabs[4]:
             file_name=f"{diff.run_a.network}__CHANGES__{diff.run_a.run_id}__VS__{diff.run_b.run_id}.md",
             mime="text/markdown",
         )
-        st.text_area("Preview (CHANGES.md)", diff.changes_md, height=350)
+        text_preview(diff.changes_md)
 
     with colB:
         st.markdown("### WATCHLIST.md")
@@ -233,11 +291,18 @@ with tabs[4]:
             file_name=f"{diff.run_a.network}__WATCHLIST__{diff.run_a.run_id}__VS__{diff.run_b.run_id}.md",
             mime="text/markdown",
         )
-        st.text_area("Preview (WATCHLIST.md)", diff.watchlist_md, height=350)
+        text_preview(diff.watchlist_md)
 
     st.markdown("### (Optional) Save to disk")
     if st.button("Write CHANGES.md + WATCHLIST.md to data/comparisons/"):
-        out_dir = ROOT / "data" / "comparisons" / diff.run_a.network / \
-            f"{diff.run_a.run_id}__VS__{diff.run_b.run_id}"
+        out_dir = comparison_dir(diff)
         p_changes, p_watch = save_markdown_pair(diff, out_dir)
         st.success(f"Wrote:\n- {p_changes}\n- {p_watch}")
+
+    st.markdown("### Machine-readable events (SIEM)")
+    st.caption("Every opened / closed / risky / new-host / removed-host event, one record per line, no row cap.")
+    fmt = st.radio("Format", ["ndjson", "csv"], horizontal=True, key="export_fmt")
+    if st.button("Write events to data/comparisons/"):
+        out_path = comparison_dir(diff) / f"events.{fmt}"
+        n = export_diff(diff, out_path, fmt=fmt)
+        st.success(f"Wrote {n} events to {out_path}")
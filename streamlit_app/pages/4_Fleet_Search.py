@@ -0,0 +1,87 @@
+import _bootstrap  # noqa: F401
+
+import time
+
+import streamlit as st
+
+from _paging import paged_dataframe
+from core.index import (
+    BANNER_FIELDS,
+    INDEX_TTL_SECONDS,
+    banner_hits_to_df,
+    get_banner_index,
+    get_port_index,
+    hits_to_df,
+)
+
+st.set_page_config(page_title="Fleet Search", layout="wide")
+st.title("Fleet Search")
+st.caption("Where, anywhere in the fleet, is a port, service or banner exposed? Indexed across every ingested run.")
+
+# Reruns reuse the shared index; the filesystem is rescanned only on request or
+# after INDEX_TTL_SECONDS (runs ingested in this process are indexed on arrival).
+rescan = st.button("Rescan runs")
+with st.spinner("Indexing new runs..."):
+    index = get_port_index(refresh=rescan, max_age=INDEX_TTL_SECONDS)
+    banners = get_banner_index()
+
+if index.run_count == 0:
+    st.warning("No runs found yet. Upload/extract a baselinekit zip in the Ingest page first.")
+    st.stop()
+
+st.metric("Runs indexed", index.run_count)
+
+tab_ports, tab_banners = st.tabs(["Ports & services", "Banner search"])
+
+with tab_ports:
+    c1, c2, c3 = st.columns([1, 1, 1])
+    with c1:
+        mode = st.radio("Search by", ["Port", "Service"], horizontal=True)
+    with c2:
+        if mode == "Port":
+            port = st.number_input("Port", min_value=0, max_value=65535, value=3389, step=1)
+            protocol = st.selectbox("Protocol", ["tcp", "udp"], index=0)
+        else:
+            service = st.selectbox("Service", index.services() or [""], index=0)
+    with c3:
+        latest_only = st.toggle("Latest run only (right now)", value=True)
+
+    started = time.perf_counter()
+    if mode == "Port":
+        hits = index.hosts_with_port(int(port), protocol=protocol, latest_only=latest_only)
+    else:
+        hits = index.hosts_with_service(service, latest_only=latest_only)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    df_hits = hits_to_df(hits)
+    st.caption(f"{len(df_hits)} hits across {df_hits['network'].nunique()} networks in {elapsed_ms:.1f} ms")
+
+    if df_hits.empty:
+        st.success("No matching open ports in the indexed runs.")
+    else:
+        paged_dataframe(df_hits, key="fleet_port_hits")
+
+with tab_banners:
+    c1, c2, c3 = st.columns([2, 1, 1])
+    with c1:
+        query = st.text_input("Banner text", placeholder='e.g. "OpenSSH 7." or "lighttpd"')
+    with c2:
+        match = st.radio("Match", ["substring", "prefix"], horizontal=True)
+    with c3:
+        banner_latest_only = st.toggle("Latest run only", value=False, key="banner_latest_only")
+    fields = st.multiselect("Fields", list(BANNER_FIELDS), default=list(BANNER_FIELDS))
+
+    if query.strip():
+        started = time.perf_counter()
+        banner_hits = banners.search(query, mode=match, fields=fields, latest_only=banner_latest_only)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        df_banner = banner_hits_to_df(banner_hits)
+        st.caption(
+            f"{len(df_banner)} hits on {df_banner['ip'].nunique()} hosts "
+            f"across {df_banner['network'].nunique()} networks in {elapsed_ms:.1f} ms"
+        )
+        if df_banner.empty:
+            st.success("No matching banners in the indexed runs.")
+        else:
+            paged_dataframe(df_banner, key="fleet_banner_hits")
@@ -0,0 +1,89 @@
+import _bootstrap  # noqa: F401
+
+import time
+
+import streamlit as st
+
+from _paging import paged_dataframe
+from core.cache import get_parse_cache
+from core.discovery import discover_runs
+from core.inventory import INVENTORY_SUFFIXES, inventory_dir, load_inventory, reconcile_run, save_inventory
+
+st.set_page_config(page_title="Inventory", layout="wide")
+st.sidebar.caption(f"Parse cache: {get_parse_cache().stats().describe()}")
+st.title("Inventory Reconciliation")
+st.caption("Which hosts are not in the asset inventory, which ports an asset should not have open, "
+           "and which assets did not show up in the scan.")
+
+with st.expander("Inventory format"):
+    st.markdown(
+        "CSV with a header row, or JSON (a list of objects, or `{\"assets\": [...]}`):\n\n"
+        "- `ip` — address or CIDR (`10.0.0.5`, `10.0.1.0/24`); optional when `mac` is given\n"
+        "- `mac`, `owner`, `name` — optional\n"
+        "- `expected_ports` — e.g. `22, 443/tcp, udp/53`; blank = not checked, `none` = no open ports allowed\n\n"
+        "Hosts match by exact IP, then MAC, then the longest containing CIDR."
+    )
+
+uploaded = st.file_uploader("Upload an inventory", type=[s.lstrip(".") for s in INVENTORY_SUFFIXES])
+if uploaded and st.button("Save inventory"):
+    try:
+        path = save_inventory(uploaded.name, uploaded.getvalue())
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    st.success(f"Saved to `{path}`")
+
+inv_dir = inventory_dir()
+inventories = sorted(p for p in inv_dir.glob("*") if p.suffix.lower() in INVENTORY_SUFFIXES) if inv_dir.exists() else []
+if not inventories:
+    st.info("No inventory yet. Upload a CSV or JSON asset list above.")
+    st.stop()
+
+runs = discover_runs()
+if not runs:
+    st.warning("No runs found yet. Upload/extract a baselinekit zip in the Ingest page first.")
+    st.stop()
+
+c1, c2, c3 = st.columns([1, 1, 2])
+with c1:
+    inv_path = st.selectbox("Inventory", inventories, format_func=lambda p: p.name)
+with c2:
+    network = st.selectbox("Network", sorted({r.network for r in runs}))
+net_runs = sorted((r for r in runs if r.network == network), key=lambda r: r.run_name, reverse=True)
+with c3:
+    run = st.selectbox("Run", net_runs, format_func=lambda r: f"{r.timestamp_str or '(no ts)'} | {r.run_type} | {r.run_name}")
+
+try:
+    with st.spinner("Indexing inventory..."):
+        index = load_inventory(inv_path)
+except ValueError as e:
+    st.error(f"Invalid inventory: {e}")
+    st.stop()
+
+started = time.perf_counter()
+with st.spinner("Reconciling..."):
+    result = reconcile_run(run, index)
+elapsed = time.perf_counter() - started
+st.caption(f"{len(index):,} assets vs {result.hosts:,} hosts in {elapsed:.2f} s")
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Matched hosts", result.matched_hosts)
+m2.metric("Unknown devices", len(result.unknown_hosts))
+m3.metric("Unexpected ports", len(result.unexpected_ports))
+m4.metric("Missing assets", len(result.missing_assets))
+
+tabs = st.tabs(["Unknown devices", "Unexpected ports", "Missing assets"])
+for tab, (name, df) in zip(tabs, (("unknown_hosts", result.unknown_hosts),
+                                  ("unexpected_ports", result.unexpected_ports),
+                                  ("missing_assets", result.missing_assets))):
+    with tab:
+        if df.empty:
+            st.success("Nothing to report.")
+            continue
+        paged_dataframe(df, key=f"inventory_{name}")
+        st.download_button(
+            f"Download {name}.csv",
+            data=df.to_csv(index=False),
+            file_name=f"{run.network}__{name}__{run.run_id}.csv",
+            mime="text/csv",
+        )
@@ -0,0 +1,55 @@
+import sys
+from itertools import count
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from core.discovery import RunInfo, runs_for_extracted_root  # noqa: E402
+
+Ports = Iterable[Tuple[str, int]]  # (protocol, port)
+
+_SERVICES = {22: "ssh", 80: "http", 443: "https", 3389: "ms-wbt-server", 53: "domain"}
+
+
+def ports_xml(hosts: Dict[str, Ports]) -> str:
+    out = ['<?xml version="1.0"?><nmaprun>']
+    for ip, ports in hosts.items():
+        rows = "".join(
+            f'<port protocol="{proto}" portid="{port}"><state state="open"/>'
+            f'<service name="{_SERVICES.get(port, "unknown")}"/></port>'
+            for proto, port in ports
+        )
+        kind = "ipv6" if ":" in ip else "ipv4"
+        out.append(f'<host><status state="up"/><address addr="{ip}" addrtype="{kind}"/><ports>{rows}</ports></host>')
+    out.append("</nmaprun>")
+    return "".join(out)
+
+
+@pytest.fixture
+def make_run(tmp_path):
+    """
+    make_run({ip: [(proto, port), ...]}, hosts_up=None, network="lab") -> RunInfo,
+    laid out like one extracted baselinekit zip under tmp_path/extracted. Runs
+    of one network are six hours apart, in call order.
+    """
+    seq = count()
+
+    def make(hosts: Dict[str, Ports], hosts_up: Optional[Iterable[str]] = None, network: str = "lab",
+             run_type: str = "baselinekit_v0") -> RunInfo:
+        n = next(seq)
+        run_name = f"2025-01-{1 + n // 4:02d}_{(n % 4) * 6:02d}00_{run_type}"
+        extracted_root = tmp_path / "extracted" / f"{network}_{run_name}_{n:08x}"
+        run_folder = extracted_root / "rawscans" / run_name
+        run_folder.mkdir(parents=True)
+        (run_folder / "ports_top200_open.xml").write_text(ports_xml(hosts), encoding="utf-8")
+        up = list(hosts) if hosts_up is None else list(hosts_up)
+        (run_folder / "hosts_up.txt").write_text("".join(f"{ip}\n" for ip in up if ":" not in ip), encoding="utf-8")
+        (run,) = runs_for_extracted_root(extracted_root)
+        return run
+
+    return make
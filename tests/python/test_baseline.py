@@ -0,0 +1,56 @@
+import numpy as np
+
+from core.baseline import BaselineStore, rolling_compare, window_members
+from core.diff import compare_runs
+
+
+def _opened(result):
+    return sorted(zip(result.ports_opened["ip"], result.ports_opened["port"].astype(int)))
+
+
+def test_min_presence_separates_union_from_k_of_n(make_run, tmp_path):
+    runs = [
+        make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]}),
+        make_run({"10.0.0.1": [("tcp", 22)]}),
+        make_run({"10.0.0.1": [("tcp", 22)]}),
+    ]
+    run_b = make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]})
+    root = tmp_path / "baselines"
+    union = rolling_compare(run_b, runs, size=3, min_presence=1, root=root)
+    assert _opened(union) == [] and union.new_hosts == []
+    two_of_three = rolling_compare(run_b, runs, size=3, min_presence=2, root=root)
+    assert _opened(two_of_three) == [("10.0.0.2", 80)] and two_of_three.new_hosts == ["10.0.0.2"]
+
+
+def test_sliding_window_matches_a_window_built_from_scratch(make_run, tmp_path):
+    runs = [make_run({f"10.0.{i % 3}.{i}": [("tcp", 22 + i)], "10.0.9.9": [("tcp", 443)]}) for i in range(6)]
+    slid = tmp_path / "slid"
+    for run_b in runs[3:]:
+        rolling_compare(run_b, runs, size=3, root=slid)
+
+    members = window_members(runs[-1], runs, 3)
+    incremental = BaselineStore("lab", "baselinekit_v0", slid).window(members, runs)
+    scratch = BaselineStore("lab", "baselinekit_v0", tmp_path / "scratch").window(members, runs)
+    assert [m["run_id"] for m in incremental.members] == [r.run_id for r in runs[2:5]]
+    for name in ("port_keys", "port_counts", "other_keys", "other_counts", "host_keys", "host_counts"):
+        assert np.array_equal(getattr(incremental, name), getattr(scratch, name)), name
+
+
+def test_min_presence_is_clamped_to_a_short_window(make_run, tmp_path):
+    first = make_run({"10.0.0.1": [("tcp", 22)]})
+    run_b = make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.5": [("tcp", 80)]})
+    result = rolling_compare(run_b, [first, run_b], size=5, min_presence=3, root=tmp_path / "baselines")
+    assert result.run_a.run_id.startswith("last1_min1_")
+    assert _opened(result) == [("10.0.0.5", 80)]
+
+
+def test_intermittent_host_is_not_new(make_run, tmp_path):
+    laptop = {"10.0.0.9": [("tcp", 3389)]}
+    runs = [
+        make_run({"10.0.0.1": [("tcp", 22)], **laptop}),
+        make_run({"10.0.0.1": [("tcp", 22)]}),
+    ]
+    run_b = make_run({"10.0.0.1": [("tcp", 22)], **laptop})
+    assert compare_runs(runs[-1], run_b).new_hosts == ["10.0.0.9"]
+    rolling = rolling_compare(run_b, runs, size=2, root=tmp_path / "baselines")
+    assert rolling.new_hosts == [] and _opened(rolling) == []
@@ -0,0 +1,94 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import core.cache
+from core.cache import DEFAULT_BUDGET_MB, ParsedRunCache, _budget_from_env, cached_parse
+
+
+def _value(nbytes):
+    return np.zeros(nbytes, dtype=np.uint8)
+
+
+def test_lru_eviction_within_the_byte_budget():
+    cache = ParsedRunCache(budget_bytes=300)
+    for name in ("a", "b", "c"):
+        cache.get_or_compute(name, lambda: _value(100))
+    cache.get_or_compute("a", lambda: pytest.fail("a was evicted"))  # a is now most recent
+
+    cache.get_or_compute("d", lambda: _value(100))  # evicts b, the least recently used
+    cache.get_or_compute("c", lambda: pytest.fail("c was evicted"))
+    recomputed = []
+    cache.get_or_compute("b", lambda: recomputed.append("b") or _value(100))
+    assert recomputed == ["b"]
+
+    stats = cache.stats()
+    assert stats.bytes_used <= 300 and stats.entries == 3 and stats.evictions == 2
+
+    cache.get_or_compute("huge", lambda: _value(301))  # larger than the budget: never cached
+    assert cache.stats().entries == 3
+
+
+@pytest.mark.parametrize("raw, mb", [
+    (None, DEFAULT_BUDGET_MB), ("", DEFAULT_BUDGET_MB), ("64", 64), ("0.5", 0.5),
+    ("0", 0), ("-5", 0), ("lots", DEFAULT_BUDGET_MB),
+])
+def test_budget_from_env(monkeypatch, raw, mb):
+    if raw is None:
+        monkeypatch.delenv("PSEC_PARSE_CACHE_MB", raising=False)
+    else:
+        monkeypatch.setenv("PSEC_PARSE_CACHE_MB", raw)
+    assert _budget_from_env() == int(mb * 1024 * 1024)
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ParsedRunCache(budget_bytes=1 << 20)
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return _value(10)
+
+    results = [None, None]
+
+    def call(i):
+        results[i] = cache.get_or_compute("run", load)
+
+    first = threading.Thread(target=call, args=(0,))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=call, args=(1,))
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert loads == [1]
+    assert results[0] is results[1] is not None
+
+
+def test_changed_files_are_reparsed(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.cache, "_PARSE_CACHE", ParsedRunCache(budget_bytes=1 << 20))
+    path = tmp_path / "scan.xml"
+    path.write_text("<nmaprun/>")
+    parses = []
+
+    def parse():
+        parses.append(path.read_text())
+        return path.read_text()
+
+    assert cached_parse("test", [path], parse) == "<nmaprun/>"
+    cached_parse("test", [path], parse)
+    assert len(parses) == 1
+
+    path.write_text("<nmaprun></nmaprun>")  # new size
+    assert cached_parse("test", [path], parse) == "<nmaprun></nmaprun>"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # same size, new mtime
+    cached_parse("test", [path], parse)
+    assert len(parses) == 3
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import core.shard
+from conftest import ports_xml
+from core.diff import compare_runs, compare_runs_streaming
+from core.shard import compare_runs_sharded
+
+
+def _fleet(seed, hosts=300):
+    rng = random.Random(seed)
+    out = {}
+    for i in range(hosts):
+        ip = f"10.{i % 3}.{i // 100}.{i % 100 + 1}"
+        out[ip] = sorted({(rng.choice(["tcp", "tcp", "udp"]), rng.choice([22, 53, 80, 443, 3389, 8080]))
+                          for _ in range(rng.randint(0, 3))})
+    return out
+
+
+def _keys(diff):
+    def rows(df):
+        return sorted(map(tuple, df[["ip", "protocol", "port", "service"]].astype(str).values.tolist()))
+    return rows(diff.ports_opened), rows(diff.ports_closed), diff.new_hosts, diff.removed_hosts, \
+        sorted(map(tuple, diff.risky_opened.astype(str).values.tolist()))
+
+
+@pytest.fixture
+def fleet_pair(make_run):
+    return make_run(_fleet(1)), make_run(_fleet(2))
+
+
+@pytest.fixture
+def small_shards(monkeypatch):
+    # Many map ranges and partitions even for a tiny fixture.
+    monkeypatch.setattr(core.shard, "CHUNK_XML_BYTES", 2_000)
+    monkeypatch.setattr(core.shard, "PARTITION_XML_BYTES", 10_000)
+
+
+def test_streaming_matches_in_memory(fleet_pair):
+    a, b = fleet_pair
+    assert _keys(compare_runs_streaming(a, b)) == _keys(compare_runs(a, b))
+
+
+def test_sharded_matches_in_memory(fleet_pair, small_shards, tmp_path):
+    a, b = fleet_pair
+    spill = tmp_path / "spill"
+    spill.mkdir()
+    assert _keys(compare_runs_sharded(a, b, workers=1, spill_dir=spill)) == _keys(compare_runs(a, b))
+    assert not list(spill.iterdir())  # spill files cleaned up
+
+
+def test_sharded_across_processes(fleet_pair, small_shards, monkeypatch):
+    monkeypatch.setattr(core.shard, "MIN_PARALLEL_XML_BYTES", 0)
+    a, b = fleet_pair
+    assert _keys(compare_runs_sharded(a, b, workers=2)) == _keys(compare_runs(a, b))
+
+
+def test_sharded_prefix_filter_only_reports_wanted_prefixes(fleet_pair, small_shards):
+    a, b = fleet_pair
+    wanted = (10 << 16) | (1 << 8) | 0   # 10.1.0.0/24
+    diff = compare_runs_sharded(a, b, workers=1, prefixes={wanted})
+    full = compare_runs(a, b)
+
+    in_wanted = full.ports_opened[full.ports_opened["ip"].str.startswith("10.1.0.")]
+    assert sorted(diff.ports_opened["ip"]) == sorted(in_wanted["ip"])
+    assert not diff.ports_opened.empty
+
+
+def test_sharded_split_scan_keeps_first_part(make_run, small_shards):
+    a = make_run({"10.0.0.1": [("tcp", 22)]})
+    b = make_run({"10.0.0.1": [("tcp", 22)]})
+    # B is a split scan; part02 repeats 10.0.0.1 and adds 10.0.0.2.
+    part1 = b.run_folder / "ports_top200_open.xml"
+    part1.rename(b.run_folder / "ports_top200_open.part01.xml")
+    (b.run_folder / "ports_top200_open.part02.xml").write_text(
+        ports_xml({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 443)]}), encoding="utf-8")
+
+    assert _keys(compare_runs_sharded(a, b, workers=1)) == _keys(compare_runs(a, b))
+    assert compare_runs_sharded(a, b, workers=1).ports_opened["ip"].tolist() == ["10.0.0.2"]
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+
+import pytest
+
+from core.diff import compare_runs
+from core.export import EXPORT_FIELDS, export_diff, iter_diff_events, write_events
+
+
+@pytest.fixture
+def diff(make_run):
+    a = make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]})
+    b = make_run({"10.0.0.1": [("tcp", 22), ("tcp", 3389)], "10.0.0.3": [("udp", 53)]})
+    return compare_runs(a, b)
+
+
+def _events(records):
+    return sorted((r["event"], r["ip"], r["port"]) for r in records)
+
+
+EXPECTED = [
+    ("host_new", "10.0.0.3", ""),
+    ("host_removed", "10.0.0.2", ""),
+    ("port_closed", "10.0.0.2", 80),
+    ("port_opened", "10.0.0.1", 3389),
+    ("port_opened", "10.0.0.3", 53),
+    ("risky_exposure", "10.0.0.1", 3389),
+]
+
+
+def test_ndjson_export(diff, tmp_path):
+    dest = tmp_path / "events.ndjson"
+    assert export_diff(diff, dest) == len(EXPECTED)
+
+    records = [json.loads(line) for line in dest.read_text().splitlines()]
+    assert _events(records) == EXPECTED
+    assert all(list(r) == EXPORT_FIELDS for r in records)
+    opened = next(r for r in records if r["event"] == "port_opened" and r["port"] == 3389)
+    assert opened["priority"] == "P0" and opened["service"] == "ms-wbt-server"
+    assert opened["run_a_id"] == diff.run_a.run_id and opened["run_b_id"] == diff.run_b.run_id
+
+
+def test_csv_export_has_a_stable_header(diff, tmp_path):
+    dest = tmp_path / "events.csv"
+    assert export_diff(diff, dest) == len(EXPECTED)
+
+    with dest.open(newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    assert reader.fieldnames == EXPORT_FIELDS
+    assert _events({**r, "port": int(r["port"]) if r["port"] else ""} for r in rows) == EXPECTED
+
+
+def test_csv_header_written_for_no_events(tmp_path):
+    out = io.StringIO()
+    assert write_events(iter([]), out, "csv") == 0
+    assert out.getvalue().strip() == ",".join(EXPORT_FIELDS)
+
+
+def test_dash_writes_to_stdout(diff, capsys, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert export_diff(diff, "-") == len(EXPECTED)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert _events(json.loads(line) for line in lines) == EXPECTED
+    assert not (tmp_path / "-").exists()
+
+
+def test_unknown_format_is_rejected(diff):
+    with pytest.raises(ValueError):
+        write_events(iter_diff_events(diff), io.StringIO(), "xml")
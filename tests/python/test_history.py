@@ -0,0 +1,65 @@
+import pytest
+
+from core.diff import load_open_ports_df
+from core.history import HistoryStore, compact_history
+
+
+def test_history_reconstructs_every_run(make_run, tmp_path):
+    runs = [
+        make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]}),
+        make_run({"10.0.0.1": [("tcp", 22), ("tcp", 443)]}),
+        make_run({"10.0.0.3": [("tcp", 3389)]}),
+    ]
+    root = tmp_path / "history"
+    store = compact_history(runs, root=root, checkpoint_every=2)[("lab", "baselinekit_v0")]
+    assert [e["kind"] for e in store.runs] == ["checkpoint", "delta", "checkpoint"]
+
+    reopened = HistoryStore("lab", "baselinekit_v0", root=root)
+    for run in runs:
+        stored = reopened.reconstruct(run.run_id)
+        expected = load_open_ports_df(run)
+        assert sorted(zip(stored.ports["ip"], stored.ports["port"])) == \
+            sorted(zip(expected["ip"], expected["port"].astype(int)))
+        assert run.run_folder.exists()
+
+
+def test_pruned_runs_are_read_back_from_history(make_run, tmp_path):
+    from core.diff import compare_runs, load_hosts
+    from core.discovery import discover_runs
+    from core.ingest import is_compacted
+    from core.planner import SHARDED, run_compare
+    from core.run_data import load_run_data
+
+    runs = [
+        make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]}, hosts_up=["10.0.0.1", "10.0.0.2", "10.0.0.7"]),
+        make_run({"10.0.0.1": [("tcp", 22), ("tcp", 443)]}),
+    ]
+    before = [(load_hosts(r), sorted(load_open_ports_df(r)[["ip", "port"]].itertuples(index=False))) for r in runs]
+    diff_before = compare_runs(*runs)
+
+    compact_history(runs, root=tmp_path / "history", archive_dir=tmp_path / "archive", prune=True)
+    assert all(is_compacted(r.run_folder) for r in runs)
+    assert [p.name for p in runs[0].run_folder.iterdir()] == ["COMPACTED.json"]
+    assert len(list((tmp_path / "archive" / "lab").glob("*.tar.gz"))) == 2
+
+    rediscovered = sorted(discover_runs(tmp_path / "extracted"), key=lambda r: r.run_name)
+    assert [r.run_id for r in rediscovered] == [r.run_id for r in runs]
+    after = [(load_hosts(r), sorted(load_open_ports_df(r)[["ip", "port"]].itertuples(index=False))) for r in rediscovered]
+    assert after == before
+
+    for diff in (compare_runs(*rediscovered), run_compare(*rediscovered, strategy=SHARDED,
+                                                          fingerprint_root=tmp_path / "fp")):
+        assert diff.new_hosts == diff_before.new_hosts and diff.removed_hosts == diff_before.removed_hosts
+        assert sorted(diff.ports_opened["port"]) == sorted(diff_before.ports_opened["port"])
+    data = load_run_data(rediscovered[0].run_folder)
+    assert sorted(data.host_table()["ip"]) == ["10.0.0.1", "10.0.0.2", "10.0.0.7"]
+    assert len(data.ports_for("ports", open_only=True)) == 2
+
+    # Already compacted: nothing to store or prune again.
+    again = compact_history(rediscovered, root=tmp_path / "history", archive_dir=tmp_path / "archive", prune=True)
+    assert len(again[("lab", "baselinekit_v0")].runs) == 2
+
+
+def test_prune_needs_an_archive(make_run, tmp_path):
+    with pytest.raises(ValueError):
+        compact_history([make_run({"10.0.0.1": [("tcp", 22)]})], root=tmp_path / "history", prune=True)
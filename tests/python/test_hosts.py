@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from core.hosts import (
+    _dotted_to_array,
+    host_delta,
+    ip_array_from_strings,
+    ip_array_to_strings,
+    read_gnmap_up_array,
+    read_hosts_up_array,
+    read_xml_up_array,
+)
+
+
+def test_ip_strings_round_trip_sorted_and_unique():
+    ips = ["10.0.0.10", "10.0.0.2", "255.255.255.255", "0.0.0.0", "10.0.0.2", " 192.168.1.1 "]
+    arr = ip_array_from_strings(ips)
+    assert arr.dtype == np.uint32
+    assert ip_array_to_strings(arr) == ["0.0.0.0", "10.0.0.2", "10.0.0.10", "192.168.1.1", "255.255.255.255"]
+    assert ip_array_to_strings(np.empty(0, dtype=np.uint32)) == []
+
+
+def test_non_ipv4_is_dropped():
+    assert ip_array_to_strings(ip_array_from_strings(["10.0.0.256", "999.1.1.1", "fe80::1", "host", "1.2.3.4"])) \
+        == ["1.2.3.4"]
+
+
+def test_malformed_octets_raise():
+    for bad in ([b"1.2.3"], [b"1..2.3"], [b"1.2.3.4x"]):
+        with pytest.raises(ValueError):
+            _dotted_to_array(bad)
+
+
+def test_read_hosts_up_array(tmp_path):
+    path = tmp_path / "hosts_up.txt"
+    path.write_text("10.0.0.2\n  10.0.0.1\r\n# comment\n10.0.0.2\n300.0.0.1\nfe80::1\n10.0.0.3 extra\n")
+    assert ip_array_to_strings(read_hosts_up_array(path)) == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_read_gnmap_up_array(tmp_path):
+    path = tmp_path / "discovery.gnmap"
+    path.write_text(
+        "# Nmap 7.94 scan\n"
+        "Host: 10.0.0.5 (printer.lan)\tStatus: Up\n"
+        "Host: 10.0.0.6 ()\tStatus: Down\n"
+        "Host: 10.0.0.1 ()\tStatus: Up\n"
+        "Host: 10.0.0.5 (printer.lan)\tPorts: 22/open/tcp//ssh///\n"
+    )
+    assert ip_array_to_strings(read_gnmap_up_array(path)) == ["10.0.0.1", "10.0.0.5"]
+
+
+def test_read_xml_up_array(tmp_path):
+    path = tmp_path / "discovery.xml"
+    path.write_text(
+        '<nmaprun>'
+        '<host><status state="up"/><address addr="aa:bb:cc:dd:ee:ff" addrtype="mac"/>'
+        '<address addr="10.0.0.9" addrtype="ipv4"/></host>'
+        '<host><status state="down"/><address addr="10.0.0.8" addrtype="ipv4"/></host>'
+        '<host><status state="up"/><address addr="fe80::1" addrtype="ipv6"/></host>'
+        '<host><status state="up"/><address addr="10.0.0.1" addrtype="ipv4"/></host>'
+        '</nmaprun>'
+    )
+    assert ip_array_to_strings(read_xml_up_array(path)) == ["10.0.0.1", "10.0.0.9"]
+
+
+def test_host_delta():
+    a = ip_array_from_strings(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+    b = ip_array_from_strings(["10.0.0.2", "10.0.0.3", "10.0.0.4", "9.9.9.9"])
+    new, removed = host_delta(a, b)
+    assert ip_array_to_strings(new) == ["9.9.9.9", "10.0.0.4"]
+    assert ip_array_to_strings(removed) == ["10.0.0.1"]
+    assert all(len(x) == 0 for x in host_delta(a, a))
@@ -0,0 +1,10 @@
+import pytest
+
+from core.importtime import LIGHT_MODULES, measure_import
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_light_modules_do_not_import_the_data_stack(module):
+    timing = measure_import(module)
+    assert timing.heavy == [], f"{module} imports {', '.join(timing.heavy)} at import time"
+    assert timing.cumulative_ms > 0
@@ -0,0 +1,71 @@
+import pytest
+
+import core.index
+from core.index import BannerIndex, PortIndex, get_port_index, index_new_runs
+
+
+def _hits(index, query, **kw):
+    return sorted((h.run_id, h.ip, h.port, h.field, h.value) for h in index.search(query, **kw))
+
+
+def test_banner_search_forgets_removed_runs(make_run):
+    index = BannerIndex()
+    old = make_run({"10.0.0.1": [("tcp", 22)]})
+    new = make_run({"10.0.0.1": [("tcp", 80)], "10.0.0.2": [("tcp", 22)]})
+    index.add_run(old)
+    index.add_run(new)
+    assert [h[0] for h in _hits(index, "ssh")] == [old.run_id, new.run_id]
+
+    index.remove_run(old)
+    assert _hits(index, "ssh") == [(new.run_id, "10.0.0.2", 22, "service", "ssh")]
+    assert _hits(index, "ht", mode="prefix") == [(new.run_id, "10.0.0.1", 80, "service", "http")]
+
+    index.remove_run(new)
+    assert _hits(index, "ssh") == [] and _hits(index, "h", mode="prefix") == [] and _hits(index, "s") == []
+
+
+def test_banner_values_freed_on_unindex_do_not_leak_into_new_runs(make_run):
+    index = BannerIndex()
+    first = make_run({"10.0.0.1": [("tcp", 22)]})
+    index.add_run(first)
+    index.remove_run(first)
+
+    # The new value takes the freed slot; searches for the old one must not find it.
+    second = make_run({"10.0.0.9": [("tcp", 3389)]})
+    index.add_run(second)
+    assert _hits(index, "ssh") == [] and _hits(index, "ss", mode="prefix") == []
+    assert _hits(index, "wbt") == [(second.run_id, "10.0.0.9", 3389, "service", "ms-wbt-server")]
+    assert _hits(index, "ms-", mode="prefix") == _hits(index, "wbt")
+
+
+@pytest.fixture
+def fresh_indexes(monkeypatch):
+    monkeypatch.setattr(core.index, "_PORT_INDEX", PortIndex())
+    monkeypatch.setattr(core.index, "_BANNER_INDEX", BannerIndex())
+    monkeypatch.setattr(core.index, "_last_sync", None)
+
+
+def test_queries_do_not_rescan_until_asked_or_stale(make_run, fresh_indexes, monkeypatch):
+    first = make_run({"10.0.0.1": [("tcp", 22)]})
+    walks = []
+    monkeypatch.setattr(core.index, "discover_runs", lambda: walks.append(1) or [first])
+
+    assert get_port_index().run_count == 0 and walks == []
+    assert get_port_index(max_age=60).run_count == 1 and len(walks) == 1
+    for _ in range(3):
+        get_port_index(max_age=60)
+    assert len(walks) == 1
+
+    # Runs ingested in this process show up without another walk.
+    second = make_run({"10.0.0.5": [("tcp", 80)]})
+    index_new_runs([second])
+    assert [h.ip for h in get_port_index(max_age=60).hosts_with_port(80)] == ["10.0.0.5"]
+    assert len(walks) == 1
+
+    get_port_index(refresh=True)
+    assert len(walks) == 2
+
+
+def test_index_new_runs_waits_for_the_first_sync(make_run, fresh_indexes):
+    index_new_runs([make_run({"10.0.0.1": [("tcp", 22)]})])
+    assert get_port_index().run_count == 0
@@ -0,0 +1,52 @@
+import zipfile
+
+import pytest
+
+import core.ingest as ingest
+from core.ingest import extract_zip
+
+RUN = "lab/rawscans/2025-01-01_0000_baselinekit_v0"
+
+
+def _zip(tmp_path, names):
+    path = tmp_path / "upload.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        for name in names:
+            z.writestr(name, "x")
+    return path
+
+
+def test_snapshot_globs_only_match_inside_the_run_folder(tmp_path):
+    src = _zip(tmp_path, [
+        f"{RUN}/arp_table.txt",
+        f"{RUN}/hosts_up.txt",
+        "lab/webui/js/route.js",
+        "lab/screens/arp.png",
+    ])
+    out = extract_zip(src, tmp_path / "out")
+    found = sorted(p.relative_to(out).as_posix() for p in out.rglob("*") if p.is_file())
+    assert found == [f"{RUN}/arp_table.txt", f"{RUN}/hosts_up.txt"]
+
+
+def test_extract_zip_refuses_an_existing_out_dir(tmp_path):
+    src = _zip(tmp_path, [f"{RUN}/hosts_up.txt"])
+    out = tmp_path / "out"
+    (out / "keep").mkdir(parents=True)
+    with pytest.raises(FileExistsError):
+        extract_zip(src, out)
+    assert [p.name for p in out.iterdir()] == ["keep"]
+
+
+def test_extract_zip_failure_leaves_nothing_behind(tmp_path, monkeypatch):
+    src = _zip(tmp_path, [f"{RUN}/hosts_up.txt"])
+    real = ingest._extract_all
+
+    def fail_after_writing(*args):
+        real(*args)
+        raise ValueError("boom")
+
+    monkeypatch.setattr(ingest, "_extract_all", fail_after_writing)
+    target = tmp_path / "extracted" / "out"
+    with pytest.raises(ValueError):
+        extract_zip(src, target)
+    assert list(target.parent.iterdir()) == []
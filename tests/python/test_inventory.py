@@ -0,0 +1,55 @@
+from core.inventory import build_index, parse_assets, reconcile_run
+
+
+def _index(rows):
+    return build_index(parse_assets(rows))
+
+
+def test_reconcile_flags_unknown_unexpected_and_missing(make_run):
+    run = make_run({"10.0.0.1": [("tcp", 22), ("tcp", 3389)], "10.0.1.7": [("tcp", 80)], "10.9.9.9": []})
+    index = _index([
+        {"ip": "10.0.0.1", "name": "jump", "expected_ports": "22"},
+        {"ip": "10.0.1.0/24", "name": "web", "expected_ports": "80, 443"},
+        {"ip": "10.0.0.2", "name": "printer"},
+    ])
+
+    result = reconcile_run(run, index)
+
+    assert result.unknown_hosts["ip"].tolist() == ["10.9.9.9"]
+    assert result.unexpected_ports[["ip", "port"]].values.tolist() == [["10.0.0.1", 3389]]
+    assert result.missing_assets["name"].tolist() == ["printer"]
+    assert result.matched_hosts == 2
+
+
+def test_longest_prefix_wins():
+    index = _index([{"ip": "10.0.0.0/16", "name": "wide"}, {"ip": "10.0.5.0/28", "name": "narrow"}])
+    from core.hosts import ip_array_from_strings
+
+    idx, how = index.match(ip_array_from_strings(["10.0.5.3", "10.0.9.3"]))
+    assert [index.assets[i].name for i in idx] == ["narrow", "wide"]
+    assert how == ["cidr/28", "cidr/16"]
+
+
+def test_empty_inventory_reports_every_host_unknown(make_run):
+    run = make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": []})
+
+    result = reconcile_run(run, _index([]))
+
+    assert result.unknown_hosts["ip"].tolist() == ["10.0.0.1", "10.0.0.2"]
+    assert result.unexpected_ports.empty
+    assert result.missing_assets.empty
+
+
+def test_duplicate_rows_are_merged_not_missing(make_run):
+    run = make_run({"10.0.0.1": [("tcp", 22), ("tcp", 443)]})
+    index = _index([
+        {"ip": "10.0.0.1", "name": "db", "expected_ports": "22"},
+        {"ip": "10.0.0.1", "owner": "ops", "expected_ports": "443"},
+    ])
+
+    result = reconcile_run(run, index)
+
+    assert len(index) == 1
+    assert index.assets[0].owner == "ops"
+    assert result.missing_assets.empty
+    assert result.unexpected_ports.empty
@@ -0,0 +1,37 @@
+import pytest
+
+from core.loadtest import Budget, Scenario, check_budgets, main, run_scenario
+
+TINY = ["--networks", "1", "--runs", "2", "--hosts", "5", "--no-memory"]
+
+
+def test_budget_parse():
+    assert Budget.parse("diff.p95_ms=400") == Budget("diff", "p95_ms", 400.0)
+    for bad in ("diff.p95_ms", "nope.p95_ms=1", "diff.nope=1", "diff.p95_ms=fast"):
+        with pytest.raises(ValueError):
+            Budget.parse(bad)
+
+
+def test_check_budgets_on_a_tiny_scenario(tmp_path):
+    stages = run_scenario(Scenario(networks=1, runs_per_network=2, hosts=5), tmp_path, memory=False)
+    assert [s.name for s in stages] == ["generate", "ingest", "discovery", "scorecard", "diff"]
+    assert check_budgets(stages, [Budget.parse("diff.p95_ms=1e9"), Budget.parse("ingest.ops_per_s=0")]) == []
+    violations = check_budgets(stages, [Budget.parse("diff.p95_ms=0"), Budget.parse("ingest.ops_per_s=1e9")])
+    assert [v.split(" ")[0] for v in violations] == ["diff.p95_ms", "ingest.ops_per_s"]
+
+
+def test_user_work_dir_survives(tmp_path, capsys):
+    work = tmp_path / "lt"
+    work.mkdir()
+    (work / "important.txt").write_text("keep me")
+    assert main(TINY + ["--work-dir", str(work)]) == 0
+    assert main(TINY + ["--work-dir", str(work), "--budget", "diff.p95_ms=0"]) == 1
+    assert [p.name for p in work.iterdir()] == ["important.txt"]
+    assert (work / "important.txt").read_text() == "keep me"
+
+
+def test_user_work_dir_with_scenario_output_is_refused(tmp_path, capsys):
+    (tmp_path / "extracted").mkdir()
+    with pytest.raises(SystemExit):
+        main(TINY + ["--work-dir", str(tmp_path)])
+    assert (tmp_path / "extracted").exists()
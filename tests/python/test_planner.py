@@ -0,0 +1,75 @@
+import pytest
+
+import core.diff
+import core.fingerprint
+from core.fingerprint import fingerprint_run
+from core.planner import (
+    IN_MEMORY_MAX_ROWS,
+    IN_MEMORY,
+    SHARDED,
+    SHARDED_MIN_ROWS,
+    STREAMING,
+    WorkloadEstimate,
+    choose_strategy,
+    run_compare,
+)
+
+
+def _rows(n):
+    return WorkloadEstimate(ports_xml_bytes=0, hosts_up_bytes=0, est_port_rows=n, est_hosts=0)
+
+
+@pytest.mark.parametrize("rows, workers, strategy", [
+    (IN_MEMORY_MAX_ROWS, 4, IN_MEMORY),
+    (IN_MEMORY_MAX_ROWS + 1, 4, STREAMING),
+    (SHARDED_MIN_ROWS - 1, 4, STREAMING),
+    (SHARDED_MIN_ROWS, 4, SHARDED),
+    (SHARDED_MIN_ROWS, 1, STREAMING),
+    (IN_MEMORY_MAX_ROWS, 1, IN_MEMORY),
+])
+def test_choose_strategy_thresholds(rows, workers, strategy):
+    plan = choose_strategy(_rows(rows), workers=workers)
+    assert plan.strategy == strategy and plan.workers == workers
+    assert ("single CPU" in plan.reason) == (rows >= SHARDED_MIN_ROWS and workers == 1)
+
+
+def test_in_memory_compare_parses_each_run_once_and_builds_no_fingerprint(make_run, tmp_path, monkeypatch):
+    a = make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]})
+    b = make_run({"10.0.0.1": [("tcp", 22), ("tcp", 443)], "10.0.0.3": [("udp", 53)]})
+    parsed = []
+    real = core.diff.iter_port_rows_merged
+    monkeypatch.setattr(core.diff, "iter_port_rows_merged", lambda paths: parsed.append(paths) or real(paths))
+    monkeypatch.setattr(core.fingerprint, "build_fingerprint", lambda run: pytest.fail("fingerprint built"))
+
+    diff = run_compare(a, b, strategy=IN_MEMORY, fingerprint_root=tmp_path / "fp")
+
+    assert len(parsed) == 2
+    assert diff.new_hosts == ["10.0.0.3"]
+    assert sorted(zip(diff.ports_opened["ip"], diff.ports_opened["port"])) == [("10.0.0.1", 443), ("10.0.0.3", 53)]
+    assert not list(tmp_path.rglob("*.json"))
+
+
+def test_in_memory_uses_stored_fingerprints(make_run, tmp_path, monkeypatch):
+    a = make_run({"10.0.0.1": [("tcp", 22)]})
+    b = make_run({"10.0.0.1": [("tcp", 22)]})
+    root = tmp_path / "fp"
+    fingerprint_run(a, root)
+    fingerprint_run(b, root)
+    monkeypatch.setattr(core.diff, "iter_port_rows_merged", lambda paths: pytest.fail("parsed"))
+
+    diff = run_compare(a, b, strategy=IN_MEMORY, fingerprint_root=root)
+    assert diff.new_hosts == [] and diff.ports_opened.empty
+
+
+def test_fingerprint_cache_is_per_root(make_run, tmp_path):
+    run = make_run({"10.0.0.1": [("tcp", 22)]})
+    fingerprint_run(run, tmp_path / "one")
+    fingerprint_run(run, tmp_path / "two")
+
+    assert list((tmp_path / "two").rglob("*.json"))
+
+
+def test_fingerprint_without_root_stays_in_memory(make_run, tmp_path):
+    run = make_run({"10.0.0.1": [("tcp", 22)]})
+    assert fingerprint_run(run) == core.fingerprint.build_fingerprint(run)
+    assert not list(tmp_path.rglob("*.json"))
@@ -0,0 +1,86 @@
+import logging
+import shlex
+
+import pandas as pd
+import pytest
+
+from core.diff import DiffResult
+from core.discovery import RunInfo
+from core.rescan import RescanJob, RescanPlan, _merge_groups, plan_rescan, render_rescan_script
+
+
+def _diff(opened):
+    run = RunInfo(network="lab", extracted_root=None, run_folder=None, run_name="r",
+                  run_type="t", timestamp_str="", run_id="r")
+    empty = pd.DataFrame(columns=["ip", "protocol", "port"])
+    return DiffResult(run, run, new_hosts=[], removed_hosts=[], ports_opened=opened, ports_closed=empty,
+                      risky_opened=pd.DataFrame(), changes_md="", watchlist_md="")
+
+
+def _job(protocol, ports=(22,), targets=("10.0.0.1",)):
+    return RescanJob(name="rescan_01", protocol=protocol, ports=ports, targets=targets, priority="", kinds=("opened",))
+
+
+@pytest.mark.parametrize("protocol, flags", [
+    ("tcp", ["-sV", "-Pn", "-p"]),
+    ("udp", ["-sU", "-sV", "-Pn", "-p"]),
+    ("sctp", ["-sY", "-sV", "-Pn", "-p"]),
+])
+def test_nmap_args_per_protocol(protocol, flags):
+    args = _job(protocol, ports=(22, 23, 80)).nmap_args()
+    assert args[:len(flags) + 2] == ["nmap", *flags, "22-23,80"]
+
+
+def test_nmap_args_discovery_and_unknown_protocol():
+    assert _job("", ports=()).nmap_args()[:2] == ["nmap", "-sn"]
+    with pytest.raises(ValueError):
+        _job("icmp").nmap_args()
+
+
+def test_merge_groups_respects_max_jobs():
+    groups = {
+        frozenset({22}): ["10.0.0.1", "10.0.0.2"],
+        frozenset({22, 80}): ["10.0.0.3"],
+        frozenset({443}): ["10.0.0.4"],
+        frozenset({3389}): ["10.0.0.5", "10.0.0.6", "10.0.0.7"],
+    }
+
+    assert _merge_groups(groups, 8) == groups
+    for max_jobs in (3, 2, 1, 0):
+        merged = _merge_groups(groups, max_jobs)
+        assert len(merged) == max(max_jobs, 1)
+        # Every host keeps every port it needed.
+        for ports, ips in groups.items():
+            for ip in ips:
+                assert any(ip in m_ips and ports <= m_ports for m_ports, m_ips in merged.items())
+    # The smallest group ({443}, one probe) joins the cheapest partner; ties go to the lower ports.
+    assert _merge_groups(groups, 3)[frozenset({22, 443})] == ["10.0.0.1", "10.0.0.2", "10.0.0.4"]
+
+
+def test_plan_skips_unscannable_protocols(caplog):
+    opened = pd.DataFrame({"ip": ["10.0.0.1", "10.0.0.2"], "protocol": ["sctp", "ip"], "port": [2905, 1]})
+    diff = _diff(opened)
+
+    with caplog.at_level(logging.WARNING, logger="core.rescan"):
+        plan = plan_rescan(diff)
+
+    assert [(j.protocol, j.ports) for j in plan.jobs] == [("sctp", (2905,))]
+    assert "ip" in caplog.text
+
+
+def test_render_script_quotes_targets_and_paths(tmp_path):
+    out = tmp_path / "it's here"
+    long_targets = tuple(f"10.0.1.{i}" for i in range(20))
+    plan = RescanPlan(network="lab\nrm -rf /", run_a_id="a", run_b_id="b", jobs=[
+        RescanJob("rescan_01", "tcp", (22,), ("10.0.0.1", "host;reboot"), "P2", ("opened",)),
+        RescanJob("rescan_02", "udp", (53,), long_targets, "", ("closed",)),
+    ])
+
+    script = render_rescan_script(plan, out)
+
+    commands = [line for line in script.splitlines() if line and not line.startswith("#")]
+    assert commands[0] == "set -e"
+    assert shlex.split(commands[1])[-4:] == ["10.0.0.1", "host;reboot", "-oX", str(out / "rescan_01.xml")]
+    assert shlex.split(commands[2])[-4:] == ["-iL", str(out / "rescan_02.targets.txt"),
+                                             "-oX", str(out / "rescan_02.xml")]
+    assert len(commands) == 3
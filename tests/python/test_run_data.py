@@ -0,0 +1,25 @@
+from core.run_data import load_run_data
+
+
+def test_runs_without_xml_do_not_share_a_cache_entry(tmp_path):
+    folders = []
+    for name in ("2025-01-01_0000_smoketest", "2025-01-02_0000_smoketest"):
+        folder = tmp_path / name
+        folder.mkdir()
+        (folder / "hosts_up.txt").write_text("10.0.0.1\n", encoding="utf-8")
+        folders.append(folder)
+
+    first, second = (load_run_data(f) for f in folders)
+
+    assert first.run_folder == folders[0]
+    assert second.run_folder == folders[1]
+    assert first.ports.empty and second.ports.empty
+
+
+def test_run_data_is_cached_per_folder(make_run):
+    run = make_run({"10.0.0.1": [("tcp", 22)]})
+
+    data = load_run_data(run.run_folder)
+
+    assert load_run_data(run.run_folder) is data
+    assert data.ports[["ip", "port"]].values.tolist() == [["10.0.0.1", 22]]
@@ -0,0 +1,52 @@
+import core.planner
+import core.service
+from core.service import ComputeService
+
+
+def test_batch_rejects_non_object_bodies(tmp_path):
+    service = ComputeService(tmp_path)
+
+    status, payload = service.handle("/batch", {"requests": [{"endpoint": "/compare", "body": [1]}]})
+
+    assert status == 200
+    assert payload["responses"][0]["status"] == 400
+    assert payload["responses"][0]["success"] is False
+
+
+def test_compare_keeps_fingerprints_in_the_data_dir(make_run, tmp_path, monkeypatch):
+    # Out-of-core plan: the in-memory path only reads fingerprints, it never writes them.
+    monkeypatch.setattr(core.planner, "IN_MEMORY_MAX_ROWS", 0)
+    make_run({"10.0.0.1": [("tcp", 22)]})
+    make_run({"10.0.0.1": [("tcp", 22)], "10.0.0.2": [("tcp", 80)]})
+    service = ComputeService(tmp_path)
+
+    status, payload = service.handle("/compare", {"network": "lab"})
+
+    assert status == 200, payload
+    assert payload["counts"]["newHosts"] == 1
+    assert list((tmp_path / "fingerprints").rglob("*.json"))
+    assert not list((tmp_path / "extracted").rglob("*.json"))
+
+
+def test_compare_rejects_negative_limit(make_run, tmp_path):
+    make_run({"10.0.0.1": [("tcp", 22)]})
+    make_run({"10.0.0.2": [("tcp", 22)]})
+    service = ComputeService(tmp_path)
+
+    status, payload = service.handle("/compare", {"network": "lab", "limit": -1})
+
+    assert status == 400 and payload["success"] is False
+    assert "limit" in payload["error"]
+
+
+def test_compare_caps_limit(make_run, tmp_path, monkeypatch):
+    monkeypatch.setattr(core.service, "MAX_ROW_LIMIT", 1)
+    make_run({"10.0.0.1": [("tcp", 22)]})
+    make_run({"10.0.0.2": [("tcp", 22)], "10.0.0.3": [("tcp", 80)]})
+    service = ComputeService(tmp_path)
+
+    status, payload = service.handle("/compare", {"network": "lab", "limit": 10**9})
+
+    assert status == 200, payload
+    assert payload["counts"]["newHosts"] == 2
+    assert len(payload["newHosts"]) == 1
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from core.storage import atomic_write_text, file_lock, staged_dir
+
+
+def test_staged_dir_publishes_on_success(tmp_path):
+    final = tmp_path / "run"
+    with staged_dir(final) as staging:
+        (staging / "a.txt").write_text("x", encoding="utf-8")
+
+    assert (final / "a.txt").read_text(encoding="utf-8") == "x"
+    assert [p.name for p in tmp_path.iterdir()] == ["run"]
+
+
+@pytest.mark.parametrize("existing", ["empty", "non_empty"])
+def test_staged_dir_never_replaces_an_existing_dir(tmp_path, existing):
+    final = tmp_path / "run"
+    final.mkdir()
+    if existing == "non_empty":
+        (final / "keep.txt").write_text("keep", encoding="utf-8")
+
+    with pytest.raises(FileExistsError):
+        with staged_dir(final) as staging:
+            (staging / "new.txt").write_text("new", encoding="utf-8")
+
+    assert not (final / "new.txt").exists()
+    assert [p.name for p in tmp_path.iterdir()] == ["run"]
+
+
+def test_staged_dir_removes_staging_on_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        with staged_dir(tmp_path / "run"):
+            raise RuntimeError("boom")
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_file_lock_serializes_read_modify_write(tmp_path):
+    counter = tmp_path / "n.txt"
+    atomic_write_text(counter, "0")
+
+    def bump():
+        for _ in range(50):
+            with file_lock(tmp_path / ".lock"):
+                atomic_write_text(counter, str(int(counter.read_text(encoding="utf-8")) + 1))
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.read_text(encoding="utf-8") == "200"
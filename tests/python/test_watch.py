@@ -0,0 +1,31 @@
+from core.watch import FAILED_DIRNAME, IngestWorkQueue
+
+
+def _queue(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    return drop, IngestWorkQueue(drop, data_dir=tmp_path / "data", settle_seconds=0)
+
+
+def test_failed_drop_is_archived_with_its_error(tmp_path):
+    drop, work = _queue(tmp_path)
+    bad = drop / "bad.zip"
+    bad.write_bytes(b"not a zip")
+    work._process(bad)
+    assert work.failed == 1 and not bad.exists()
+    assert (drop / FAILED_DIRNAME / "bad.zip").exists()
+    assert (drop / FAILED_DIRNAME / "bad.zip.error.txt").read_text()
+
+
+def test_archive_failure_does_not_escape(tmp_path, monkeypatch):
+    drop, work = _queue(tmp_path)
+    bad = drop / "bad.zip"
+    bad.write_bytes(b"not a zip")
+
+    def broken_archive(path, dirname):
+        raise PermissionError("read-only drop folder")
+
+    monkeypatch.setattr(work, "_archive", broken_archive)
+    work._process(bad)
+    assert work.failed == 1 and bad.exists()
+    assert not work._seen